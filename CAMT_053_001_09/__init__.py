@@ -1,3 +1,5 @@
+__version__ = '0.1.0'
+
 import CAMT_053_001_09.message_datatypes
 import CAMT_053_001_09.base_models
 import CAMT_053_001_09.utils
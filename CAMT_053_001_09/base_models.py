@@ -1,17 +1,174 @@
 import re
 from datetime import datetime, date
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Optional, ClassVar, Set
+from functools import lru_cache
+from typing import Optional, ClassVar, Set, Hashable, Type, Iterable
 
 import pendulum
 from lxml.etree import Element
 from pydantic import BaseModel, validator, root_validator, condecimal
+from pydantic.errors import PydanticValueError
 
-from config import settings
+from CAMT_053_001_09.code_sets import registry as code_set_registry
+from CAMT_053_001_09.settings import naive_timezone
+from CAMT_053_001_09.timezones import get_timezone, localize, to_utc
+from CAMT_053_001_09.utils import gc_paused
 
 
-class AmountBaseModel(BaseModel):
-    amount: condecimal(max_digits=18) | float
+def currency_decimal_places(ccy: str) -> int:
+    """
+    Number of fractional digits (minor unit) used for a currency when no explicit `decimal_places` is given.
+    """
+    if ccy in {'CLF', 'UYW'}:
+        return 4
+    elif ccy in {'BHD', 'IQD', 'JOD', 'KWD', 'LYD', 'OMR', 'TND'}:
+        return 3
+    elif ccy in {'JPY', 'KRW', 'PYG'}:
+        return 0
+    return 2  # Default to 2 decimal places
+
+
+def to_minor_units(amount: Decimal, ccy: str) -> int:
+    """
+    Convert a decimal amount into an exact integer number of minor units of `ccy`, e.g. 123.45 CHF -> 12345.
+    Raises a ValueError if the amount has more fractional digits than the currency allows.
+    """
+    scaled = amount.scaleb(currency_decimal_places(ccy))
+    minor = int(scaled)
+    if minor != scaled:
+        raise ValueError(f'Amount {amount} has more fractional digits than allowed for {ccy}')
+    return minor
+
+
+def from_minor_units(minor: int, ccy: str) -> Decimal:
+    """
+    Inverse of `to_minor_units`: 12345 CHF -> Decimal('123.45').
+    """
+    return Decimal(minor).scaleb(-currency_decimal_places(ccy))
+
+
+def quantize_amount(amount: Decimal, ccy: str, decimal_places: Optional[int] = None, strip: bool = False) -> Decimal:
+    """
+    Round `amount` half up to `decimal_places`, by default the minor unit of `ccy`. `strip` removes trailing zeros.
+    """
+    if decimal_places is None:
+        decimal_places = currency_decimal_places(ccy)
+    amount = amount.quantize(Decimal(f'1E-{decimal_places}'), rounding=ROUND_HALF_UP)
+    return amount.normalize() if strip else amount
+
+
+def _trusted_instance(cls: Type[BaseModel], values: dict, fields_set: Set[str]) -> BaseModel:
+    # what BaseModel.construct does for values covering all fields, without its per-call field iteration
+    instance = cls.__new__(cls)
+    object.__setattr__(instance, '__dict__', values)
+    object.__setattr__(instance, '__fields_set__', set(fields_set))
+    return instance
+
+
+def _select(elements: Element | Iterable[Element], path: Optional[str]) -> Iterable[Element]:
+    return elements.iterfind(path) if path is not None else elements
+
+
+class XmlMixin:
+    """
+    XML conversion of the models holding a single text value, the `_xml_field`.
+
+    `from_xml_many` converts many elements at once: every distinct text is validated once and the instances are
+    created from the validated values without running the validators again, e.g. for the codes of all entries::
+
+        CreditDebitCode.from_xml_many(document, './/{*}Ntry/{*}CdtDbtInd')
+    """
+    _xml_field: ClassVar[str] = 'value'
+
+    def to_xml(self, tag: str) -> Element:
+        element = Element(tag)
+        element.text = str(getattr(self, self._xml_field))
+        return element
+
+    @classmethod
+    def from_xml(cls, element: Element):
+        return cls(**{cls._xml_field: element.text})
+
+    @classmethod
+    def from_xml_many(cls, elements: Element | Iterable[Element], path: Optional[str] = None) -> list:
+        """
+        Instances of `elements`, or with `path` of the elements below the element `elements` matching the
+        ElementPath expression `path`.
+        """
+        field = cls._xml_field
+        texts = [element.text for element in _select(elements, path)]
+        validated = {text: getattr(cls(**{field: text}), field) for text in set(texts)}
+        fields_set = {field}
+        with gc_paused():
+            return [_trusted_instance(cls, {field: validated[text]}, fields_set) for text in texts]
+
+
+class FrozenConfig:
+    frozen = True
+    validate_assignment = False
+
+
+class ImmutableMixin:
+    """
+    Immutable mode of the base models. `Model.frozen()` is a subclass of `Model` which still validates at
+    construction, but whose instances cannot be changed and are hashable, e.g. to be used as dict keys or shared
+    between threads::
+
+        FrozenAmount = ActiveCurrencyAndAmount.frozen()
+        FrozenAmount(amount='1.5', ccy='CHF') == FrozenAmount(amount='1.50', ccy='CHF')    # True, same hash
+
+    `freeze()` and `thaw()` convert validated instances between both modes without validating again. Equality and
+    hash of frozen instances are those of the normalised value (`_key`) of the model.
+    """
+    _mutable_model: ClassVar[Optional[Type[BaseModel]]] = None
+
+    def _key(self) -> Hashable:
+        raise NotImplementedError
+
+    @classmethod
+    def frozen(cls) -> Type[BaseModel]:
+        return _frozen_model(cls._mutable_model or cls)
+
+    @property
+    def is_frozen(self) -> bool:
+        return self._mutable_model is not None
+
+    def freeze(self):
+        if self.is_frozen:
+            return self
+        return self.frozen().construct(_fields_set=self.__fields_set__, **self.__dict__)
+
+    def thaw(self):
+        if not self.is_frozen:
+            return self
+        return self._mutable_model.construct(_fields_set=self.__fields_set__, **self.__dict__)
+
+    def _frozen_hash(self) -> int:
+        return hash((self._mutable_model, self._key()))
+
+    def _frozen_eq(self, other) -> bool:
+        if isinstance(other, ImmutableMixin) and isinstance(other, self._mutable_model):
+            return (other._mutable_model or type(other)) is self._mutable_model and self._key() == other._key()
+        return NotImplemented
+
+
+@lru_cache(maxsize=None)
+def _frozen_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    return type(f'Frozen{model.__name__}', (model,), {
+        '__module__': model.__module__,
+        '__doc__': model.__doc__,
+        'Config': FrozenConfig,
+        '_mutable_model': model,
+        '__hash__': ImmutableMixin._frozen_hash,
+        '__eq__': ImmutableMixin._frozen_eq,
+    })
+
+
+AmountDecimal = condecimal(max_digits=18)
+
+
+class AmountBaseModel(ImmutableMixin, BaseModel):
+    amount: AmountDecimal | float
     ccy: str
     decimal_places: Optional[int] = None
     strip: Optional[bool] = False
@@ -39,20 +196,7 @@ class AmountBaseModel(BaseModel):
             if isinstance(amount, str):
                 amount = Decimal(amount)
 
-            if decimal_places is None:
-                if ccy in {'CLF', 'UYW'}:
-                    decimal_places = 4
-                elif ccy in {'BHD', 'IQD', 'JOD', 'KWD', 'LYD', 'OMR', 'TND'}:
-                    decimal_places = 3
-                elif ccy in {'JPY', 'KRW', 'PYG'}:
-                    decimal_places = 0
-                else:
-                    decimal_places = 2  # Default to 2 decimal places
-
-            values['amount'] = amount.quantize(Decimal(f'1E-{decimal_places}'), rounding=ROUND_HALF_UP)
-
-            if strip:
-                values['amount'] = values['amount'].normalize()
+            values['amount'] = quantize_amount(amount, ccy, decimal_places, strip)
 
         return values
 
@@ -61,6 +205,47 @@ class AmountBaseModel(BaseModel):
         element.text = str(self.amount)
         return element
 
+    @classmethod
+    def from_xml(cls, element: Element):
+        return cls(amount=element.text, ccy=element.get('Ccy') or element.get('ccy'))
+
+    @classmethod
+    def from_xml_many(cls, elements: Element | Iterable[Element], path: Optional[str] = None) -> list:
+        """
+        Instances of `elements`, or with `path` of the elements below the element `elements` matching the
+        ElementPath expression `path`. The currency and the defaults of the model are validated once per currency,
+        the amounts are converted and quantized directly. Amounts the direct conversion rejects are validated by the
+        model, which raises the usual errors.
+        """
+        with gc_paused():
+            return cls._amounts_from_xml(_select(elements, path))
+
+    @classmethod
+    def _amounts_from_xml(cls, elements: Iterable[Element]) -> list:
+        samples = {}
+        amounts = []
+        for element in elements:
+            text, ccy = element.text, element.get('Ccy') or element.get('ccy')
+            sample = samples.get(ccy)
+            if sample is None:
+                sample = samples[ccy] = cls(amount=0, ccy=ccy)
+            try:
+                amount = AmountDecimal.validate(Decimal(text))
+            except (ArithmeticError, TypeError, PydanticValueError):
+                amounts.append(cls(amount=text, ccy=ccy))
+                continue
+            amounts.append(_trusted_instance(cls, {
+                'amount': quantize_amount(amount, ccy, sample.decimal_places, sample.strip), 'ccy': ccy,
+                'decimal_places': sample.decimal_places, 'strip': sample.strip}, sample.__fields_set__))
+        return amounts
+
+    @property
+    def minor_units(self) -> int:
+        return to_minor_units(self.amount, self.ccy)
+
+    def _key(self) -> Hashable:
+        return self.amount, self.ccy
+
 
 class CurrencyCodeBaseModel(str):
     def __new__(cls, ccy):
@@ -72,8 +257,9 @@ class CurrencyCodeBaseModel(str):
         return super().__new__(cls, ccy)
 
 
-class CodeStrBaseModel(BaseModel):
+class CodeStrBaseModel(XmlMixin, ImmutableMixin, BaseModel):
     code: str
+    _xml_field: ClassVar[str] = 'code'
 
     _valid_codes = set()
 
@@ -94,8 +280,11 @@ class CodeStrBaseModel(BaseModel):
 
         return v
 
+    def _key(self) -> Hashable:
+        return self.code
+
 
-class CodeRegexBaseModel(BaseModel):
+class CodeRegexBaseModel(XmlMixin, ImmutableMixin, BaseModel):
     value: str
     _regex: ClassVar[str] = ''
 
@@ -105,12 +294,18 @@ class CodeRegexBaseModel(BaseModel):
             raise ValueError(f'Invalid code: {value}')
         return value
 
+    def _key(self) -> Hashable:
+        return self.value
 
-class ExternalCodeStrBaseModel(BaseModel):
+
+class ExternalCodeStrBaseModel(XmlMixin, ImmutableMixin, BaseModel):
     code: str
+    _xml_field: ClassVar[str] = 'code'
 
     _valid_codes: Set[str] = set()
     _regex: ClassVar[str] = ''
+    # Name of the code set in `code_sets.registry`, set by `set_external_code_set_decorator`
+    _code_set: ClassVar[Optional[str]] = None
 
     @classmethod
     def set_valid_codes(cls, codes: Set[str]) -> None:
@@ -123,22 +318,35 @@ class ExternalCodeStrBaseModel(BaseModel):
     @validator('code', pre=True)
     def validate_code(cls, v: str) -> str:
         if not isinstance(v, str):
-            raise TypeError(f'{cls.__class__.__name__} code must be a string')
+            raise TypeError(f'{cls.__name__} code must be a string')
 
         v = v.strip().upper()
 
-        if v not in cls._valid_codes:
+        # the release of the code set in effect, see `code_sets.code_sets_as_of`
+        if cls._code_set is not None:
+            code_set = code_set_registry.code_set(cls._code_set)
+            if not code_set.is_valid(v):
+                raise ValueError(code_set.error(v))
+        # code sets published without an enum only define a length
+        elif not cls._valid_codes and cls._regex:
+            if not re.match(cls._regex, v):
+                raise ValueError(f'Invalid {cls.__name__} code: `{v}`, must match {cls._regex}')
+        elif v not in cls._valid_codes:
             raise ValueError(
-                f'Invalid {cls.__class__.__name__} code: `{v}`, allowed values are {", ".join(cls._valid_codes)}')
+                f'Invalid {cls.__name__} code: `{v}`, allowed values are {", ".join(cls._valid_codes)}')
 
         return v
 
+    def _key(self) -> Hashable:
+        return self.code
 
-class DateTimeBaseModel(BaseModel):
+
+class DateTimeBaseModel(XmlMixin, ImmutableMixin, BaseModel):
     """
     Base model for datetime fields.
     :param value: str or datetime value. If str, it will be parsed internally into a timezone aware datetime using
-    pendulum. A naive datetime object will always be considered local time and converted according to the format
+    pendulum. A naive datetime object will be considered in the time zone of `settings.naive_timezone()` (DateTime.naive
+    of the configuration unless overridden with `settings.timezone_override`) and converted according to the format
     string
 
     """
@@ -146,8 +354,6 @@ class DateTimeBaseModel(BaseModel):
     _original_value: str | datetime | date | pendulum.DateTime
 
     _datetime_format: ClassVar[str] = ''
-    _local_tz: ClassVar[pendulum.timezone] = pendulum.local_timezone()
-    _offset_hours = _local_tz.utcoffset(pendulum.now()).total_seconds() // 3600
 
     @validator('value')
     def validate_datetime(cls, value):
@@ -191,6 +397,7 @@ class DateTimeBaseModel(BaseModel):
         def has_timezone(regex: str = r'[+-]\d{2}:\d{2}$|[Z]$'):
             return re.search(r'[+-]\d{2}:\d{2}$|[Z]$', cls._original_value)
 
+        naive = naive_timezone()
         match cls._datetime_format:
             case 'YYYY':
                 validate_date(r'^\d{4}')
@@ -205,53 +412,53 @@ class DateTimeBaseModel(BaseModel):
                 validate_date(r'^\d{4}-\d{2}-\d{2}')
                 validate_time()
                 value = (
-                    value.in_timezone('utc')
+                    value.in_timezone(pendulum.UTC)
                     if has_timezone()
-                    else value.replace(tzinfo=settings.DateTime.naive).in_timezone('utc')
+                    else to_utc(value, naive)
                 )
-                value = value.format('YYYY-MM-DDTHH:mm:ss.SSSZ').replace('+00:00', 'Z')
+                value = value.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
             case 'YYYY-MM-DDThh:mm:ss.sss+/-hh:mm':
                 validate_date(r'^\d{4}-\d{2}-\d{2}')
                 validate_time()
                 value = (
                     value
                     if has_timezone()
-                    else value.replace(tzinfo=settings.DateTime.naive)
+                    else localize(value, naive)
                 )
-                value = value.format('YYYY-MM-DDTHH:mm:ss.SSSZ')
+                value = value.isoformat(timespec='milliseconds')
             case 'YYYY-MM-DDThh:mm:ss.sss':
                 validate_date(r'^\d{4}-\d{2}-\d{2}')
                 validate_time()
                 value = (
-                    value.in_timezone(settings.DateTime.naive)
+                    value.in_timezone(get_timezone(naive))
                     if has_timezone()
-                    else value.replace(tzinfo=settings.DateTime.naive)
+                    else localize(value, naive)
                 )
-                value = value.format('YYYY-MM-DDTHH:mm:ss.SSS')
+                value = value.replace(tzinfo=None).isoformat(timespec='milliseconds')
             case 'hh:mm:ss.sssZ':
                 validate_time()
                 value = (
-                    value.in_timezone('utc')
+                    value.in_timezone(pendulum.UTC)
                     if has_timezone()
-                    else value.replace(tzinfo=settings.DateTime.naive).in_timezone('utc')
+                    else to_utc(value, naive)
                 )
-                value = value.format('HH:mm:ss.SSSZ').replace('+00:00', 'Z')
+                value = value.timetz().isoformat(timespec='milliseconds').replace('+00:00', 'Z')
             case 'hh:mm:ss.sss+/-hh:mm':
                 validate_time()
                 value = (
                     value
                     if has_timezone()
-                    else value.replace(tzinfo=settings.DateTime.naive).in_timezone('local')
+                    else localize(value, naive)
                 )
-                value = value.format('HH:mm:ss.SSSZ')
+                value = value.timetz().isoformat(timespec='milliseconds')
             case 'hh:mm:ss.sss':
                 validate_time()
                 value = (
-                    value.in_timezone(settings.DateTime.naive)
+                    value.in_timezone(get_timezone(naive))
                     if has_timezone()
-                    else value.replace(tzinfo=settings.DateTime.naive)
+                    else localize(value, naive)
                 )
-                value = value.format('HH:mm:ss.SSS')
+                value = value.time().isoformat(timespec='milliseconds')
             case _:
                 raise ValueError(
                     f'Unimplemented datetime format: {cls._datetime_format}'
@@ -262,3 +469,6 @@ class DateTimeBaseModel(BaseModel):
     @property
     def original_value(self):
         return self._original_value
+
+    def _key(self) -> Hashable:
+        return self.value
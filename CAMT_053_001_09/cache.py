@@ -0,0 +1,324 @@
+"""
+Columnar on-disk cache of parsed CAMT.053 entries.
+
+The entries of a file are parsed and validated once, then stored column by column, keyed by the SHA-256 of the
+source file and the library version. Later loads memory-map the columns and build the entries through the trusted
+construction path, without parsing XML or running validators::
+
+    cache = EntryCache('~/.cache/camt053')
+    entries = cache.entries('statement.xml')
+
+Two backends are available: Arrow IPC files when `pyarrow` is installed, and a built-in column file otherwise.
+Amounts are stored as integer minor units, low-cardinality text (currency, codes, dates) dictionary encoded.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from CAMT_053_001_09 import __version__
+from CAMT_053_001_09.base_models import from_minor_units
+from CAMT_053_001_09.compression import open_input
+from CAMT_053_001_09.message_components import ReportEntry12
+from CAMT_053_001_09.reader import iter_entries
+from CAMT_053_001_09.utils import gc_paused
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+CACHE_FORMAT = 1
+COLUMNS_MAGIC = b'CAMTCOL1'
+BACKENDS = ('arrow', 'columns')
+COLUMNS = ('entry_reference', 'amount', 'ccy', 'credit_debit_indicator', 'status', 'booking_date', 'value_date',
+           'account_servicer_reference', 'domain', 'family', 'sub_family', 'end_to_end_id',
+           'additional_entry_information')
+DICTIONARY_COLUMNS = frozenset(('ccy', 'credit_debit_indicator', 'status', 'booking_date', 'value_date', 'domain',
+                                'family', 'sub_family'))
+
+
+def entries_to_columns(entries: Iterable[ReportEntry12]) -> Dict[str, List[Any]]:
+    """
+    Columns of `COLUMNS` for the entries, `amount` in integer minor units.
+    """
+    columns: Dict[str, List[Any]] = {name: [] for name in COLUMNS}
+    for entry in entries:
+        family = entry.bank_transaction_code.domain.family
+        values = (
+            entry.entry_reference and entry.entry_reference.value,
+            entry.amount.minor_units,
+            entry.amount.ccy,
+            entry.credit_debit_indicator.code,
+            entry.status.code,
+            entry.booking_date and entry.booking_date.value,
+            entry.value_date and entry.value_date.value,
+            entry.account_servicer_reference and entry.account_servicer_reference.value,
+            entry.bank_transaction_code.domain.code.code,
+            family.code.code,
+            family.sub_family_code.code,
+            entry.end_to_end_id and entry.end_to_end_id.value,
+            entry.additional_entry_information and entry.additional_entry_information.value,
+        )
+        for name, value in zip(COLUMNS, values):
+            columns[name].append(value)
+    return columns
+
+
+def columns_to_entries(columns: Dict[str, Sequence]) -> Iterator[ReportEntry12]:
+    """
+    Build entries from columns without validation, the inverse of `entries_to_columns`.
+    """
+    for (entry_reference, amount, ccy, credit_debit_indicator, status, booking_date, value_date,
+         account_servicer_reference, domain, family, sub_family, end_to_end_id,
+         additional_entry_information) in zip(*(columns[name] for name in COLUMNS)):
+        yield ReportEntry12.construct_trusted(
+            from_minor_units(amount, ccy), ccy, credit_debit_indicator, status, domain, family, sub_family,
+            booking_date=booking_date, value_date=value_date, entry_reference=entry_reference,
+            account_servicer_reference=account_servicer_reference, end_to_end_id=end_to_end_id,
+            additional_entry_information=additional_entry_information,
+        )
+
+
+# Built-in column file: magic, header length, JSON header, then every column buffer aligned to 8 bytes
+
+class _DictionaryColumn(Sequence):
+
+    def __init__(self, codes: memoryview, values: List[str]):
+        self._codes = codes
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        code = self._codes[index]
+        return self._values[code] if code >= 0 else None
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        # code -1 (no value) picks the trailing None
+        values = [*self._values, None]
+        return (values[code] for code in self._codes)
+
+
+class _Utf8Column(Sequence):
+
+    def __init__(self, offsets: memoryview, nulls: memoryview, data: memoryview):
+        self._offsets = offsets
+        self._nulls = nulls
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._nulls)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = range(len(self))[index]
+        if self._nulls[index]:
+            return None
+        return str(self._data[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        data, offsets = self._data, self._offsets
+        return (None if null else str(data[offsets[index]:offsets[index + 1]], 'utf-8')
+                for index, null in enumerate(self._nulls))
+
+
+def _column_buffers(name: str, values: List[Any]) -> tuple[Dict[str, Any], List[bytes]]:
+    if name == 'amount':
+        return {'encoding': 'int64'}, [struct.pack(f'={len(values)}q', *values)]
+    if name in DICTIONARY_COLUMNS:
+        dictionary = sorted({value for value in values if value is not None})
+        codes = {value: code for code, value in enumerate(dictionary)}
+        return ({'encoding': 'dictionary', 'values': dictionary},
+                [struct.pack(f'={len(values)}i', *(codes[value] if value is not None else -1 for value in values))])
+    encoded = [value.encode('utf-8') if value is not None else b'' for value in values]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return ({'encoding': 'utf8'},
+            [struct.pack(f'={len(offsets)}q', *offsets), bytes(value is None for value in values), b''.join(encoded)])
+
+
+def _write_columns(path: Path, columns: Dict[str, List[Any]]) -> None:
+    header: Dict[str, Any] = {'rows': len(columns['amount']), 'byteorder': sys.byteorder, 'columns': {}}
+    buffers: List[bytes] = []
+    for name in COLUMNS:
+        metadata, column_buffers = _column_buffers(name, columns[name])
+        metadata['buffers'] = list(range(len(buffers), len(buffers) + len(column_buffers)))
+        header['columns'][name] = metadata
+        buffers.extend(column_buffers)
+
+    # The offsets depend on the header length, reserve enough digits for them first
+    header['buffers'] = [[0, len(buffer)] for buffer in buffers]
+    encoded = json.dumps(header).encode('utf-8') + b' ' * 16 * (len(buffers) + 1)
+    position = len(COLUMNS_MAGIC) + 8 + len(encoded)
+    for entry, buffer in zip(header['buffers'], buffers):
+        position += -position % 8
+        entry[0] = position
+        position += len(buffer)
+    header_bytes = json.dumps(header).encode('utf-8').ljust(len(encoded))
+
+    with open(path, 'wb') as f:
+        f.write(COLUMNS_MAGIC + struct.pack('<Q', len(header_bytes)) + header_bytes)
+        for (offset, _), buffer in zip(header['buffers'], buffers):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(buffer)
+
+
+class ColumnFile:
+    """
+    Memory-mapped columns of a built-in column file. Columns are sequences reading straight from the map.
+    """
+
+    def __init__(self, path: str | Path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._views: List[memoryview] = []
+        if self._view[:len(COLUMNS_MAGIC)] != COLUMNS_MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a column file')
+        header_length, = struct.unpack_from('<Q', self._view, len(COLUMNS_MAGIC))
+        start = len(COLUMNS_MAGIC) + 8
+        header = json.loads(bytes(self._view[start:start + header_length]))
+        if header['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(f'{path} was written on a {header["byteorder"]} endian machine')
+        self.rows = header['rows']
+        self.columns: Dict[str, Sequence] = {}
+        for name, metadata in header['columns'].items():
+            buffers = [self._buffer(*header['buffers'][index]) for index in metadata['buffers']]
+            if metadata['encoding'] == 'int64':
+                self.columns[name] = self._track(buffers[0].cast('q'))
+            elif metadata['encoding'] == 'dictionary':
+                self.columns[name] = _DictionaryColumn(self._track(buffers[0].cast('i')), metadata['values'])
+            else:
+                self.columns[name] = _Utf8Column(self._track(buffers[0].cast('q')), buffers[1], buffers[2])
+
+    def _track(self, view: memoryview) -> memoryview:
+        self._views.append(view)
+        return view
+
+    def _buffer(self, offset: int, length: int) -> memoryview:
+        return self._track(self._view[offset:offset + length])
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self) -> None:
+        # The views into the map have to be released before the map can be closed
+        self.columns = {}
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'ColumnFile':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def file_digest(source: str | Path) -> str:
+    """
+    SHA-256 of the (decompressed) content of a file.
+    """
+    digest = hashlib.sha256()
+    with open_input(source) as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EntryCache:
+    """
+    Cache of the parsed entries of CAMT.053 files in `directory`.
+    """
+
+    def __init__(self, directory: str | Path, backend: Optional[str] = None):
+        """
+        :param directory: cache directory, created if needed.
+        :param backend: 'arrow' or 'columns', defaults to 'arrow' if pyarrow is installed.
+        """
+        backend = backend or ('arrow' if pyarrow is not None else 'columns')
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown cache backend: {backend}')
+        if backend == 'arrow' and pyarrow is None:
+            raise ValueError('The arrow cache backend requires the pyarrow package')
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, digest: str) -> Path:
+        suffix = 'arrow' if self.backend == 'arrow' else 'cols'
+        return self.directory / f'{digest}-{__version__}-{CACHE_FORMAT}.{suffix}'
+
+    def store(self, digest: str, entries: Iterable[ReportEntry12]) -> Path:
+        """
+        Store the entries of the file with SHA-256 `digest`, the cache file is replaced atomically.
+        """
+        path = self.path(digest)
+        columns = entries_to_columns(entries)
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix='.', suffix='.tmp')
+        os.close(fd)
+        try:
+            if self.backend == 'arrow':
+                table = pyarrow.table({
+                    name: pyarrow.array(values, pyarrow.int64()) if name == 'amount' else
+                    pyarrow.array(values, pyarrow.string()).dictionary_encode() if name in DICTIONARY_COLUMNS else
+                    pyarrow.array(values, pyarrow.string())
+                    for name, values in columns.items()
+                })
+                with pyarrow.OSFile(temporary, 'wb') as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            else:
+                _write_columns(Path(temporary), columns)
+            os.replace(temporary, path)
+        except BaseException:
+            Path(temporary).unlink(missing_ok=True)
+            raise
+        return path
+
+    def load(self, digest: str) -> Optional[List[ReportEntry12]]:
+        """
+        Entries of the file with SHA-256 `digest`, None if it is not cached.
+        """
+        path = self.path(digest)
+        if not path.exists():
+            return None
+        if self.backend == 'arrow':
+            with pyarrow.memory_map(str(path)) as source, gc_paused():
+                table = pyarrow.ipc.open_file(source).read_all()
+                return list(columns_to_entries({name: table.column(name).to_pylist() for name in COLUMNS}))
+        with ColumnFile(path) as columns, gc_paused():
+            return list(columns_to_entries(columns.columns))
+
+    def entries(self, source: str | Path) -> List[ReportEntry12]:
+        """
+        Entries of a CAMT.053 file, from the cache if the same content was loaded before.
+        """
+        digest = file_digest(source)
+        entries = self.load(digest)
+        if entries is not None:
+            self.hits += 1
+            return entries
+        self.misses += 1
+        entries = list(iter_entries(source))
+        self.store(digest, entries)
+        return entries
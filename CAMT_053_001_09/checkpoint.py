@@ -0,0 +1,209 @@
+"""
+Checkpoints of long-running conversions, so a conversion interrupted by a crash resumes where it stopped instead of
+starting over.
+
+A checkpoint is taken every `interval` input records. It records the input position (records consumed, and bytes
+read by the parser with their digest), the output position, the open statements with their running `TxsSummry`
+totals and spooled entries, the fingerprints added to the deduplicator and the state of the converter. A resumed
+conversion produces the same bytes as one that was never interrupted::
+
+    checkpoints = CheckpointStore('convert.checkpoint', interval=50_000)
+    convert_flexquery('flexquery.xml', 'camt053.xml', checkpoints=checkpoints)  # run again after a crash
+
+The store directory holds `checkpoint.json`, replaced atomically, and the spool files of the open statements. On
+resume the output is truncated to the recorded position and the records already converted are skipped without being
+converted again. The input is parsed again up to the checkpoint, as the parser state cannot be restored. Once the
+conversion completes the store is cleared.
+
+A checkpoint is written after the output, the spools and the checkpoint file are synced to disk (`durable`), and
+before the new fingerprints are committed to the deduplicator. A crash in between is repaired on resume by adding the
+fingerprints of the checkpoint again. `count` and `seconds` measure the overhead of the checkpoints taken.
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional
+
+from lxml.etree import fromstring, tostring
+
+from CAMT_053_001_09.dedup import EntryDeduplicator
+from CAMT_053_001_09.message_components import CashBalance8
+
+CHECKPOINT_FORMAT = 1
+CHECKPOINT_FILE = 'checkpoint.json'
+SPOOL_PATTERN = 'spool-*.ntry'
+
+
+def balance_to_state(balance: Optional[CashBalance8]) -> Optional[str]:
+    return tostring(balance.to_xml('Bal'), encoding='unicode') if balance is not None else None
+
+
+def balance_from_state(state: Optional[str]) -> Optional[CashBalance8]:
+    return CashBalance8.from_xml(fromstring(state)) if state is not None else None
+
+
+def sync(stream: BinaryIO) -> None:
+    """
+    Flush `stream` and write it through to disk.
+    """
+    stream.flush()
+    os.fsync(stream.fileno())
+
+
+class CountingReader(io.RawIOBase):
+    """
+    Read `stream`, counting the bytes read in `offset` and hashing them, so a resumed conversion can check that it
+    reads the same input.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        super().__init__()
+        self._stream = stream
+        self._hash = hashlib.blake2b(digest_size=16)
+        self.offset = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        count = len(data)
+        buffer[:count] = data
+        self.offset += count
+        self._hash.update(data)
+        return count
+
+    def hexdigest(self) -> str:
+        """BLAKE2b digest of the bytes read so far."""
+        return self._hash.hexdigest()
+
+
+@dataclass
+class Checkpoint:
+    """
+    State of a conversion after `records` input records, see the module documentation.
+    """
+    records: int
+    input_offset: int
+    input_digest: str
+    writer: Dict[str, Any]
+    state: Dict[str, Any] = field(default_factory=dict)
+    # Fingerprints added to the deduplicator since the previous checkpoint, base64 of the concatenated bytes
+    fingerprints: str = ''
+    format: int = CHECKPOINT_FORMAT
+
+    @property
+    def spools(self) -> frozenset:
+        return frozenset(session['spool'] for session in self.writer.get('sessions', ()))
+
+
+class CheckpointStore:
+    """
+    Directory holding the checkpoint of one conversion.
+    """
+
+    def __init__(self, directory: str | Path, interval: int = 10_000, durable: bool = True):
+        """
+        :param directory: directory of the checkpoint, created if missing. One directory per conversion.
+        :param interval: input records between checkpoints.
+        :param durable: sync the output, spools and checkpoint to disk, so checkpoints survive a system crash and not
+        only a crash of the process.
+        """
+        if interval < 1:
+            raise ValueError('interval must be positive')
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.interval = interval
+        self.durable = durable
+        self.count = 0
+        self.seconds = 0.0
+        self._last = 0
+
+    @property
+    def path(self) -> Path:
+        return self.directory / CHECKPOINT_FILE
+
+    def spool_path(self, name: str) -> Path:
+        return self.directory / name
+
+    def load(self) -> Optional[Checkpoint]:
+        """
+        The last checkpoint, None if there is none.
+        """
+        try:
+            with self.path.open(mode='r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        if state.get('format') != CHECKPOINT_FORMAT:
+            raise ValueError(f'Unsupported checkpoint format {state.get("format")} in {self.path}')
+        checkpoint = Checkpoint(**state)
+        self._last = checkpoint.records
+        return checkpoint
+
+    def due(self, records: int) -> bool:
+        return records - self._last >= self.interval
+
+    def save(self, records: int, reader: CountingReader, writer, state: Dict[str, Any],
+             deduplicator: Optional[EntryDeduplicator] = None) -> Checkpoint:
+        """
+        Take a checkpoint after `records` input records.
+        :param reader: the input of the conversion, read through a `CountingReader`.
+        :param writer: the `StatementWriter` of the conversion.
+        :param state: converter state, anything JSON serializable.
+        :param deduplicator: deduplicator of the conversion, it must not write fingerprints between checkpoints
+        (`batch_size=None`, as while it is used by `writer`).
+        """
+        started = time.perf_counter()
+        fingerprints = b''
+        if deduplicator is not None:
+            if deduplicator.batch_size is not None:
+                raise ValueError('Checkpoints need a deduplicator with batch_size=None')
+            fingerprints = deduplicator.pending()
+        checkpoint = Checkpoint(records, reader.offset, reader.hexdigest(), writer.checkpoint_state(self.durable),
+                                state, base64.b64encode(fingerprints).decode('ascii'))
+
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json.dumps(asdict(checkpoint), separators=(',', ':')).encode('utf-8'))
+                if self.durable:
+                    sync(f)
+            os.replace(temporary, self.path)
+        except BaseException:
+            Path(temporary).unlink(missing_ok=True)
+            raise
+        if deduplicator is not None:
+            # The Bloom filter is only saved at the end, a filter left stale by a crash is rebuilt when loaded
+            deduplicator.flush()
+        # Spools of statements written since the previous checkpoint are no longer needed
+        for path in self.directory.glob(SPOOL_PATTERN):
+            if path.name not in checkpoint.spools:
+                path.unlink()
+
+        self._last = records
+        self.count += 1
+        self.seconds += time.perf_counter() - started
+        return checkpoint
+
+    @staticmethod
+    def restore_deduplicator(checkpoint: Checkpoint, deduplicator: EntryDeduplicator) -> None:
+        """
+        Bring the deduplicator to the state of the checkpoint, in case the process stopped before it was saved.
+        """
+        deduplicator.restore(base64.b64decode(checkpoint.fingerprints))
+
+    def clear(self) -> None:
+        """
+        Remove the checkpoint and spools, once the conversion is complete.
+        """
+        self.path.unlink(missing_ok=True)
+        for path in self.directory.glob(SPOOL_PATTERN):
+            path.unlink()
+        self._last = 0
@@ -0,0 +1,235 @@
+"""
+Batch conversion of broker statements to CAMT.053.
+
+    camt053-convert 'exports/2023-*/*.xml' exports/tda --output-dir camt053 --workers 8
+
+Every source file is converted in its own task of a process pool. A file that fails is reported and skipped, the
+other files are not affected. The directories of the sources below their common directory are mirrored in the output
+directory, e.g. `camt053/2023-01/flexquery.camt053.xml`.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+
+from CAMT_053_001_09.compression import COMPRESSIONS, uncompressed_path
+from CAMT_053_001_09.flexquery import convert_flexquery
+from CAMT_053_001_09.td_ameritrade import convert_td_ameritrade
+
+SOURCE_FORMATS = ('flexquery', 'td_ameritrade')
+SOURCE_SUFFIXES = ('.xml', '.csv')
+TARGET_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+@dataclass
+class FileResult:
+    source: Path
+    target: Path
+    size: int
+    entries: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def detect_format(source: Path) -> str:
+    """
+    Source format by file extension, `.xml` files are expected to be FlexQuery exports. A compression suffix
+    (`.gz`, `.zst`) is ignored.
+    """
+    suffix = uncompressed_path(source).suffix.lower()
+    if suffix == '.xml':
+        return 'flexquery'
+    if suffix == '.csv':
+        return 'td_ameritrade'
+    raise ValueError(f'Unknown source format for {source}, use --format')
+
+
+def convert_file(source: Path, target: Path, source_format: Optional[str] = None,
+                 account: Optional[str] = None) -> int:
+    """
+    Convert a single file, returns the number of entries written.
+    """
+    source_format = source_format or detect_format(source)
+    if source_format == 'flexquery':
+        return convert_flexquery(source, target)
+    if source_format == 'td_ameritrade':
+        return convert_td_ameritrade(source, target, account=account or source.stem[:35])
+    raise ValueError(f'Unknown source format: {source_format}')
+
+
+def _convert_task(source: Path, target: Path, source_format: Optional[str], account: Optional[str]) -> FileResult:
+    # Runs in a worker process. Any error is returned instead of raised, so one bad file cannot stop the batch
+    result = FileResult(source, target, source.stat().st_size)
+    start = time.perf_counter()
+    try:
+        result.entries = convert_file(source, target, source_format, account)
+    except Exception as e:
+        result.error = f'{type(e).__name__}: {e}'
+        target.unlink(missing_ok=True)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _init_worker(log_level: str) -> None:
+    logger.remove()
+    logger.add(sys.stderr, level=log_level)
+
+
+def is_source_file(path: Path) -> bool:
+    return uncompressed_path(path).suffix.lower() in SOURCE_SUFFIXES
+
+
+def target_path(source: Path, output_dir: Path, compression: Optional[str] = None) -> Path:
+    """
+    `<output_dir>/<source name>.camt053.xml`, followed by the suffix of `compression`.
+    """
+    return output_dir / f'{uncompressed_path(source).stem}.camt053.xml{TARGET_SUFFIXES[compression]}'
+
+
+def target_paths(sources: List[Path], output_dir: Path, compression: Optional[str] = None) -> Dict[Path, Path]:
+    """
+    Target of every source: `target_path` in the directory of the source relative to the common directory of all
+    sources, mirrored below `output_dir`. Raises a ValueError if two sources would still be converted to the same
+    target, e.g. `a.xml` and `a.csv`, as concurrent workers would overwrite each other's output.
+    """
+    parents = [source.absolute().parent for source in sources]
+    base = Path(os.path.commonpath(parents)) if parents else Path()
+    targets: Dict[Path, Path] = {}
+    sources_by_target: Dict[Path, Path] = {}
+    for source, parent in zip(sources, parents):
+        target = target_path(source, output_dir / parent.relative_to(base), compression)
+        if target in sources_by_target:
+            raise ValueError(f'{sources_by_target[target]} and {source} would both be converted to {target}')
+        sources_by_target[target] = source
+        targets[source] = target
+    return targets
+
+
+def collect_sources(patterns: Iterable[str]) -> List[Path]:
+    """
+    Expand directories (all `.xml` and `.csv` files in them, compressed or not) and glob patterns into a sorted list
+    of files.
+    """
+    sources = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            sources.update(p for p in path.iterdir() if p.is_file() and is_source_file(p))
+        else:
+            sources.update(Path(p) for p in glob.glob(pattern, recursive=True) if Path(p).is_file())
+    return sorted(sources)
+
+
+class Progress:
+    """
+    Single-line progress display on a terminal, one line per file otherwise.
+    """
+
+    def __init__(self, total: int, stream=sys.stderr):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.stream = stream
+        self.interactive = stream.isatty()
+
+    def update(self, result: FileResult) -> None:
+        self.done += 1
+        self.failed += result.error is not None
+        status = f'FAILED {result.error}' if result.error else f'{result.entries} entries'
+        line = f'[{self.done}/{self.total}] {self.done / self.total:.0%} {result.source.name}: {status}'
+        if self.interactive and result.error is None:
+            self.stream.write(f'\r\033[K{line}')
+        else:
+            self.stream.write(f'\r\033[K{line}\n' if self.interactive else f'{line}\n')
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self.interactive:
+            self.stream.write('\n')
+
+
+def run(sources: List[Path], output_dir: Path, workers: int, source_format: Optional[str] = None,
+        account: Optional[str] = None, log_level: str = 'WARNING', progress: Optional[Progress] = None,
+        compression: Optional[str] = None) -> List[FileResult]:
+    """
+    Convert the sources in a process pool. Raises a ValueError before any work is submitted if two sources would be
+    converted to the same target, see `target_paths`.
+    """
+    targets = target_paths(sources, output_dir, compression)
+    for directory in set(target.parent for target in targets.values()) | {output_dir}:
+        directory.mkdir(parents=True, exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_level,)) as executor:
+        futures = {
+            executor.submit(_convert_task, source, targets[source], source_format, account): source
+            for source in sources
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # e.g. a worker process killed by the OS
+                source = futures[future]
+                result = FileResult(source, targets[source], 0, error=f'{type(e).__name__}: {e}')
+            results.append(result)
+            if progress is not None:
+                progress.update(result)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='camt053-convert', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help='source files, directories or glob patterns')
+    parser.add_argument('-o', '--output-dir', type=Path, default=Path('.'), help='directory for the CAMT.053 files')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('-f', '--format', choices=SOURCE_FORMATS, help='source format, detected by extension')
+    parser.add_argument('-z', '--compress', choices=COMPRESSIONS, help='compress the CAMT.053 files')
+    parser.add_argument('--account', help='account identification for sources without one (TD Ameritrade)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no progress display')
+    parser.add_argument('--log-level', default='WARNING', help='loguru level of the converters')
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    sources = collect_sources(args.sources)
+    if not sources:
+        parser.error('no source files found')
+
+    try:
+        target_paths(sources, args.output_dir, args.compress)
+    except ValueError as e:
+        parser.error(str(e))
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    progress = None if args.quiet else Progress(len(sources))
+
+    start = time.perf_counter()
+    results = run(sources, args.output_dir, args.workers, args.format, args.account, args.log_level, progress,
+                  args.compress)
+    elapsed = time.perf_counter() - start
+    if progress is not None:
+        progress.close()
+
+    converted = [result for result in results if result.error is None]
+    failed = [result for result in results if result.error is not None]
+    entries = sum(result.entries for result in converted)
+    megabytes = sum(result.size for result in converted) / 2 ** 20
+    print(f'{len(converted)} files converted, {len(failed)} failed, {entries} entries, {megabytes:.1f} MB '
+          f'in {elapsed:.2f}s')
+    print(f'{len(converted) / elapsed:.1f} files/s, {entries / elapsed:.0f} entries/s, {megabytes / elapsed:.2f} MB/s')
+    for result in sorted(failed, key=lambda r: r.source):
+        print(f'FAILED {result.source}: {result.error}', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
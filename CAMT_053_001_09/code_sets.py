@@ -0,0 +1,265 @@
+"""
+Versioned registry of the ISO 20022 external code sets.
+
+ISO publishes the external code sets quarterly, as `{quarter}Q{year}_ExternalCodeSets_v{version}.json`. The registry
+holds every release found in its directories, each effective from the first day of its quarter. The models of
+`message_datatypes` decorated with `set_external_code_set_decorator` validate against the release in effect on the
+date set with `code_sets_as_of`, the latest release otherwise::
+
+    with code_sets_as_of('2022-11-30'):
+        entry = ReportEntry12(...)            # codes checked against the release in effect on 2022-11-30
+
+    registry.add_directory('/etc/camt053/code_sets')
+    registry.refresh()                        # loads new or changed releases, e.g. from a running service
+
+Releases are held in an immutable snapshot that is replaced as a whole on every change. Lookups read the current
+snapshot without locking and find a code set by name in a dictionary; only loading takes the registry lock.
+"""
+import json
+import re
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterator, List, Mapping, Optional, Pattern, Tuple
+
+from loguru import logger
+
+RELEASE_PATTERN = re.compile(r'(?P<quarter>[1-4])Q(?P<year>\d{4})_ExternalCodeSets_v(?P<version>\d+)\.json')
+PACKAGE_DIRECTORY = Path(__file__).parent / 'json'
+
+
+@dataclass(frozen=True)
+class CodeSet:
+    """
+    A published code set: the list of codes, or for code sets published without one the allowed length of the
+    uppercase codes.
+    """
+    name: str
+    codes: FrozenSet[str] = frozenset()
+    min_length: int = 1
+    max_length: int = 35
+    pattern: Pattern = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'pattern', re.compile(f'^[A-Z]{{{self.min_length},{self.max_length}}}$'))
+
+    @classmethod
+    def from_definition(cls, name: str, definition: Mapping) -> 'CodeSet':
+        if (definition_type := definition.get('type')) != 'string':
+            raise ValueError(f'Unhandled type for {name}: {definition_type}')
+        return cls(name, frozenset(definition.get('enum') or ()), definition.get('minLength', 1),
+                   definition.get('maxLength', 35))
+
+    def is_valid(self, code: str) -> bool:
+        if self.codes:
+            return code in self.codes
+        return self.pattern.match(code) is not None
+
+    def error(self, code: str) -> str:
+        if self.codes:
+            return f'Invalid {self.name} code: `{code}`, allowed values are {", ".join(sorted(self.codes))}'
+        return f'Invalid {self.name} code: `{code}`, must match {self.pattern.pattern}'
+
+
+@dataclass(frozen=True)
+class CodeSetRelease:
+    """
+    The code sets of one published release, effective from `effective`.
+    """
+    version: str
+    effective: date
+    code_sets: Mapping[str, CodeSet]
+    revision: int = 1
+    path: Optional[Path] = None
+    mtime_ns: int = 0
+
+    @classmethod
+    def from_json(cls, path: str | Path, effective: Optional[date] = None) -> 'CodeSetRelease':
+        """
+        Load a release. The version (`4Q2022`), revision and effective date are taken from a file name following
+        `RELEASE_PATTERN`, `effective` is required for other file names.
+        """
+        path = Path(path)
+        match = RELEASE_PATTERN.fullmatch(path.name)
+        if match is not None:
+            version, revision = f'{match["quarter"]}Q{match["year"]}', int(match['version'])
+            effective = effective or date(int(match['year']), 3 * int(match['quarter']) - 2, 1)
+        elif effective is not None:
+            version, revision = path.stem, 1
+        else:
+            raise ValueError(f'No effective date for {path.name}, the name does not follow {RELEASE_PATTERN.pattern}')
+        with path.open(mode='r', encoding='utf-8') as f:
+            definitions = json.load(f)['definitions']
+        code_sets = {name: CodeSet.from_definition(name, definition) for name, definition in definitions.items()}
+        return cls(version, effective, code_sets, revision, path, path.stat().st_mtime_ns)
+
+
+class _Snapshot:
+    """
+    Releases sorted by effective date. Never changed once built.
+    """
+    __slots__ = ('releases', 'ordinals', 'latest')
+
+    def __init__(self, releases: Tuple[CodeSetRelease, ...]):
+        self.releases = releases
+        self.ordinals = [release.effective.toordinal() for release in releases]
+        self.latest = releases[-1].code_sets if releases else {}
+
+    def code_sets(self, on: Optional[date]) -> Mapping[str, CodeSet]:
+        if on is None or not self.releases:
+            return self.latest
+        # Dates before the first release are checked against the first one
+        return self.releases[max(bisect_right(self.ordinals, on.toordinal()) - 1, 0)].code_sets
+
+
+_as_of: ContextVar[Optional[date]] = ContextVar('code_sets_as_of', default=None)
+
+
+def as_of_date() -> Optional[date]:
+    """
+    The date set with `code_sets_as_of` in the current context, None for the latest release.
+    """
+    return _as_of.get()
+
+
+@contextmanager
+def code_sets_as_of(on: Optional[date | str]) -> Iterator[Optional[date]]:
+    """
+    Validate external codes against the release in effect on `on` within the block, in the current thread or task.
+    `on` may be a date, an ISO date string or None for the latest release.
+    """
+    if isinstance(on, str):
+        on = date.fromisoformat(on[:10])
+    token = _as_of.set(on)
+    try:
+        yield on
+    finally:
+        _as_of.reset(token)
+
+
+class CodeSetRegistry:
+    """
+    Releases of the external code sets, see the module documentation.
+    """
+
+    def __init__(self, directories: Tuple[str | Path, ...] = ()):
+        self._lock = threading.Lock()
+        self._directories: List[Path] = [Path(directory) for directory in directories]
+        self._snapshot = _Snapshot(())
+        # Modification time of every release file read by `refresh`, whether it was added or ignored
+        self._read: Dict[Path, int] = {}
+        self._hooks: List[Callable[['CodeSetRegistry'], None]] = []
+
+    @property
+    def releases(self) -> Tuple[CodeSetRelease, ...]:
+        return self._snapshot.releases
+
+    def code_set(self, name: str, on: Optional[date] = None) -> CodeSet:
+        """
+        The code set `name` in effect on `on`, by default on the date of `code_sets_as_of` or the latest one.
+        """
+        code_sets = self._snapshot.code_sets(on if on is not None else _as_of.get())
+        try:
+            return code_sets[name]
+        except KeyError:
+            raise ValueError(f'Unknown external code set: {name}') from None
+
+    def add(self, release: CodeSetRelease) -> bool:
+        """
+        Add a release. It replaces a loaded release of the same version unless that one has a higher revision.
+        Returns False if the release was ignored for that reason.
+        """
+        with self._lock:
+            releases = list(self._snapshot.releases)
+            if any(loaded.version == release.version and loaded.revision > release.revision for loaded in releases):
+                return False
+            releases = [loaded for loaded in releases if loaded.version != release.version] + [release]
+            self._snapshot = _Snapshot(tuple(sorted(releases, key=lambda loaded: loaded.effective)))
+            hooks = list(self._hooks)
+        for hook in hooks:
+            hook(self)
+        return True
+
+    def remove(self, version: str) -> None:
+        """
+        Withdraw a release, e.g. one loaded by mistake.
+        """
+        with self._lock:
+            self._snapshot = _Snapshot(tuple(loaded for loaded in self._snapshot.releases if loaded.version != version))
+            hooks = list(self._hooks)
+        for hook in hooks:
+            hook(self)
+
+    def load(self, path: str | Path, effective: Optional[date] = None) -> CodeSetRelease:
+        release = CodeSetRelease.from_json(path, effective)
+        self.add(release)
+        return release
+
+    def add_directory(self, directory: str | Path) -> None:
+        with self._lock:
+            if Path(directory) not in self._directories:
+                self._directories.append(Path(directory))
+
+    def refresh(self) -> List[CodeSetRelease]:
+        """
+        Load the releases of the registry directories that are new or changed since they were read, returns the
+        releases added. A file is not read again while it is unchanged, also if its release was ignored because a
+        higher revision of the same version is loaded. A file that cannot be read, e.g. one still being copied, is
+        logged and read again on the next refresh.
+        """
+        with self._lock:
+            directories = list(self._directories)
+            read = {release.path: release.mtime_ns for release in self._snapshot.releases}
+            read.update(self._read)
+        releases = []
+        for directory in directories:
+            for path in sorted(directory.glob('*_ExternalCodeSets_v*.json')):
+                try:
+                    mtime_ns = path.stat().st_mtime_ns
+                    if not RELEASE_PATTERN.fullmatch(path.name) or read.get(path) == mtime_ns:
+                        continue
+                    release = CodeSetRelease.from_json(path)
+                except (OSError, KeyError, ValueError) as e:
+                    logger.warning(f'Cannot load external code sets {path}: {type(e).__name__}: {e}')
+                    continue
+                if self.add(release):
+                    releases.append(release)
+                with self._lock:
+                    self._read[path] = mtime_ns
+        # A release replaced by a later revision read in the same refresh was not actually added
+        loaded = {id(release) for release in self._snapshot.releases}
+        return [release for release in releases if id(release) in loaded]
+
+    def bind(self, cls: type) -> type:
+        """
+        Validate the codes of model `cls` against the code set of its name (see `ExternalCodeStrBaseModel`) and keep
+        its `_valid_codes` and `_regex` in line with the latest release.
+        """
+        if cls.__name__ not in self._snapshot.latest:
+            raise ValueError(f'Unknown external code set: {cls.__name__}')
+        cls._code_set = cls.__name__
+        self._mirror(cls)
+        self.on_change(lambda registry: registry._mirror(cls))
+        return cls
+
+    def _mirror(self, cls: type) -> None:
+        code_set = self._snapshot.latest.get(cls._code_set)
+        if code_set is not None:
+            cls.set_valid_codes(set(code_set.codes))
+            cls.set_regex('' if code_set.codes else code_set.pattern.pattern)
+
+    def on_change(self, hook: Callable[['CodeSetRegistry'], None]) -> Callable[['CodeSetRegistry'], None]:
+        """
+        Register `hook` to be called with the registry after a release was added. Usable as a decorator.
+        """
+        with self._lock:
+            self._hooks.append(hook)
+        return hook
+
+
+registry = CodeSetRegistry((PACKAGE_DIRECTORY,))
+registry.refresh()
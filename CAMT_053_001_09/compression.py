@@ -0,0 +1,258 @@
+"""
+Transparent gzip and zstd compression for statement files.
+
+Compressed input is detected by its magic number, compressed output by the file suffix (`.gz`, `.zst`) or chosen
+explicitly. Decompression and compression are streaming and run in a background thread connected by a bounded queue,
+so they overlap with parsing and serialization without temp files or holding the whole file in memory. zstd needs
+the optional `zstandard` package.
+"""
+import gzip
+import io
+import queue
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+COMPRESSIONS = ('gzip', 'zstd')
+CHUNK_SIZE = 256 * 1024
+QUEUE_DEPTH = 8
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    """
+    Compression of a stream from its first bytes, None for uncompressed data.
+    """
+    if head.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if head.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+
+def compression_for_path(path: str | Path) -> Optional[str]:
+    return COMPRESSION_SUFFIXES.get(Path(path).suffix.lower())
+
+
+def uncompressed_path(path: str | Path) -> Path:
+    """
+    The path without its compression suffix, e.g. `statement.xml.gz` -> `statement.xml`.
+    """
+    path = Path(path)
+    return path.with_suffix('') if path.suffix.lower() in COMPRESSION_SUFFIXES else path
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise ValueError('zstd compression requires the zstandard package')
+
+
+class _ThreadedReader(io.RawIOBase):
+    """
+    Reads `stream` in a background thread, chunks are handed over through a bounded queue.
+    """
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = CHUNK_SIZE, depth: int = QUEUE_DEPTH):
+        super().__init__()
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._queue: queue.Queue = queue.Queue(depth)
+        self._buffer = memoryview(b'')
+        self._eof = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='camt053-decompress', daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> None:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                chunk = self._stream.read(self._chunk_size)
+                self._put(chunk)
+                if not chunk:
+                    return
+        except BaseException as e:
+            self._put(e)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._buffer and not self._eof:
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            self._eof = not item
+            self._buffer = memoryview(item)
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+            # Unblock a producer waiting on a full queue
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._stream.close()
+        super().close()
+
+
+class _ThreadedWriter(io.RawIOBase):
+    """
+    Writes to `stream` in a background thread. Small writes are collected into chunks of `chunk_size` bytes.
+    """
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = CHUNK_SIZE, depth: int = QUEUE_DEPTH):
+        super().__init__()
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._queue: queue.Queue = queue.Queue(depth)
+        self._pending = bytearray()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name='camt053-compress', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while (chunk := self._queue.get()) is not None:
+            if self._error is None:
+                try:
+                    self._stream.write(chunk)
+                except BaseException as e:
+                    self._error = e
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._check()
+        self._pending += data
+        if len(self._pending) >= self._chunk_size:
+            self._queue.put(bytes(self._pending))
+            self._pending.clear()
+        return len(data)
+
+    def flush(self) -> None:
+        # Only hands the pending bytes over, the compressed stream is flushed on close
+        if not self.closed and self._pending:
+            self._queue.put(bytes(self._pending))
+            self._pending.clear()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.flush()
+            self._queue.put(None)
+            self._thread.join()
+            self._stream.close()
+            super().close()
+            self._check()
+
+
+def _peek(stream: BinaryIO) -> tuple[BinaryIO, bytes]:
+    if hasattr(stream, 'peek'):
+        return stream, stream.peek(4)[:4]
+    if stream.seekable():
+        position = stream.tell()
+        head = stream.read(4)
+        stream.seek(position)
+        return stream, head
+    stream = io.BufferedReader(stream)
+    return stream, stream.peek(4)[:4]
+
+
+@contextmanager
+def open_input(source: str | Path | BinaryIO, threaded: bool = True) -> Iterator[BinaryIO]:
+    """
+    Open a file for reading, decompressing gzip and zstd data on the fly.
+    :param source: file path or binary file object, a file object passed in is not closed.
+    :param threaded: decompress in a background thread.
+    """
+    if isinstance(source, (str, Path)):
+        stream = open(source, 'rb')
+        owned = True
+    else:
+        stream, owned = source, False
+    try:
+        stream, head = _peek(stream)
+        compression = detect_compression(head)
+        if compression is None:
+            yield stream
+            return
+
+        if compression == 'gzip':
+            decompressed = gzip.GzipFile(fileobj=stream, mode='rb')
+        else:
+            _require_zstandard()
+            decompressed = zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True, closefd=False)
+        if threaded:
+            decompressed = io.BufferedReader(_ThreadedReader(decompressed), CHUNK_SIZE)
+        with decompressed:
+            yield decompressed
+    finally:
+        if owned:
+            stream.close()
+
+
+@contextmanager
+def open_output(target: str | Path | BinaryIO, compression: Optional[str] = None, level: Optional[int] = None,
+                threaded: bool = True) -> Iterator[BinaryIO]:
+    """
+    Open a file for writing, compressing on the fly.
+    :param target: file path or binary file object, a file object passed in is not closed.
+    :param compression: 'gzip', 'zstd' or None, defaults to the compression of the path suffix.
+    :param level: compression level, defaults to the library default.
+    :param threaded: compress in a background thread.
+    """
+    if compression is None and isinstance(target, (str, Path)):
+        compression = compression_for_path(target)
+    if compression not in (None, *COMPRESSIONS):
+        raise ValueError(f'Unknown compression: {compression}')
+    if compression == 'zstd':
+        _require_zstandard()
+
+    if isinstance(target, (str, Path)):
+        stream = open(target, 'wb')
+        owned = True
+    else:
+        stream, owned = target, False
+    try:
+        if compression is None:
+            yield stream
+            return
+
+        if compression == 'gzip':
+            compressed = gzip.GzipFile(fileobj=stream, mode='wb', compresslevel=6 if level is None else level)
+        else:
+            compressed = zstandard.ZstdCompressor(level=3 if level is None else level).stream_writer(
+                stream, closefd=False)
+        if threaded:
+            compressed = _ThreadedWriter(compressed)
+        with compressed:
+            yield compressed
+    finally:
+        if owned:
+            stream.close()
@@ -0,0 +1,231 @@
+import hashlib
+import math
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Set
+
+from CAMT_053_001_09.message_components import ReportEntry12
+
+
+def entry_fingerprint(entry: ReportEntry12) -> Optional[bytes]:
+    """
+    16-byte fingerprint of an entry, built from the fields a bank repeats unchanged when the same entry is reported
+    in several files: the references (account servicer reference, entry reference, end-to-end ID), booking date,
+    amount and currency, credit/debit indicator, bank transaction code and additional entry information.
+
+    None for entries without any reference: two identical card payments on the same day are legitimate entries that
+    no other field tells apart, so such entries are never treated as duplicates.
+    """
+    references = tuple(
+        field.value if field is not None else ''
+        for field in (entry.account_servicer_reference, entry.entry_reference, entry.end_to_end_id)
+    )
+    if not any(references):
+        return None
+    domain = entry.bank_transaction_code.domain
+    key = '\x1f'.join((
+        *references,
+        entry.booking_date.value if entry.booking_date is not None else '',
+        str(entry.amount.amount),
+        entry.amount.ccy,
+        entry.credit_debit_indicator.code,
+        domain.code.code,
+        domain.family.code.code,
+        domain.family.sub_family_code.code,
+        entry.additional_entry_information.value if entry.additional_entry_information is not None else '',
+    ))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over 16-byte fingerprints.
+    The bit positions are derived from the fingerprint itself by double hashing, no further hashing is done.
+    """
+
+    def __init__(self, size_bits: int, hash_count: int, bits: Optional[bytes] = None, count: int = 0):
+        if size_bits <= 0 or hash_count <= 0:
+            raise ValueError('size_bits and hash_count must be positive')
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bytearray(bits) if bits is not None else bytearray((size_bits + 7) // 8)
+        if len(self.bits) != (size_bits + 7) // 8:
+            raise ValueError(f'Expected {(size_bits + 7) // 8} bytes for {size_bits} bits, got {len(self.bits)}')
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> 'BloomFilter':
+        """
+        Size the filter for `capacity` fingerprints with a false positive rate of `error_rate`.
+        """
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError('capacity must be positive and error_rate between 0 and 1')
+        size_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hash_count = max(1, round(size_bits / capacity * math.log(2)))
+        return cls(size_bits, hash_count)
+
+    def _positions(self, fingerprint: bytes) -> Iterator[int]:
+        h1 = int.from_bytes(fingerprint[:8], 'little')
+        h2 = int.from_bytes(fingerprint[8:16], 'little') | 1
+        size_bits = self.size_bits
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % size_bits
+
+    def add(self, fingerprint: bytes) -> None:
+        bits = self.bits
+        for position in self._positions(fingerprint):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        bits = self.bits
+        for position in self._positions(fingerprint):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class EntryDeduplicator:
+    """
+    Cross-file entry deduplication.
+
+    New fingerprints are answered by the Bloom filter alone, only possible duplicates are confirmed against an exact
+    SQLite store. Filter and store are persisted in a single SQLite file, so the history of earlier runs is kept.
+
+    Usage::
+
+        with EntryDeduplicator('dedup.sqlite', capacity=10_000_000) as dedup:
+            for entry in dedup.filter(iter_entries('statement.xml')):
+                ...
+    """
+
+    def __init__(self, path: str | Path = ':memory:', capacity: int = 1_000_000, error_rate: float = 0.001,
+                 batch_size: Optional[int] = 10_000):
+        """
+        :param path: SQLite file holding the history, `:memory:` for a non-persistent deduplicator.
+        :param capacity: number of fingerprints the Bloom filter is sized for. It is ignored if a filter is loaded.
+        :param error_rate: false positive rate of the Bloom filter at `capacity`.
+        :param batch_size: number of new fingerprints collected before they are written to the store, None to write
+        them only on `flush` and `save` (e.g. at checkpoints, see `checkpoint.CheckpointStore`).
+        """
+        self._connection = sqlite3.connect(str(path))
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS fingerprint (value BLOB PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS bloom_filter (
+                id INTEGER PRIMARY KEY CHECK (id = 1), size_bits INTEGER, hash_count INTEGER, count INTEGER,
+                bits BLOB
+            );
+        """)
+        self.batch_size = batch_size
+        self._pending: Set[bytes] = set()
+        self.duplicates = 0
+        self.false_positives = 0
+        self.bloom = self._load_bloom_filter(capacity, error_rate)
+
+    def _load_bloom_filter(self, capacity: int, error_rate: float) -> BloomFilter:
+        row = self._connection.execute('SELECT size_bits, hash_count, count, bits FROM bloom_filter').fetchone()
+        stored = self._connection.execute('SELECT COUNT(*) FROM fingerprint').fetchone()[0]
+        if row is not None and row[2] == stored:
+            return BloomFilter(row[0], row[1], row[3], row[2])
+
+        # Missing or stale filter, e.g. after a crash before `save`: rebuild it from the exact store
+        bloom = BloomFilter(row[0], row[1]) if row is not None else BloomFilter.for_capacity(capacity, error_rate)
+        for (value,) in self._connection.execute('SELECT value FROM fingerprint'):
+            bloom.add(value)
+        return bloom
+
+    def _contains(self, fingerprint: bytes) -> bool:
+        if fingerprint not in self.bloom:
+            return False
+        if fingerprint in self._pending:
+            return True
+        if self._connection.execute('SELECT 1 FROM fingerprint WHERE value = ?', (fingerprint,)).fetchone():
+            return True
+        self.false_positives += 1
+        return False
+
+    def seen(self, entry: ReportEntry12) -> bool:
+        """
+        True if the entry has been added before, without adding it.
+        """
+        fingerprint = entry_fingerprint(entry)
+        return fingerprint is not None and self._contains(fingerprint)
+
+    def add(self, entry: ReportEntry12) -> bool:
+        """
+        Record the entry. Returns False if it is a duplicate of an entry added before. Entries without any reference
+        are not recorded and never duplicates, see `entry_fingerprint`.
+        """
+        fingerprint = entry_fingerprint(entry)
+        if fingerprint is None:
+            return True
+        if self._contains(fingerprint):
+            self.duplicates += 1
+            return False
+        self.bloom.add(fingerprint)
+        self._pending.add(fingerprint)
+        if self.batch_size is not None and len(self._pending) >= self.batch_size:
+            self.flush()
+        return True
+
+    def filter(self, entries: Iterable[ReportEntry12]) -> Iterator[ReportEntry12]:
+        """
+        Yield only the entries not seen before, recording them on the way.
+        """
+        add = self.add
+        for entry in entries:
+            if add(entry):
+                yield entry
+
+    def flush(self) -> None:
+        if self._pending:
+            with self._connection:
+                self._connection.executemany('INSERT OR IGNORE INTO fingerprint VALUES (?)',
+                                             ((value,) for value in self._pending))
+            self._pending.clear()
+
+    def pending(self) -> bytes:
+        """
+        The fingerprints added since the last flush, concatenated in sorted order.
+        """
+        return b''.join(sorted(self._pending))
+
+    def restore(self, fingerprints: bytes) -> None:
+        """
+        Add the concatenated fingerprints returned by `pending`, skipping those already known, and save.
+        """
+        for start in range(0, len(fingerprints), 16):
+            fingerprint = fingerprints[start:start + 16]
+            if not self._contains(fingerprint):
+                self.bloom.add(fingerprint)
+                self._pending.add(fingerprint)
+        self.save()
+
+    def discard(self) -> None:
+        """
+        Forget the fingerprints added since the last flush, e.g. those of a conversion that failed after its last
+        checkpoint. They remain in the Bloom filter, where they only cause false positives, but no longer count
+        towards the fingerprints it holds, so a saved filter still matches the store when it is loaded.
+        """
+        self.bloom.count -= len(self._pending)
+        self._pending.clear()
+
+    def save(self) -> None:
+        """
+        Write pending fingerprints and the Bloom filter to the SQLite file.
+        """
+        self.flush()
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO bloom_filter VALUES (1, ?, ?, ?, ?)',
+                (self.bloom.size_bits, self.bloom.hash_count, self.bloom.count, bytes(self.bloom.bits)))
+
+    def close(self) -> None:
+        self.save()
+        self._connection.close()
+
+    def __enter__(self) -> 'EntryDeduplicator':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
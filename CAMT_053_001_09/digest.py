@@ -0,0 +1,212 @@
+"""
+Streaming canonical XML digests of CAMT.053 documents.
+
+`CanonicalDigest` is fed the bytes of a document as they are written or read and computes in the same pass
+
+* the SHA-256 of the raw bytes,
+* the SHA-256 of the canonical form of the document (Canonical XML 2.0, as `xml.etree.ElementTree.canonicalize`),
+* the SHA-256 of every statement (`Stmt`) and entry (`Ntry`): of their part of the canonical document, from the
+  start tag to the end tag.
+
+The canonical digests do not depend on the serialization (XML declaration, attribute order and quoting, empty
+element syntax, character references), so a statement written by `StatementWriter` and the same statement received
+and re-serialized by a bank have the same digests::
+
+    with StatementWriter('statement.xml', message_id='MSG-1', digest=True) as writer:
+        ...
+    writer.digests.document, writer.digests.statements[0].entries
+
+    digest = CanonicalDigest()
+    for entry in iter_entries('received.xml', digest=digest):
+        ...
+    digest.result().statements
+"""
+import hashlib
+import io
+from dataclasses import dataclass, field
+from typing import BinaryIO, List, Optional
+from xml.etree.ElementTree import C14NWriterTarget, XMLParser
+
+from CAMT_053_001_09.compression import open_input
+
+DIGEST_TAGS = ('Stmt', 'Ntry')
+FLUSH_PIECES = 4096
+
+
+@dataclass
+class StatementDigest:
+    statement_id: Optional[str]
+    digest: str
+    entries: List[str] = field(default_factory=list)
+
+
+@dataclass
+class DocumentDigests:
+    raw: str
+    document: str
+    statements: List[StatementDigest]
+
+    @property
+    def entries(self) -> List[str]:
+        return [entry for statement in self.statements for entry in statement.entries]
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition('}')[2]
+
+
+class _DigestTarget(C14NWriterTarget):
+    """
+    Canonicalizing parser target that also hashes the canonical text of the elements in `DIGEST_TAGS`.
+    """
+
+    def __init__(self):
+        self.document = hashlib.sha256()
+        self.statements: List[StatementDigest] = []
+        self._pieces: List[str] = []
+        self._active: list = []
+        self._opening = None
+        self._path: List[str] = []
+        self._statement_id: Optional[List[str]] = None
+        super().__init__(self._write)
+
+    def _write(self, text: str) -> None:
+        # The start tag of a digested element is the first piece starting with '<' after `start`, text written before
+        # it belongs to the parent (text is escaped, it never starts with '<')
+        if self._opening is not None and text.startswith('<'):
+            self.flush()
+            self._active.append(self._opening)
+            self._opening = None
+        self._pieces.append(text)
+        if len(self._pieces) >= FLUSH_PIECES:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Hash the pending canonical text into the document and the elements being digested.
+        """
+        data = ''.join(self._pieces).encode('utf-8')
+        self._pieces.clear()
+        self.document.update(data)
+        for sha in self._active:
+            sha.update(data)
+
+    def start(self, tag, attrs):
+        name = _local_name(tag)
+        self._path.append(name)
+        if name == 'Stmt':
+            self.statements.append(StatementDigest(None, ''))
+            self._statement_id = []
+        if name in DIGEST_TAGS:
+            self._opening = hashlib.sha256()
+        super().start(tag, attrs)
+
+    def data(self, data):
+        if self._statement_id is not None and self._path[-2:] == ['Stmt', 'Id']:
+            self._statement_id.append(data)
+        super().data(data)
+
+    def end(self, tag):
+        super().end(tag)
+        name = self._path.pop()
+        if name == 'Id' and self._path[-1:] == ['Stmt'] and self._statement_id is not None:
+            self.statements[-1].statement_id = ''.join(self._statement_id).strip()
+            self._statement_id = None
+        if name in DIGEST_TAGS:
+            self.flush()
+            digest = self._active.pop().hexdigest()
+            if name == 'Stmt':
+                self.statements[-1].digest = digest
+            elif self.statements:
+                self.statements[-1].entries.append(digest)
+
+
+class CanonicalDigest:
+    """
+    Incremental digests of a document fed in chunks of bytes, see the module documentation.
+    """
+
+    def __init__(self):
+        self._raw = hashlib.sha256()
+        self._target = _DigestTarget()
+        self._parser = XMLParser(target=self._target)
+        self._result: Optional[DocumentDigests] = None
+
+    def feed(self, data: bytes) -> None:
+        if self._result is not None:
+            raise ValueError('The digest is already complete')
+        self._raw.update(data)
+        self._parser.feed(data)
+
+    def result(self) -> DocumentDigests:
+        """
+        Finish the document and return its digests.
+        """
+        if self._result is None:
+            self._parser.close()
+            self._target.flush()
+            self._result = DocumentDigests(self._raw.hexdigest(), self._target.document.hexdigest(),
+                                           self._target.statements)
+        return self._result
+
+
+class DigestingReader(io.RawIOBase):
+    """
+    Read `stream` and feed every byte read to `digest`.
+    """
+
+    def __init__(self, stream: BinaryIO, digest: CanonicalDigest):
+        super().__init__()
+        self._stream = stream
+        self.digest = digest
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        count = len(data)
+        buffer[:count] = data
+        if count:
+            self.digest.feed(data)
+        return count
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        if data:
+            self.digest.feed(data)
+        return data
+
+
+class DigestingWriter(io.RawIOBase):
+    """
+    Write to `stream` and feed every byte written to `digest`.
+    """
+
+    def __init__(self, stream: BinaryIO, digest: CanonicalDigest):
+        super().__init__()
+        self._stream = stream
+        self.digest = digest
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._stream.write(data)
+        self.digest.feed(data)
+        return len(data)
+
+    def flush(self) -> None:
+        self._stream.flush()
+
+
+def digest_file(source, chunk_size: int = 256 * 1024) -> DocumentDigests:
+    """
+    Digests of a file or binary stream, gzip or zstd compressed or not.
+    """
+    digest = CanonicalDigest()
+    with open_input(source) as stream:
+        while chunk := stream.read(chunk_size):
+            digest.feed(chunk)
+    return digest.result()
@@ -0,0 +1,297 @@
+"""
+Streaming converter for InteractiveBrokers FlexQuery XML (Activity Flex Query) files.
+
+`CashTransaction` and `Trade` records are mapped to CAMT.053 entries, one statement per account and currency.
+The file is parsed incrementally and every record is released after conversion, so memory use does not depend on
+the size of the export.
+"""
+from contextlib import ExitStack
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from lxml.etree import iterparse
+
+from CAMT_053_001_09.checkpoint import CheckpointStore, CountingReader, balance_from_state, balance_to_state
+from CAMT_053_001_09.code_sets import code_sets_as_of
+from CAMT_053_001_09.compression import open_input
+from CAMT_053_001_09.dedup import EntryDeduplicator
+from CAMT_053_001_09.message_components import BankTransactionCodeStructure4, BankTransactionCodeStructure5, \
+    BankTransactionCodeStructure6, CashBalance8, ReportEntry12
+from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyAndAmount, CreditDebitCode, \
+    ExternalBalanceType1Code, ExternalBankTransactionDomain1Code, ExternalBankTransactionFamily1Code, \
+    ExternalBankTransactionSubFamily1Code, ExternalEntryStatus1Code, ISODate, ISODateTime, Max35Text, Max500Text
+from CAMT_053_001_09.writer import StatementSession, StatementWriter
+
+# FlexQuery cash transaction type -> (domain, family, sub-family) for (credits, debits)
+CASH_TRANSACTION_CODES: Dict[str, Tuple[Tuple[str, str, str], Tuple[str, str, str]]] = {
+    'Deposits/Withdrawals': (('PMNT', 'RCDT', 'OTHR'), ('PMNT', 'ICDT', 'OTHR')),
+    'Dividends': (('SECU', 'CUST', 'DVCA'), ('SECU', 'CUST', 'DVCA')),
+    'Payment In Lieu Of Dividends': (('SECU', 'CUST', 'DVCA'), ('SECU', 'CUST', 'DVCA')),
+    'Withholding Tax': (('ACMT', 'MCOP', 'TAXE'), ('ACMT', 'MDOP', 'TAXE')),
+    'Broker Interest Received': (('ACMT', 'MCOP', 'INTR'), ('ACMT', 'MDOP', 'INTR')),
+    'Broker Interest Paid': (('ACMT', 'MCOP', 'INTR'), ('ACMT', 'MDOP', 'INTR')),
+    'Bond Interest Received': (('SECU', 'CUST', 'INTR'), ('SECU', 'CUST', 'INTR')),
+    'Bond Interest Paid': (('SECU', 'CUST', 'INTR'), ('SECU', 'CUST', 'INTR')),
+    'Other Fees': (('ACMT', 'MCOP', 'FEES'), ('ACMT', 'MDOP', 'FEES')),
+    'Commission Adjustments': (('ACMT', 'MCOP', 'COMM'), ('ACMT', 'MDOP', 'COMM')),
+}
+DEFAULT_CASH_TRANSACTION_CODES = (('ACMT', 'MCOP', 'OTHR'), ('ACMT', 'MDOP', 'OTHR'))
+TRADE_CODES = ('SECU', 'SETT', 'TRAD')
+FX_TRADE_CODES = ('FORX', 'SPOT', 'OTHR')
+
+
+def parse_flex_date(value: str) -> str:
+    """
+    FlexQuery dates are configurable, `yyyyMMdd`, `yyyy-MM-dd` and `MM/dd/yyyy` are accepted. Returns YYYY-MM-DD.
+    """
+    value = value.split(';')[0].strip()
+    if '/' in value:
+        month, day, year = value.split('/')
+        return f'{year}-{month}-{day}'
+    value = value.replace('-', '')
+    if len(value) != 8 or not value.isdigit():
+        raise ValueError(f'Invalid FlexQuery date: {value}')
+    return f'{value[:4]}-{value[4:6]}-{value[6:]}'
+
+
+def parse_flex_date_time(value: str) -> str:
+    """
+    FlexQuery date times are a date and a `HHmmss` time separated by `;`, e.g. `20230105;202000`.
+    Returns YYYY-MM-DDTHH:MM:SS.
+    """
+    date_part, _, time_part = value.partition(';')
+    time_part = time_part.replace(':', '') or '000000'
+    return f'{parse_flex_date(date_part)}T{time_part[:2]}:{time_part[2:4]}:{time_part[4:6]}'
+
+
+def _bank_transaction_code(codes: Tuple[str, str, str]) -> BankTransactionCodeStructure4:
+    domain, family, sub_family = codes
+    return BankTransactionCodeStructure4(domain=BankTransactionCodeStructure5(
+        code=ExternalBankTransactionDomain1Code(code=domain),
+        family=BankTransactionCodeStructure6(
+            code=ExternalBankTransactionFamily1Code(code=family),
+            sub_family_code=ExternalBankTransactionSubFamily1Code(code=sub_family),
+        ),
+    ))
+
+
+def _make_entry(amount: Decimal, ccy: str, codes: Tuple[str, str, str], booking_date: str,
+                value_date: Optional[str], reference: Optional[str], description: Optional[str]) -> ReportEntry12:
+    return ReportEntry12(
+        amount=ActiveOrHistoricCurrencyAndAmount(amount=abs(amount), ccy=ccy),
+        credit_debit_indicator=CreditDebitCode(code='CRDT' if amount >= 0 else 'DBIT'),
+        status=ExternalEntryStatus1Code(code='BOOK'),
+        booking_date=ISODate(value=parse_flex_date(booking_date)),
+        value_date=ISODate(value=parse_flex_date(value_date)) if value_date else None,
+        account_servicer_reference=Max35Text(value=reference) if reference else None,
+        bank_transaction_code=_bank_transaction_code(codes),
+        additional_entry_information=Max500Text(value=description[:500]) if description else None,
+    )
+
+
+def cash_transaction_to_entry(attributes: Dict[str, str]) -> ReportEntry12:
+    """
+    Map the attributes of a `CashTransaction` record to an entry.
+    """
+    amount = Decimal(attributes['amount'])
+    credit_codes, debit_codes = CASH_TRANSACTION_CODES.get(attributes.get('type'), DEFAULT_CASH_TRANSACTION_CODES)
+    booking_date = attributes.get('settleDate') or attributes.get('reportDate') or attributes['dateTime']
+    return _make_entry(
+        amount, attributes['currency'], credit_codes if amount >= 0 else debit_codes, booking_date,
+        attributes.get('settleDate'), attributes.get('transactionID'), attributes.get('description'),
+    )
+
+
+def trade_to_entry(attributes: Dict[str, str]) -> ReportEntry12:
+    """
+    Map the attributes of a `Trade` record to an entry. The net cash includes commissions and taxes.
+    """
+    amount = Decimal(attributes['netCash'])
+    codes = FX_TRADE_CODES if attributes.get('assetCategory') == 'CASH' else TRADE_CODES
+    settle_date = attributes.get('settleDateTarget') or attributes.get('settleDate')
+    description = ' '.join(filter(None, (attributes.get('buySell'), attributes.get('quantity'),
+                                         attributes.get('symbol'), attributes.get('description'))))
+    return _make_entry(
+        amount, attributes['currency'], codes, settle_date or attributes['tradeDate'], settle_date,
+        attributes.get('transactionID') or attributes.get('tradeID'), description,
+    )
+
+
+def _is_detail(attributes: Dict[str, str], levels: Tuple[str, ...]) -> bool:
+    level = attributes.get('levelOfDetail')
+    return level is None or level.upper() in levels
+
+
+@dataclass
+class FlexRecord:
+    """
+    A record of a FlexQuery file with the attributes of its enclosing `FlexStatement`.
+    """
+    tag: str
+    statement: Dict[str, str]
+    attributes: Dict[str, str]
+
+
+def iter_records(source: str | Path | BinaryIO) -> Iterator[FlexRecord]:
+    """
+    Stream the records needed for the conversion: the `FlexQueryResponse` root first, then the `CashReportCurrency`,
+    `CashTransaction` (detail level) and `Trade` (execution level) records, and a `FlexStatement` record at the end
+    of every statement. Every finished element is released, including the sections that are not converted.
+    :param source: file path or binary file object, gzip or zstd compressed or not.
+    """
+    statement: Dict[str, str] = {}
+    with open_input(source) as stream:
+        for event, element in iterparse(stream, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                if tag == 'FlexQueryResponse':
+                    yield FlexRecord(tag, {}, dict(element.attrib))
+                elif tag == 'FlexStatement':
+                    statement = dict(element.attrib)
+                continue
+
+            if (tag == 'CashReportCurrency'
+                    or tag == 'CashTransaction' and _is_detail(element.attrib, ('DETAIL',))
+                    or tag == 'Trade' and _is_detail(element.attrib, ('EXECUTION',))):
+                yield FlexRecord(tag, statement, dict(element.attrib))
+            elif tag == 'FlexStatement':
+                yield FlexRecord(tag, statement, statement)
+
+            if tag not in ('FlexQueryResponse', 'FlexStatements'):
+                element.clear(keep_tail=True)
+                parent = element.getparent()
+                while parent is not None and element.getprevious() is not None:
+                    del parent[0]
+
+
+def record_to_entry(record: FlexRecord) -> ReportEntry12:
+    """
+    The entry of a `CashTransaction` or `Trade` record, its codes validated against the external code sets in effect
+    at the end of its statement (`toDate`).
+    """
+    if record.tag not in ('CashTransaction', 'Trade'):
+        raise ValueError(f'Not an entry record: {record.tag}')
+    to_date = record.statement.get('toDate')
+    with code_sets_as_of(parse_flex_date(to_date) if to_date else None):
+        if record.tag == 'CashTransaction':
+            return cash_transaction_to_entry(record.attributes)
+        return trade_to_entry(record.attributes)
+
+
+def cash_report_to_balance(record: FlexRecord) -> Optional[CashBalance8]:
+    """
+    Opening balance from the starting cash of a `CashReportCurrency` record, None for the base currency summary.
+    """
+    attributes = record.attributes
+    ccy = attributes.get('currency')
+    if not ccy or ccy == 'BASE_SUMMARY' or attributes.get('startingCash') is None:
+        return None
+    starting_cash = Decimal(attributes['startingCash'])
+    return CashBalance8(
+        type=ExternalBalanceType1Code(code='OPBD'),
+        amount=ActiveOrHistoricCurrencyAndAmount(amount=abs(starting_cash), ccy=ccy),
+        credit_debit_indicator=CreditDebitCode(code='CRDT' if starting_cash >= 0 else 'DBIT'),
+        date=ISODate(value=parse_flex_date(attributes.get('fromDate') or record.statement['fromDate'])),
+    )
+
+
+def statement_header(statement: Dict[str, str], ccy: str) -> Dict[str, Any]:
+    """
+    Keyword arguments of `StatementWriter.statement` for the `ccy` statement of a `FlexStatement`.
+    """
+    account_id, to_date = statement.get('accountId'), statement.get('toDate')
+    when_generated = statement.get('whenGenerated')
+    return dict(
+        statement_id=f'{account_id}-{ccy}-{to_date}'[:35],
+        account=account_id,
+        currency=ccy,
+        closing_date=ISODate(value=parse_flex_date(to_date)) if to_date else None,
+        creation_date_time=ISODateTime(value=parse_flex_date_time(when_generated)) if when_generated else None,
+    )
+
+
+def convert_flexquery(source: str | Path | BinaryIO, target: str | Path | BinaryIO,
+                      message_id: Optional[str] = None, deduplicator: Optional[EntryDeduplicator] = None,
+                      checkpoints: Optional[CheckpointStore] = None) -> int:
+    """
+    Convert a FlexQuery XML file into a CAMT.053 file in a single streaming pass.
+    :param source: FlexQuery XML file path or binary file object.
+    :param target: CAMT.053 file path or binary file object.
+    :param message_id: group header message identification, defaults to the FlexQuery query name.
+    :param deduplicator: optional deduplicator, entries already seen are dropped.
+    :param checkpoints: checkpoint the conversion to this store, and resume from its checkpoint if there is one.
+    The target must be an uncompressed file path, the source must be the same when resuming.
+    :return: number of entries written.
+    """
+    with ExitStack() as stack:
+        counter = None
+        if checkpoints is not None:
+            counter = CountingReader(stack.enter_context(open_input(source)))
+            source = counter
+        checkpoint = checkpoints.load() if checkpoints is not None else None
+
+        records = iter_records(source)
+        # the message id is taken from the root element, which has to be seen before the writer is opened
+        root = next(records, None)
+        if root is None or root.tag != 'FlexQueryResponse':
+            raise ValueError('Not a FlexQuery file, missing FlexQueryResponse root element')
+        message_id = message_id or root.attributes.get('queryName') or 'FLEXQUERY'
+        consumed = 1
+        written = 0
+        state: Dict[str, Any] = {}
+
+        if checkpoint is not None:
+            # Records up to the checkpoint are parsed again, but not converted
+            for _ in islice(records, checkpoint.records - consumed):
+                consumed += 1
+            if (consumed, counter.offset, counter.hexdigest()) != \
+                    (checkpoint.records, checkpoint.input_offset, checkpoint.input_digest):
+                raise ValueError('The source does not match the checkpoint')
+            if deduplicator is not None:
+                checkpoints.restore_deduplicator(checkpoint, deduplicator)
+            state = checkpoint.state
+            written = state['written']
+
+        with StatementWriter(target, message_id=message_id[:35], deduplicator=deduplicator, checkpoints=checkpoints,
+                             resume=checkpoint.writer if checkpoint is not None else None) as writer:
+            open_sessions = writer.open_sessions
+            sessions: Dict[str, StatementSession] = {
+                ccy: open_sessions[index] for ccy, index in state.get('sessions', {}).items()}
+            opening_balances: Dict[str, CashBalance8] = {
+                ccy: balance_from_state(balance) for ccy, balance in state.get('opening_balances', {}).items()}
+
+            for record in records:
+                consumed += 1
+                if record.tag == 'CashReportCurrency':
+                    balance = cash_report_to_balance(record)
+                    if balance is not None:
+                        opening_balances[balance.amount.ccy] = balance
+                        if balance.amount.ccy in sessions:
+                            sessions[balance.amount.ccy].opening_balance = balance
+                elif record.tag == 'FlexStatement':
+                    for session in sessions.values():
+                        session.close()
+                    sessions.clear()
+                    opening_balances.clear()
+                else:
+                    entry = record_to_entry(record)
+                    ccy = entry.amount.ccy
+                    if ccy not in sessions:
+                        sessions[ccy] = writer.statement(**statement_header(record.statement, ccy),
+                                                         opening_balance=opening_balances.get(ccy))
+                    written += sessions[ccy].write_entry(entry)
+
+                if checkpoints is not None and checkpoints.due(consumed):
+                    open_sessions = writer.open_sessions
+                    checkpoints.save(consumed, counter, writer, dict(
+                        written=written,
+                        sessions={ccy: open_sessions.index(session) for ccy, session in sessions.items()},
+                        opening_balances={ccy: balance_to_state(balance) for ccy, balance in opening_balances.items()},
+                    ), deduplicator)
+
+    if checkpoints is not None:
+        checkpoints.clear()
+    return written
@@ -0,0 +1,117 @@
+"""
+Vectorized export of entries to Arrow tables and pandas DataFrames.
+
+Entries are unpacked once into typed columns, without a per-row `.dict()`:
+
+* `amount`: int64 minor units, with the currency in `ccy`,
+* `booking_date`, `value_date`: dates (`datetime64` in pandas, missing dates are NaT),
+* currency and codes: categorical (dictionary) columns, the categories are the valid codes of the code set where
+  it lists them, so frames built from different files share the same categories,
+* references and texts: strings.
+
+`pyarrow` and `pandas` are optional, each function needs its own library.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from CAMT_053_001_09.cache import COLUMNS, entries_to_columns
+from CAMT_053_001_09.message_components import ReportEntry12
+from CAMT_053_001_09.message_datatypes import CreditDebitCode, ExternalBankTransactionDomain1Code, \
+    ExternalBankTransactionFamily1Code, ExternalBankTransactionSubFamily1Code, ExternalEntryStatus1Code
+
+try:
+    import pyarrow
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+try:
+    import pandas
+except ImportError:  # pragma: no cover - optional dependency
+    pandas = None
+
+DATE_COLUMNS = ('booking_date', 'value_date')
+CODE_SETS = {
+    'credit_debit_indicator': CreditDebitCode,
+    'status': ExternalEntryStatus1Code,
+    'domain': ExternalBankTransactionDomain1Code,
+    'family': ExternalBankTransactionFamily1Code,
+    'sub_family': ExternalBankTransactionSubFamily1Code,
+}
+CATEGORICAL_COLUMNS = ('ccy', *CODE_SETS)
+
+
+def categories(name: str, values: Iterable[Optional[str]]) -> List[str]:
+    """
+    Categories of a code column: the valid codes of its code set, extended by the values not listed there (code
+    sets defined by a pattern only, currencies).
+    """
+    code_set = CODE_SETS.get(name)
+    valid_codes = set(code_set._valid_codes) if code_set is not None else set()
+    return sorted(valid_codes) + sorted({value for value in values if value is not None} - valid_codes)
+
+
+def _require(module: Any, name: str) -> None:
+    if module is None:
+        raise ValueError(f'This export requires the {name} package')
+
+
+def _record_batch(columns: Dict[str, List[Any]]) -> 'pyarrow.RecordBatch':
+    arrays = {}
+    for name in COLUMNS:
+        values = columns[name]
+        if name == 'amount':
+            arrays[name] = pyarrow.array(values, pyarrow.int64())
+        elif name in DATE_COLUMNS:
+            arrays[name] = pyarrow.array(values, pyarrow.string()).cast(pyarrow.date32())
+        elif name in CATEGORICAL_COLUMNS:
+            dictionary = categories(name, values)
+            index = {value: code for code, value in enumerate(dictionary)}
+            arrays[name] = pyarrow.DictionaryArray.from_arrays(
+                pyarrow.array([index.get(value) for value in values], pyarrow.int32()),
+                pyarrow.array(dictionary, pyarrow.string()))
+        else:
+            arrays[name] = pyarrow.array(values, pyarrow.string())
+    return pyarrow.RecordBatch.from_pydict(arrays)
+
+
+def iter_record_batches(entries: Iterable[ReportEntry12], batch_size: int = 65_536) -> \
+        Iterator['pyarrow.RecordBatch']:
+    """
+    Arrow record batches of `batch_size` entries, only one batch of plain columns is held at a time.
+    """
+    _require(pyarrow, 'pyarrow')
+    batch: List[ReportEntry12] = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == batch_size:
+            yield _record_batch(entries_to_columns(batch))
+            batch = []
+    if batch:
+        yield _record_batch(entries_to_columns(batch))
+
+
+def to_arrow(entries: Iterable[ReportEntry12], batch_size: int = 65_536) -> 'pyarrow.Table':
+    """
+    Arrow table of the entries. The dictionaries of the code columns are unified across batches.
+    """
+    batches = list(iter_record_batches(entries, batch_size)) or [_record_batch(entries_to_columns([]))]
+    return pyarrow.Table.from_batches(batches).unify_dictionaries()
+
+
+def to_dataframe(entries: Iterable[ReportEntry12]) -> 'pandas.DataFrame':
+    """
+    pandas DataFrame of the entries, built column by column.
+    """
+    _require(pandas, 'pandas')
+    columns = entries_to_columns(entries)
+    data = {}
+    for name in COLUMNS:
+        values = columns[name]
+        if name == 'amount':
+            data[name] = pandas.array(values, dtype='int64')
+        elif name in DATE_COLUMNS:
+            data[name] = pandas.to_datetime(pandas.Series(values, dtype=object), format='%Y-%m-%d')
+        elif name in CATEGORICAL_COLUMNS:
+            data[name] = pandas.Categorical(values, categories=categories(name, values))
+        else:
+            data[name] = pandas.array(values, dtype='string')
+    return pandas.DataFrame(data)
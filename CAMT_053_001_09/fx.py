@@ -0,0 +1,211 @@
+"""
+Valuation of amounts in a base currency with a local table of exchange rates.
+
+A rate table holds, for every currency pair, the rates sorted by date. An amount is converted with the rate in effect
+on its date (the last rate on or before it) and rounded half up to the minor unit of the target currency::
+
+    rates = RateTable.from_csv('rates.csv')         # columns date, from, to, rate: 1 `from` = `rate` `to`
+    rates.convert(entry.amount, 'CHF', entry.booking_date)
+
+    columns = entries_to_columns(entries)
+    chf = rates.convert_columns(columns['amount'], columns['ccy'], columns['booking_date'], 'CHF')
+
+`convert_columns` converts whole columns of minor units at once with NumPy (`searchsorted` for the rates in effect,
+one multiplication per currency). Products are computed in float64 and checked: a product too close to a rounding
+boundary or too large for float64 to round correctly is recomputed exactly, so both APIs give the same result,
+`quantize_amount` of the exact product. A pair missing in the table is converted with the inverse rate if present.
+
+`numpy` is optional, it is only needed by `convert_columns`.
+"""
+import csv
+import io
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date
+from fractions import Fraction
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from CAMT_053_001_09.base_models import AmountBaseModel, currency_decimal_places, from_minor_units, to_minor_units
+from CAMT_053_001_09.compression import open_input
+from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyAndAmount, ActiveOrHistoricCurrencyCode, \
+    ISODate
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+RATE_COLUMNS = ('date', 'from', 'to', 'rate')
+# Products whose fractional part is closer than this (relative to the product) to .5 are recomputed exactly; float64
+# products of a rate rounded to float64 are within a few 2**-53 of the exact value
+ROUNDING_TOLERANCE = 2.0 ** -48
+# Beyond 2**52 float64 no longer represents every half, rounding is done exactly
+MAX_FLOAT_PRODUCT = 2.0 ** 52
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _ordinal(value: date | str | ISODate) -> int:
+    if isinstance(value, ISODate):
+        value = value.value
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal()
+
+
+def _round_half_up(value: Fraction) -> int:
+    """Round to an integer, halves away from zero like `ROUND_HALF_UP`."""
+    rounded = (abs(value.numerator) * 2 + value.denominator) // (value.denominator * 2)
+    return rounded if value >= 0 else -rounded
+
+
+def _scale(from_ccy: str, to_ccy: str) -> Fraction:
+    # Factor from minor units of `from_ccy` to minor units of `to_ccy`
+    return Fraction(10) ** (currency_decimal_places(to_ccy) - currency_decimal_places(from_ccy))
+
+
+class PairRates:
+    """
+    Rates of one currency pair sorted by date, as lists for lookups of single dates and as NumPy arrays (built on
+    first use) for columns.
+    """
+
+    def __init__(self, from_ccy: str, to_ccy: str, rates: Dict[int, Fraction]):
+        self.from_ccy = from_ccy
+        self.to_ccy = to_ccy
+        self.dates = sorted(rates)
+        self.rates = [rates[ordinal] for ordinal in self.dates]
+        self._arrays: Optional[Tuple[Any, Any]] = None
+
+    def index(self, ordinal: int) -> int:
+        index = bisect_right(self.dates, ordinal) - 1
+        if index < 0:
+            raise ValueError(f'No {self.from_ccy}/{self.to_ccy} rate on or before {date.fromordinal(ordinal)}')
+        return index
+
+    def rate(self, ordinal: int) -> Fraction:
+        return self.rates[self.index(ordinal)]
+
+    def arrays(self) -> Tuple['numpy.ndarray', 'numpy.ndarray']:
+        """
+        Dates as int64 day ordinals and rates as float64.
+        """
+        if self._arrays is None:
+            self._arrays = (numpy.array(self.dates, dtype=numpy.int64),
+                            numpy.array([float(rate) for rate in self.rates], dtype=numpy.float64))
+        return self._arrays
+
+    def inverse(self) -> 'PairRates':
+        return PairRates(self.to_ccy, self.from_ccy, {ordinal: 1 / rate for ordinal, rate in
+                                                      zip(self.dates, self.rates)})
+
+
+class RateTable:
+    """
+    Exchange rates by currency pair and date. `rates` are `(date, from, to, rate)` tuples, 1 `from` is `rate` `to`;
+    a later tuple for the same pair and date replaces an earlier one.
+    """
+
+    def __init__(self, rates: Iterable[Tuple[date | str, str, str, Any]]):
+        by_pair: Dict[Tuple[str, str], Dict[int, Fraction]] = defaultdict(dict)
+        for day, from_ccy, to_ccy, rate in rates:
+            rate = Fraction(rate)
+            if rate <= 0:
+                raise ValueError(f'Invalid {from_ccy}/{to_ccy} rate on {day}: {rate}')
+            by_pair[from_ccy, to_ccy][_ordinal(day)] = rate
+        self._pairs: Dict[Tuple[str, str], PairRates] = {
+            (from_ccy, to_ccy): PairRates(ActiveOrHistoricCurrencyCode(from_ccy), ActiveOrHistoricCurrencyCode(to_ccy),
+                                          rates)
+            for (from_ccy, to_ccy), rates in by_pair.items()}
+        self._inverse: Dict[Tuple[str, str], PairRates] = {}
+
+    @classmethod
+    def from_csv(cls, source: str | Path | BinaryIO) -> 'RateTable':
+        """
+        Load a CSV file with a header and the columns of `RATE_COLUMNS`, gzip or zstd compressed or not.
+        """
+        with open_input(source) as stream:
+            reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8', newline=''))
+            missing = set(RATE_COLUMNS) - set(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f'Rate table without the columns {", ".join(sorted(missing))}')
+            # Rates go through str to Fraction, so '1.0825' is exact
+            return cls((row['date'], row['from'], row['to'], row['rate'].strip()) for row in reader)
+
+    @property
+    def pairs(self) -> List[Tuple[str, str]]:
+        return sorted(self._pairs)
+
+    def pair(self, from_ccy: str, to_ccy: str) -> PairRates:
+        """
+        Rates of a pair, derived from the inverse pair if only that one is in the table.
+        """
+        rates = self._pairs.get((from_ccy, to_ccy)) or self._inverse.get((from_ccy, to_ccy))
+        if rates is None:
+            inverse = self._pairs.get((to_ccy, from_ccy))
+            if inverse is None:
+                raise ValueError(f'No {from_ccy}/{to_ccy} rates')
+            rates = self._inverse[from_ccy, to_ccy] = inverse.inverse()
+        return rates
+
+    def rate(self, from_ccy: str, to_ccy: str, on: date | str | ISODate) -> Fraction:
+        """
+        Rate in effect on `on`: the last rate of the pair on or before it.
+        """
+        if from_ccy == to_ccy:
+            return Fraction(1)
+        return self.pair(from_ccy, to_ccy).rate(_ordinal(on))
+
+    def convert_minor_units(self, minor: int, from_ccy: str, to_ccy: str, on: date | str | ISODate) -> int:
+        if from_ccy == to_ccy:
+            return minor
+        return _round_half_up(minor * self.rate(from_ccy, to_ccy, on) * _scale(from_ccy, to_ccy))
+
+    def convert(self, amount: AmountBaseModel, to_ccy: str, on: date | str | ISODate) -> \
+            ActiveOrHistoricCurrencyAndAmount:
+        """
+        `amount` in `to_ccy` at the rate in effect on `on`, rounded half up to the minor unit of `to_ccy`.
+        """
+        minor = self.convert_minor_units(to_minor_units(amount.amount, amount.ccy), amount.ccy, to_ccy, on)
+        return ActiveOrHistoricCurrencyAndAmount(amount=from_minor_units(minor, to_ccy), ccy=to_ccy)
+
+    def convert_columns(self, amounts: Sequence[int], currencies: Sequence[str], dates: Sequence[Optional[str]],
+                        to_ccy: str) -> 'numpy.ndarray':
+        """
+        Convert a column of amounts in minor units (e.g. the `amount`, `ccy` and `booking_date` columns of
+        `cache.entries_to_columns`) into an int64 array of minor units of `to_ccy`.
+        """
+        if numpy is None:
+            raise ValueError('Converting columns requires the numpy package')
+        amounts = numpy.asarray(amounts, dtype=numpy.int64)
+        currencies = numpy.asarray(currencies, dtype=object)
+        days = numpy.asarray(dates, dtype='datetime64[D]')
+        missing = numpy.isnat(days)
+        ordinals = days.astype(numpy.int64) + EPOCH_ORDINAL
+        result = amounts.copy()
+        for from_ccy in numpy.unique(currencies):
+            if from_ccy == to_ccy:
+                continue
+            rows = numpy.flatnonzero(currencies == from_ccy)
+            if missing[rows].any():
+                raise ValueError(f'{from_ccy} amounts without date')
+            rates = self.pair(from_ccy, to_ccy)
+            rate_dates, rate_values = rates.arrays()
+            indices = numpy.searchsorted(rate_dates, ordinals[rows], side='right') - 1
+            if (indices < 0).any():
+                first = date.fromordinal(int(ordinals[rows][indices < 0].min()))
+                raise ValueError(f'No {from_ccy}/{to_ccy} rate on or before {first}')
+            scale = _scale(from_ccy, to_ccy)
+            products = amounts[rows] * (rate_values[indices] * float(scale))
+            magnitudes = numpy.abs(products)
+            converted = numpy.sign(products) * numpy.floor(magnitudes + 0.5)
+            result[rows] = converted.astype(numpy.int64)
+
+            # Recompute exactly where float64 may round the wrong way
+            fractions = magnitudes - numpy.floor(magnitudes)
+            unsafe = (numpy.abs(fractions - 0.5) <= magnitudes * ROUNDING_TOLERANCE) | \
+                (magnitudes >= MAX_FLOAT_PRODUCT)
+            for position in numpy.flatnonzero(unsafe):
+                result[rows[position]] = _round_half_up(
+                    int(amounts[rows[position]]) * rates.rates[indices[position]] * scale)
+        return result
@@ -0,0 +1,282 @@
+"""
+Sidecar byte-offset index for random access into large CAMT.053 files.
+
+`build_index` scans a CAMT.053 file once and writes `<file>.idx` with the byte offset and length of every statement
+(`Stmt`) and entry (`Ntry`), together with the key fields of the entries (booking date, amount, credit/debit
+indicator, account servicer reference). `StatementIndex` then maps the XML file and parses only the entries that
+are asked for::
+
+    with StatementIndex.open('statement.xml') as index:
+        for position in index.lookup('REF-123'):
+            entry = index.read_entry(position)
+        page = index.read_page(10, page_size=50)
+
+Sidecar layout (little endian): a header, one fixed-size record per entry in document order, then one record per
+statement. Fixed-size records are read directly from the mapped sidecar, nothing is loaded up front.
+"""
+import mmap
+import os
+import re
+import struct
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from lxml.etree import fromstring
+
+from CAMT_053_001_09.base_models import from_minor_units, to_minor_units
+from CAMT_053_001_09.compression import detect_compression
+from CAMT_053_001_09.message_components import ReportEntry12, _find_text
+
+INDEX_MAGIC = b'CAMTIDX2'
+INDEX_SUFFIX = '.idx'
+# magic, source size, source mtime (ns), statement count, entry count
+HEADER = struct.Struct('<8sQqII')
+# offset, length, statement position, booking date ordinal (0: none), amount in minor units, currency,
+# credit/debit indicator (0: CRDT, 1: DBIT), account servicer reference. The texts are Max35Text, up to 35 characters
+# of up to 4 bytes in UTF-8
+ENTRY = struct.Struct('<QIIiq3sB140s')
+# offset, length, position of the first entry, entry count, statement identification
+STATEMENT = struct.Struct('<QQII140s')
+
+_TAG_REGEX = re.compile(rb'<(/?)((?:[A-Za-z_][\w.-]*:)?)(Stmt|Ntry)[\s/>]')
+_ID_REGEX = re.compile(rb'<(?:[A-Za-z_][\w.-]*:)?Id>([^<]*)<')
+_ROOT_REGEX = re.compile(rb'<[A-Za-z_][^\s/>]*([^>]*)>')
+_NAMESPACE_REGEX = re.compile(rb'\sxmlns(?::[\w.-]+)?\s*=\s*(?:"[^"]*"|\'[^\']*\')')
+_CREDIT_DEBIT = ('CRDT', 'DBIT')
+
+
+@dataclass(frozen=True)
+class IndexedStatement:
+    offset: int
+    length: int
+    entry_start: int
+    entry_count: int
+    statement_id: str
+
+
+@dataclass(frozen=True)
+class IndexedEntry:
+    offset: int
+    length: int
+    statement: int
+    booking_date: Optional[str]
+    amount: Decimal
+    ccy: str
+    credit_debit_indicator: str
+    account_servicer_reference: Optional[str]
+
+
+def index_path_for(source: str | Path) -> Path:
+    return Path(f'{source}{INDEX_SUFFIX}')
+
+
+def _namespace_declarations(data: mmap.mmap) -> bytes:
+    # Namespace declarations of the root element, needed to parse fragments using a prefix declared there
+    position = 0
+    while True:
+        position = data.find(b'<', position)
+        if position < 0:
+            return b''
+        if data[position + 1:position + 2] not in (b'?', b'!'):
+            break
+        position += 1
+    match = _ROOT_REGEX.match(data, position)
+    return b''.join(_NAMESPACE_REGEX.findall(match.group(1))) if match else b''
+
+
+def _parse_fragment(fragment: bytes, namespaces: bytes):
+    return fromstring(b'<fragment' + namespaces + b'>' + fragment + b'</fragment>')[0]
+
+
+def _text(value: Optional[str], length: int = 35) -> bytes:
+    # Truncated by characters, not bytes, so a multi-byte character is never cut
+    return (value or '')[:length].encode('utf-8')
+
+
+def _entry_record(element, offset: int, length: int, statement: int) -> bytes:
+    booking_date = _find_text(element, 'BookgDt/Dt') or _find_text(element, 'BookgDt/DtTm')
+    amount = element.find('{*}Amt')
+    ccy = amount.get('Ccy') or amount.get('ccy')
+    return ENTRY.pack(
+        offset, length, statement,
+        date.fromisoformat(booking_date.strip()[:10]).toordinal() if booking_date else 0,
+        to_minor_units(Decimal(amount.text.strip()), ccy),
+        ccy.encode('ascii'),
+        _CREDIT_DEBIT.index(_find_text(element, 'CdtDbtInd').strip()),
+        _text(_find_text(element, 'AcctSvcrRef')),
+    )
+
+
+def build_index(source: str | Path, index_path: Optional[str | Path] = None) -> Path:
+    """
+    Index a CAMT.053 file in a single pass, returns the path of the sidecar (default `<source>.idx`).
+    Compressed files cannot be indexed, offsets are only meaningful in the uncompressed file.
+    """
+    source = Path(source)
+    index_path = Path(index_path) if index_path is not None else index_path_for(source)
+    stat = source.stat()
+    statements: List[bytes] = []
+    entry_count = 0
+
+    with open(source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, \
+            open(index_path, 'wb') as index:
+        if detect_compression(data[:4]):
+            raise ValueError(f'{source} is compressed, only uncompressed files can be indexed')
+        namespaces = _namespace_declarations(data)
+        index.write(HEADER.pack(INDEX_MAGIC, 0, 0, 0, 0))
+        statement_start = entry_start = None
+        statement_entry_start = 0
+
+        for match in _TAG_REGEX.finditer(data):
+            closing, tag = match.group(1), match.group(3)
+            if not closing:
+                if tag == b'Ntry':
+                    entry_start = match.start()
+                else:
+                    statement_start, statement_entry_start = match.start(), entry_count
+                continue
+
+            end = data.find(b'>', match.start()) + 1
+            if tag == b'Ntry' and entry_start is not None:
+                element = _parse_fragment(data[entry_start:end], namespaces)
+                index.write(_entry_record(element, entry_start, end - entry_start, len(statements)))
+                entry_count += 1
+                entry_start = None
+            elif tag == b'Stmt' and statement_start is not None:
+                id_match = _ID_REGEX.search(data, statement_start, end)
+                statement_id = id_match.group(1).decode('utf-8').strip() if id_match else ''
+                statements.append(STATEMENT.pack(statement_start, end - statement_start, statement_entry_start,
+                                                 entry_count - statement_entry_start, _text(statement_id)))
+                statement_start = None
+
+        index.writelines(statements)
+        index.seek(0)
+        index.write(HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(statements), entry_count))
+    return index_path
+
+
+class StatementIndex:
+    """
+    Random access to the statements and entries of an indexed CAMT.053 file.
+    """
+
+    def __init__(self, source: str | Path, index_path: str | Path):
+        self.source = Path(source)
+        self.index_path = Path(index_path)
+        self._source_file = open(self.source, 'rb')
+        self._index_file = open(self.index_path, 'rb')
+        try:
+            self._data = mmap.mmap(self._source_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self.close()
+            raise
+        magic, self.source_size, self.source_mtime_ns, self.statement_count, self.entry_count = \
+            HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f'{self.index_path} is not a CAMT.053 index')
+        self._statements_offset = HEADER.size + self.entry_count * ENTRY.size
+        self._namespaces = _namespace_declarations(self._data)
+        self._references: Optional[Dict[str, List[int]]] = None
+
+    @classmethod
+    def open(cls, source: str | Path, index_path: Optional[str | Path] = None,
+             build: bool = True) -> 'StatementIndex':
+        """
+        Open the index of `source`, building it first if it is missing or out of date and `build` is set.
+        """
+        index_path = Path(index_path) if index_path is not None else index_path_for(source)
+        if not cls.is_current(source, index_path):
+            if not build:
+                raise ValueError(f'Index {index_path} is missing or out of date')
+            build_index(source, index_path)
+        return cls(source, index_path)
+
+    @staticmethod
+    def is_current(source: str | Path, index_path: str | Path) -> bool:
+        try:
+            with open(index_path, 'rb') as f:
+                magic, size, mtime_ns, _, _ = HEADER.unpack(f.read(HEADER.size))
+        except (OSError, struct.error):
+            return False
+        stat = os.stat(source)
+        return magic == INDEX_MAGIC and (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+
+    def __len__(self) -> int:
+        return self.entry_count
+
+    def __getitem__(self, position: int) -> IndexedEntry:
+        if not -self.entry_count <= position < self.entry_count:
+            raise IndexError('entry index out of range')
+        position %= self.entry_count
+        offset, length, statement, ordinal, minor, ccy, cdi, reference = \
+            ENTRY.unpack_from(self._index, HEADER.size + position * ENTRY.size)
+        ccy = ccy.decode('ascii')
+        return IndexedEntry(offset, length, statement, date.fromordinal(ordinal).isoformat() if ordinal else None,
+                            from_minor_units(minor, ccy), ccy, _CREDIT_DEBIT[cdi],
+                            reference.rstrip(b'\0').decode('utf-8') or None)
+
+    def __iter__(self) -> Iterator[IndexedEntry]:
+        return (self[position] for position in range(self.entry_count))
+
+    @property
+    def statements(self) -> List[IndexedStatement]:
+        result = []
+        for position in range(self.statement_count):
+            offset, length, entry_start, entry_count, statement_id = \
+                STATEMENT.unpack_from(self._index, self._statements_offset + position * STATEMENT.size)
+            result.append(IndexedStatement(offset, length, entry_start, entry_count,
+                                           statement_id.rstrip(b'\0').decode('utf-8')))
+        return result
+
+    def lookup(self, account_servicer_reference: str) -> List[int]:
+        """
+        Positions of the entries with the account servicer reference. The lookup table is built on first use.
+        """
+        if self._references is None:
+            self._references = {}
+            for position in range(self.entry_count):
+                reference = ENTRY.unpack_from(self._index, HEADER.size + position * ENTRY.size)[7].rstrip(b'\0')
+                if reference:
+                    self._references.setdefault(reference.decode('utf-8'), []).append(position)
+        return self._references.get(account_servicer_reference, [])
+
+    def read_entry(self, position: int) -> ReportEntry12:
+        """
+        Parse a single entry from the mapped XML file.
+        """
+        entry = self[position]
+        fragment = self._data[entry.offset:entry.offset + entry.length]
+        return ReportEntry12.from_xml(_parse_fragment(fragment, self._namespaces))
+
+    def read_entries(self, positions: Sequence[int]) -> List[ReportEntry12]:
+        return [self.read_entry(position) for position in positions]
+
+    def read_page(self, page: int, page_size: int = 100, statement: Optional[int] = None) -> List[ReportEntry12]:
+        """
+        Entries of a page (0-based) of the whole file, or of one statement.
+        """
+        start, count = 0, self.entry_count
+        if statement is not None:
+            indexed = self.statements[statement]
+            start, count = indexed.entry_start, indexed.entry_count
+        first = page * page_size
+        return self.read_entries(range(start + first, start + min(first + page_size, count)))
+
+    def close(self) -> None:
+        for resource in ('_data', '_index'):
+            if getattr(self, resource, None) is not None:
+                getattr(self, resource).close()
+                setattr(self, resource, None)
+        self._source_file.close()
+        self._index_file.close()
+
+    def __enter__(self) -> 'StatementIndex':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,265 @@
+"""
+Lightweight value objects for large statements.
+
+The pydantic datatype models carry a `__dict__`, a fields set and validator machinery per instance. In lite mode
+codes, texts, identifiers and dates are `str` subclasses without instance dictionaries, and amounts and entries are
+slotted classes. They are validated by the same rules as the models and convert to and from them::
+
+    LiteCreditDebitCode = lite_type(CreditDebitCode)
+    LiteCreditDebitCode(' crdt ')                   # 'CRDT', raises ValueError like CreditDebitCode(code=...)
+
+    entry = LiteEntry.from_model(report_entry)      # and back with entry.to_model()
+    entries = [LiteEntry(...) for row in rows]      # a fraction of the memory of ReportEntry12 trees
+
+Code values come from closed code sets, their instances are shared: every `CRDT` of a statement is the same object.
+"""
+import re
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from CAMT_053_001_09.base_models import AmountBaseModel, CodeRegexBaseModel, CodeStrBaseModel, DateTimeBaseModel, \
+    ExternalCodeStrBaseModel, quantize_amount, to_minor_units
+from CAMT_053_001_09.code_sets import as_of_date, registry as code_set_registry
+from CAMT_053_001_09.message_components import ReportEntry12
+from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyAndAmount, CreditDebitCode, \
+    ExternalBankTransactionDomain1Code, ExternalBankTransactionFamily1Code, ExternalBankTransactionSubFamily1Code, \
+    ExternalEntryStatus1Code, ISODate, Max35Text, Max500Text
+
+CCY_PATTERN = re.compile(r'[A-Z]{3}')
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+class LiteValue(str):
+    """
+    Base of the lite types created by `lite_type`.
+    """
+    __slots__ = ()
+    model: Type[BaseModel]
+    field: str
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({str.__repr__(self)})'
+
+    @classmethod
+    def trusted(cls, value: str) -> 'LiteValue':
+        """
+        Wrap a value that has already been validated, e.g. read from a model.
+        """
+        return str.__new__(cls, value)
+
+    @classmethod
+    def from_model(cls, model: BaseModel) -> 'LiteValue':
+        return cls.trusted(getattr(model, cls.field))
+
+    def to_model(self) -> BaseModel:
+        return self.model.construct(**{self.field: str(self)})
+
+
+class LiteCode(LiteValue):
+    """
+    Code of a closed code set: validated with the rules of the model, instances are shared per code. Values seen
+    before are not validated again, unless an external code set release is selected with `code_sets_as_of`.
+    """
+    __slots__ = ()
+    _instances: Dict[str, 'LiteCode']
+
+    def __new__(cls, value: str) -> 'LiteCode':
+        if as_of_date() is not None:
+            # Valid in the selected release only, the shared instances are those of the latest release
+            code = cls.model.validate_code(value)
+            return cls._instances.get(code) or str.__new__(cls, code)
+        instance = cls._instances.get(value)
+        if instance is None:
+            code = cls.model.validate_code(value)
+            instance = cls._instances.get(code) or cls._instances.setdefault(code, str.__new__(cls, code))
+            cls._instances[value] = instance
+        return instance
+
+    @classmethod
+    def trusted(cls, value: str) -> 'LiteCode':
+        instance = cls._instances.get(value)
+        if instance is None:
+            instance = cls._instances[value] = str.__new__(cls, value)
+        return instance
+
+
+class LiteText(LiteValue):
+    """
+    Text or identifier validated with the regular expression of the model.
+    """
+    __slots__ = ()
+
+    def __new__(cls, value: str) -> 'LiteText':
+        return str.__new__(cls, cls.model.validate_code(value))
+
+
+class LiteDateTime(LiteValue):
+    """
+    Date or time formatted like the model. Dates given as YYYY-MM-DD are checked without parsing them with pendulum.
+    """
+    __slots__ = ()
+
+    def __new__(cls, value) -> 'LiteDateTime':
+        if cls.model._datetime_format == 'YYYY-MM-DD' and isinstance(value, str) and DATE_PATTERN.fullmatch(value):
+            try:
+                date.fromisoformat(value)
+            except ValueError as e:
+                raise ValueError(f'Invalid datetime: {value}') from e
+            return str.__new__(cls, value)
+        return str.__new__(cls, cls.model(value=value).value)
+
+
+@lru_cache(maxsize=None)
+def lite_type(model: Type[BaseModel]) -> Type[LiteValue]:
+    """
+    The lite type of a code, text, identifier or datetime model of `message_datatypes`.
+    """
+    if issubclass(model, (CodeStrBaseModel, ExternalCodeStrBaseModel)):
+        base, field, namespace = LiteCode, 'code', {'_instances': {}}
+        if issubclass(model, ExternalCodeStrBaseModel):
+            # codes of the previous release may no longer be valid
+            code_set_registry.on_change(lambda registry, instances=namespace['_instances']: instances.clear())
+    elif issubclass(model, CodeRegexBaseModel):
+        base, field, namespace = LiteText, 'value', {}
+    elif issubclass(model, DateTimeBaseModel):
+        base, field, namespace = LiteDateTime, 'value', {}
+    else:
+        raise TypeError(f'No lite type for {model.__name__}')
+    return type(f'Lite{model.__name__}', (base,), {
+        '__slots__': (), '__module__': __name__, 'model': model, 'field': field, **namespace})
+
+
+class LiteAmount:
+    """
+    Slotted amount quantized like `AmountBaseModel`.
+    """
+    __slots__ = ('amount', 'ccy')
+
+    def __init__(self, amount: Decimal | float | int | str, ccy: str):
+        if not (isinstance(ccy, str) and CCY_PATTERN.fullmatch(ccy)):
+            raise ValueError('Invalid currency code. Must be a 3-letter uppercase code.')
+        if isinstance(amount, float):
+            amount = str(amount)
+        self.amount = quantize_amount(Decimal(amount), ccy)
+        self.ccy = ccy
+
+    def __repr__(self) -> str:
+        return f'LiteAmount({self.amount!r}, {self.ccy!r})'
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LiteAmount):
+            return self.amount == other.amount and self.ccy == other.ccy
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self.amount, self.ccy))
+
+    @classmethod
+    def trusted(cls, amount: Decimal, ccy: str) -> 'LiteAmount':
+        instance = cls.__new__(cls)
+        instance.amount = amount
+        instance.ccy = ccy
+        return instance
+
+    @classmethod
+    def from_model(cls, model: AmountBaseModel) -> 'LiteAmount':
+        return cls.trusted(model.amount, model.ccy)
+
+    def to_model(self) -> ActiveOrHistoricCurrencyAndAmount:
+        return ActiveOrHistoricCurrencyAndAmount.construct(amount=self.amount, ccy=self.ccy)
+
+    @property
+    def minor_units(self) -> int:
+        return to_minor_units(self.amount, self.ccy)
+
+
+LiteMax35Text = lite_type(Max35Text)
+LiteMax500Text = lite_type(Max500Text)
+LiteISODate = lite_type(ISODate)
+LiteCreditDebitCode = lite_type(CreditDebitCode)
+LiteEntryStatus = lite_type(ExternalEntryStatus1Code)
+LiteDomainCode = lite_type(ExternalBankTransactionDomain1Code)
+LiteFamilyCode = lite_type(ExternalBankTransactionFamily1Code)
+LiteSubFamilyCode = lite_type(ExternalBankTransactionSubFamily1Code)
+
+
+def _optional(lite: Type[LiteValue], value: Optional[str]) -> Optional[LiteValue]:
+    return lite(value) if value is not None else None
+
+
+def _plain(value: Optional[str]) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def _trusted(lite: Type[LiteValue], model: Optional[BaseModel]) -> Optional[LiteValue]:
+    return lite.from_model(model) if model is not None else None
+
+
+class LiteEntry:
+    """
+    Slotted counterpart of `ReportEntry12` with the bank transaction code flattened into domain, family and
+    sub-family. Values are validated like the fields of `ReportEntry12`.
+    """
+    __slots__ = ('entry_reference', 'amount', 'credit_debit_indicator', 'status', 'booking_date', 'value_date',
+                 'account_servicer_reference', 'domain', 'family', 'sub_family', 'end_to_end_id',
+                 'additional_entry_information')
+
+    def __init__(self, amount: LiteAmount, credit_debit_indicator: str, status: str, domain: str, family: str,
+                 sub_family: str, booking_date: Optional[str] = None, value_date: Optional[str] = None,
+                 entry_reference: Optional[str] = None, account_servicer_reference: Optional[str] = None,
+                 end_to_end_id: Optional[str] = None, additional_entry_information: Optional[str] = None):
+        if not isinstance(amount, LiteAmount):
+            raise TypeError('amount must be a LiteAmount')
+        self.amount = amount
+        self.credit_debit_indicator = LiteCreditDebitCode(credit_debit_indicator)
+        self.status = LiteEntryStatus(status)
+        self.domain = LiteDomainCode(domain)
+        self.family = LiteFamilyCode(family)
+        self.sub_family = LiteSubFamilyCode(sub_family)
+        self.booking_date = _optional(LiteISODate, booking_date)
+        self.value_date = _optional(LiteISODate, value_date)
+        self.entry_reference = _optional(LiteMax35Text, entry_reference)
+        self.account_servicer_reference = _optional(LiteMax35Text, account_servicer_reference)
+        self.end_to_end_id = _optional(LiteMax35Text, end_to_end_id)
+        self.additional_entry_information = _optional(LiteMax500Text, additional_entry_information)
+
+    def __repr__(self) -> str:
+        return f'LiteEntry({self.amount!r}, {self.credit_debit_indicator!r}, booking_date={self.booking_date!r})'
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LiteEntry):
+            return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+        return NotImplemented
+
+    __hash__ = None
+
+    @classmethod
+    def from_model(cls, entry: ReportEntry12) -> 'LiteEntry':
+        lite = cls.__new__(cls)
+        domain = entry.bank_transaction_code.domain
+        lite.amount = LiteAmount.from_model(entry.amount)
+        lite.credit_debit_indicator = LiteCreditDebitCode.from_model(entry.credit_debit_indicator)
+        lite.status = LiteEntryStatus.from_model(entry.status)
+        lite.domain = LiteDomainCode.from_model(domain.code)
+        lite.family = LiteFamilyCode.from_model(domain.family.code)
+        lite.sub_family = LiteSubFamilyCode.from_model(domain.family.sub_family_code)
+        lite.booking_date = _trusted(LiteISODate, entry.booking_date)
+        lite.value_date = _trusted(LiteISODate, entry.value_date)
+        lite.entry_reference = _trusted(LiteMax35Text, entry.entry_reference)
+        lite.account_servicer_reference = _trusted(LiteMax35Text, entry.account_servicer_reference)
+        lite.end_to_end_id = _trusted(LiteMax35Text, entry.end_to_end_id)
+        lite.additional_entry_information = _trusted(LiteMax500Text, entry.additional_entry_information)
+        return lite
+
+    def to_model(self) -> ReportEntry12:
+        return ReportEntry12.construct_trusted(
+            self.amount.amount, self.amount.ccy, str(self.credit_debit_indicator), str(self.status), str(self.domain),
+            str(self.family), str(self.sub_family), booking_date=_plain(self.booking_date),
+            value_date=_plain(self.value_date), entry_reference=_plain(self.entry_reference),
+            account_servicer_reference=_plain(self.account_servicer_reference),
+            end_to_end_id=_plain(self.end_to_end_id),
+            additional_entry_information=_plain(self.additional_entry_information))
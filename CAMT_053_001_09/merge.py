@@ -0,0 +1,123 @@
+"""
+Merging the entries of several sources into one stream ordered by booking date.
+
+Consolidated statements combine entries of several accounts and brokers. Every source (`reader.iter_entries`, the
+FlexQuery and TD Ameritrade adapters, ...) is usually sorted by booking date already, `merge_entries` then merges
+them lazily with a heap holding one entry per source::
+
+    entries = merge_entries(iter_entries('bank.xml'), iter_entries('broker.xml.gz'))
+
+Sources that are not sorted go through `sort_entries` first, an external sort that spills sorted runs to temporary
+files and merges them the same way::
+
+    entries = merge_entries(sort_entries(iter_entries('unsorted.xml')), iter_entries('bank.xml'))
+
+Entries are ordered by booking date, entries without one (pending entries) last, then by an optional tie-break key.
+Entries with the same key keep the order of their sources, and within a source their original order.
+"""
+import heapq
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from CAMT_053_001_09.message_components import ReportEntry12
+
+EntryKey = Callable[[ReportEntry12], Any]
+
+
+def booking_date_key(entry: ReportEntry12) -> Tuple[bool, str]:
+    """
+    Sort key of an entry by booking date. ISO dates sort as text, entries without booking date sort last.
+    """
+    booking_date = entry.booking_date
+    return (True, '') if booking_date is None else (False, booking_date.value)
+
+
+def entry_key(tie_break: Optional[EntryKey] = None) -> EntryKey:
+    """
+    The booking date key, followed by `tie_break` if given.
+    """
+    if tie_break is None:
+        return booking_date_key
+    return lambda entry: (booking_date_key(entry), tie_break(entry))
+
+
+def _check_sorted(entries: Iterable[ReportEntry12], key: EntryKey, index: int) -> Iterator[ReportEntry12]:
+    previous = None
+    for entry in entries:
+        current = key(entry)
+        if previous is not None and current < previous:
+            raise ValueError(f'Source {index} is not sorted: {current} follows {previous}, use sort_entries first')
+        previous = current
+        yield entry
+
+
+def merge_entries(*sources: Iterable[ReportEntry12], tie_break: Optional[EntryKey] = None,
+                  check: bool = True) -> Iterator[ReportEntry12]:
+    """
+    Lazily merge sources sorted by booking date (and `tie_break`) into one sorted stream, holding one entry per
+    source in memory.
+    :param tie_break: key ordering entries of the same booking date, e.g. `lambda entry: entry.amount.ccy`.
+    :param check: raise a ValueError when a source turns out not to be sorted.
+    """
+    key = entry_key(tie_break)
+    if check:
+        sources = tuple(_check_sorted(source, key, index) for index, source in enumerate(sources))
+    return heapq.merge(*sources, key=key)
+
+
+def _write_run(entries: List[ReportEntry12], directory: Optional[str | Path]) -> BinaryIO:
+    run = tempfile.TemporaryFile(dir=directory)
+    pickler = pickle.Pickler(run, protocol=pickle.HIGHEST_PROTOCOL)
+    for entry in entries:
+        pickler.dump(entry)
+        # Entries share no objects worth memoizing, a growing memo would keep every entry of the run alive
+        pickler.clear_memo()
+    run.seek(0)
+    return run
+
+
+def _read_run(run: BinaryIO) -> Iterator[ReportEntry12]:
+    try:
+        unpickler = pickle.Unpickler(run)
+        while True:
+            try:
+                yield unpickler.load()
+            except EOFError:
+                return
+    finally:
+        run.close()
+
+
+def sort_entries(entries: Iterable[ReportEntry12], tie_break: Optional[EntryKey] = None, run_size: int = 100_000,
+                 directory: Optional[str | Path] = None) -> Iterator[ReportEntry12]:
+    """
+    Sort entries of any number with bounded memory. Runs of `run_size` entries are sorted in memory and spilled to
+    temporary files (in `directory`, defaults to the system temporary directory), which are merged at the end.
+    Fewer than `run_size` entries are sorted in memory only.
+    :param tie_break: key ordering entries of the same booking date, see `merge_entries`.
+    """
+    if run_size < 1:
+        raise ValueError('run_size must be positive')
+    key = entry_key(tie_break)
+    runs: List[BinaryIO] = []
+    run: List[ReportEntry12] = []
+    try:
+        for entry in entries:
+            run.append(entry)
+            if len(run) >= run_size:
+                run.sort(key=key)
+                runs.append(_write_run(run, directory))
+                run = []
+        run.sort(key=key)
+        if runs and run:
+            runs.append(_write_run(run, directory))
+            run = []
+    except BaseException:
+        for spilled in runs:
+            spilled.close()
+        raise
+    if not runs:
+        return iter(run)
+    return heapq.merge(*(_read_run(spilled) for spilled in runs), key=key)
@@ -0,0 +1,328 @@
+from decimal import Decimal
+from typing import Optional
+
+from lxml.etree import Element, SubElement
+from pydantic import BaseModel
+
+from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyAndAmount, CreditDebitCode, DecimalNumber, \
+    ExternalBalanceType1Code, ExternalBankTransactionDomain1Code, ExternalBankTransactionFamily1Code, \
+    ExternalBankTransactionSubFamily1Code, ExternalEntryStatus1Code, ISODate, Max15NumericText, Max35Text, \
+    Max500Text, Max5NumericText, NonNegativeDecimalNumber, TrueFalseIndicator
+
+
+CAMT_053_NAMESPACE = 'urn:iso:std:iso:20022:tech:xsd:camt.053.001.09'
+
+
+def _sub_element(parent: Element, tag: str, text: str) -> Element:
+    element = SubElement(parent, tag)
+    element.text = text
+    return element
+
+
+def _find_text(element: Element, path: str) -> Optional[str]:
+    # `{*}` matches the element in any namespace, so documents with and without the CAMT namespace are accepted
+    return element.findtext('/'.join(f'{{*}}{tag}' for tag in path.split('/')))
+
+
+# Bank transaction code
+
+class BankTransactionCodeStructure6(BaseModel):
+    """
+    Set of elements used to identify the type or operations code of a transaction entry (family and sub-family).
+    """
+    code: ExternalBankTransactionFamily1Code
+    sub_family_code: ExternalBankTransactionSubFamily1Code
+
+    def to_xml(self, tag: str = 'Fmly') -> Element:
+        element = Element(tag)
+        _sub_element(element, 'Cd', self.code.code)
+        _sub_element(element, 'SubFmlyCd', self.sub_family_code.code)
+        return element
+
+
+class BankTransactionCodeStructure5(BaseModel):
+    """
+    Set of elements used to fully identify the type of underlying transaction resulting in an entry.
+    """
+    code: ExternalBankTransactionDomain1Code
+    family: BankTransactionCodeStructure6
+
+    def to_xml(self, tag: str = 'Domn') -> Element:
+        element = Element(tag)
+        _sub_element(element, 'Cd', self.code.code)
+        element.append(self.family.to_xml('Fmly'))
+        return element
+
+    @classmethod
+    def from_xml(cls, element: Element) -> 'BankTransactionCodeStructure5':
+        return cls(
+            code=ExternalBankTransactionDomain1Code(code=_find_text(element, 'Cd')),
+            family=BankTransactionCodeStructure6(
+                code=ExternalBankTransactionFamily1Code(code=_find_text(element, 'Fmly/Cd')),
+                sub_family_code=ExternalBankTransactionSubFamily1Code(code=_find_text(element, 'Fmly/SubFmlyCd')),
+            ),
+        )
+
+
+class BankTransactionCodeStructure4(BaseModel):
+    """
+    Set of elements used to fully identify the type of underlying transaction resulting in an entry.
+    Only the structured domain/family/sub-family form is supported.
+    """
+    domain: BankTransactionCodeStructure5
+
+    def to_xml(self, tag: str = 'BkTxCd') -> Element:
+        element = Element(tag)
+        element.append(self.domain.to_xml('Domn'))
+        return element
+
+    @classmethod
+    def from_xml(cls, element: Element) -> 'BankTransactionCodeStructure4':
+        return cls(domain=BankTransactionCodeStructure5.from_xml(element.find('{*}Domn')))
+
+
+# Balance
+
+class CashBalance8(BaseModel):
+    """
+    Provides information on the balance of the account, e.g. the opening (`OPBD`) or closing (`CLBD`) booked balance.
+    """
+    type: ExternalBalanceType1Code
+    amount: ActiveOrHistoricCurrencyAndAmount
+    credit_debit_indicator: CreditDebitCode
+    date: ISODate
+
+    def to_xml(self, tag: str = 'Bal') -> Element:
+        element = Element(tag)
+        _sub_element(SubElement(SubElement(element, 'Tp'), 'CdOrPrtry'), 'Cd', self.type.code)
+        element.append(self.amount.to_xml('Amt'))
+        _sub_element(element, 'CdtDbtInd', self.credit_debit_indicator.code)
+        _sub_element(SubElement(element, 'Dt'), 'Dt', self.date.value)
+        return element
+
+    @classmethod
+    def from_xml(cls, element: Element) -> 'CashBalance8':
+        return cls(
+            type=ExternalBalanceType1Code(code=_find_text(element, 'Tp/CdOrPrtry/Cd')),
+            amount=ActiveOrHistoricCurrencyAndAmount.from_xml(element.find('{*}Amt')),
+            credit_debit_indicator=CreditDebitCode(code=_find_text(element, 'CdtDbtInd')),
+            date=ISODate(value=_find_text(element, 'Dt/Dt')),
+        )
+
+
+# Pagination
+
+class Pagination1(BaseModel):
+    """
+    Page number of a message (`MsgPgntn`) or statement (`StmtPgntn`) split over several pages, and whether it is the
+    last page.
+    """
+    page_number: Max5NumericText
+    last_page_indicator: TrueFalseIndicator
+
+    def to_xml(self, tag: str = 'MsgPgntn') -> Element:
+        element = Element(tag)
+        _sub_element(element, 'PgNb', self.page_number.value)
+        _sub_element(element, 'LastPgInd', 'true' if self.last_page_indicator else 'false')
+        return element
+
+    @classmethod
+    def from_xml(cls, element: Element) -> 'Pagination1':
+        return cls(
+            page_number=Max5NumericText(value=_find_text(element, 'PgNb')),
+            last_page_indicator=_find_text(element, 'LastPgInd').strip() in ('true', '1'),
+        )
+
+
+# Transaction summary
+
+class NumberAndSumOfTransactions1(BaseModel):
+    """
+    Set of elements providing the total sum of entries.
+    """
+    number_of_entries: Max15NumericText
+    sum: DecimalNumber
+
+    def to_xml(self, tag: str) -> Element:
+        element = Element(tag)
+        _sub_element(element, 'NbOfNtries', self.number_of_entries.value)
+        _sub_element(element, 'Sum', str(self.sum))
+        return element
+
+
+class AmountAndDirection35(BaseModel):
+    """
+    Resulting debit or credit amount of the netted amounts for all debit and credit entries.
+    """
+    amount: NonNegativeDecimalNumber
+    credit_debit_indicator: CreditDebitCode
+
+    def to_xml(self, tag: str = 'TtlNetNtry') -> Element:
+        element = Element(tag)
+        _sub_element(element, 'Amt', str(self.amount))
+        _sub_element(element, 'CdtDbtInd', self.credit_debit_indicator.code)
+        return element
+
+
+class NumberAndSumOfTransactions4(BaseModel):
+    """
+    Set of elements providing the total sum and net amount of all entries.
+    """
+    number_of_entries: Max15NumericText
+    sum: DecimalNumber
+    total_net_entry: AmountAndDirection35
+
+    def to_xml(self, tag: str = 'TtlNtries') -> Element:
+        element = Element(tag)
+        _sub_element(element, 'NbOfNtries', self.number_of_entries.value)
+        _sub_element(element, 'Sum', str(self.sum))
+        element.append(self.total_net_entry.to_xml('TtlNetNtry'))
+        return element
+
+
+class TotalTransactions6(BaseModel):
+    """
+    Set of elements used to provide summary information on entries (`TxsSummry`).
+    """
+    total_entries: NumberAndSumOfTransactions4
+    total_credit_entries: NumberAndSumOfTransactions1
+    total_debit_entries: NumberAndSumOfTransactions1
+
+    def to_xml(self, tag: str = 'TxsSummry') -> Element:
+        element = Element(tag)
+        element.append(self.total_entries.to_xml('TtlNtries'))
+        element.append(self.total_credit_entries.to_xml('TtlCdtNtries'))
+        element.append(self.total_debit_entries.to_xml('TtlDbtNtries'))
+        return element
+
+
+# Entry
+
+def entry_element(amount: str, ccy: str, credit_debit_indicator: str, status: str, domain: str, family: str,
+                  sub_family: str, booking_date: Optional[str] = None, value_date: Optional[str] = None,
+                  entry_reference: Optional[str] = None, account_servicer_reference: Optional[str] = None,
+                  end_to_end_id: Optional[str] = None, additional_entry_information: Optional[str] = None,
+                  tag: str = 'Ntry') -> Element:
+    """
+    The element of an entry given as plain values, `amount` formatted. `ReportEntry12.to_xml` builds its element
+    here, so entries can be serialized without building the models, e.g. from columns in a worker process.
+    """
+    element = Element(tag)
+    if entry_reference is not None:
+        _sub_element(element, 'NtryRef', entry_reference)
+    _sub_element(element, 'Amt', amount).set('ccy', ccy)
+    _sub_element(element, 'CdtDbtInd', credit_debit_indicator)
+    _sub_element(SubElement(element, 'Sts'), 'Cd', status)
+    if booking_date is not None:
+        _sub_element(SubElement(element, 'BookgDt'), 'Dt', booking_date)
+    if value_date is not None:
+        _sub_element(SubElement(element, 'ValDt'), 'Dt', value_date)
+    if account_servicer_reference is not None:
+        _sub_element(element, 'AcctSvcrRef', account_servicer_reference)
+    domain_element = SubElement(SubElement(element, 'BkTxCd'), 'Domn')
+    _sub_element(domain_element, 'Cd', domain)
+    family_element = SubElement(domain_element, 'Fmly')
+    _sub_element(family_element, 'Cd', family)
+    _sub_element(family_element, 'SubFmlyCd', sub_family)
+    if end_to_end_id is not None:
+        refs = SubElement(SubElement(SubElement(element, 'NtryDtls'), 'TxDtls'), 'Refs')
+        _sub_element(refs, 'EndToEndId', end_to_end_id)
+    if additional_entry_information is not None:
+        _sub_element(element, 'AddtlNtryInf', additional_entry_information)
+    return element
+
+
+class ReportEntry12(BaseModel):
+    """
+    Provides further details on an entry in the report (`Ntry`).
+    The end-to-end identification is carried in the first transaction details block of the entry.
+    """
+    entry_reference: Optional[Max35Text] = None
+    amount: ActiveOrHistoricCurrencyAndAmount
+    credit_debit_indicator: CreditDebitCode
+    status: ExternalEntryStatus1Code
+    booking_date: Optional[ISODate] = None
+    value_date: Optional[ISODate] = None
+    account_servicer_reference: Optional[Max35Text] = None
+    bank_transaction_code: BankTransactionCodeStructure4
+    end_to_end_id: Optional[Max35Text] = None
+    additional_entry_information: Optional[Max500Text] = None
+
+    def to_xml(self, tag: str = 'Ntry') -> Element:
+        family = self.bank_transaction_code.domain.family
+        return entry_element(
+            str(self.amount.amount), self.amount.ccy, self.credit_debit_indicator.code, self.status.code,
+            self.bank_transaction_code.domain.code.code, family.code.code, family.sub_family_code.code,
+            booking_date=self.booking_date and self.booking_date.value,
+            value_date=self.value_date and self.value_date.value,
+            entry_reference=self.entry_reference and self.entry_reference.value,
+            account_servicer_reference=self.account_servicer_reference and self.account_servicer_reference.value,
+            end_to_end_id=self.end_to_end_id and self.end_to_end_id.value,
+            additional_entry_information=(
+                self.additional_entry_information and self.additional_entry_information.value
+            ),
+            tag=tag,
+        )
+
+    @classmethod
+    def from_xml(cls, element: Element) -> 'ReportEntry12':
+        entry_reference = _find_text(element, 'NtryRef')
+        booking_date = _find_text(element, 'BookgDt/Dt')
+        value_date = _find_text(element, 'ValDt/Dt')
+        account_servicer_reference = _find_text(element, 'AcctSvcrRef')
+        end_to_end_id = _find_text(element, 'NtryDtls/TxDtls/Refs/EndToEndId')
+        additional_entry_information = _find_text(element, 'AddtlNtryInf')
+        return cls(
+            entry_reference=Max35Text(value=entry_reference) if entry_reference is not None else None,
+            amount=ActiveOrHistoricCurrencyAndAmount.from_xml(element.find('{*}Amt')),
+            credit_debit_indicator=CreditDebitCode(code=_find_text(element, 'CdtDbtInd')),
+            status=ExternalEntryStatus1Code(code=_find_text(element, 'Sts/Cd')),
+            booking_date=ISODate(value=booking_date) if booking_date is not None else None,
+            value_date=ISODate(value=value_date) if value_date is not None else None,
+            account_servicer_reference=(
+                Max35Text(value=account_servicer_reference) if account_servicer_reference is not None else None
+            ),
+            bank_transaction_code=BankTransactionCodeStructure4.from_xml(element.find('{*}BkTxCd')),
+            end_to_end_id=Max35Text(value=end_to_end_id) if end_to_end_id is not None else None,
+            additional_entry_information=(
+                Max500Text(value=additional_entry_information) if additional_entry_information is not None else None
+            ),
+        )
+
+    @classmethod
+    def construct_trusted(cls, amount: Decimal, ccy: str, credit_debit_indicator: str, status: str, domain: str,
+                          family: str, sub_family: str, booking_date: Optional[str] = None,
+                          value_date: Optional[str] = None, entry_reference: Optional[str] = None,
+                          account_servicer_reference: Optional[str] = None, end_to_end_id: Optional[str] = None,
+                          additional_entry_information: Optional[str] = None) -> 'ReportEntry12':
+        """
+        Build an entry from plain values that have already been validated, e.g. a column at a time by an adapter,
+        without running the pydantic validators of every field. `amount` must already be quantized for `ccy` and
+        dates formatted as YYYY-MM-DD.
+        """
+        return cls.construct(
+            entry_reference=Max35Text.construct(value=entry_reference) if entry_reference is not None else None,
+            amount=ActiveOrHistoricCurrencyAndAmount.construct(amount=amount, ccy=ccy),
+            credit_debit_indicator=CreditDebitCode.construct(code=credit_debit_indicator),
+            status=ExternalEntryStatus1Code.construct(code=status),
+            booking_date=ISODate.construct(value=booking_date) if booking_date is not None else None,
+            value_date=ISODate.construct(value=value_date) if value_date is not None else None,
+            account_servicer_reference=(
+                Max35Text.construct(value=account_servicer_reference)
+                if account_servicer_reference is not None else None
+            ),
+            bank_transaction_code=BankTransactionCodeStructure4.construct(
+                domain=BankTransactionCodeStructure5.construct(
+                    code=ExternalBankTransactionDomain1Code.construct(code=domain),
+                    family=BankTransactionCodeStructure6.construct(
+                        code=ExternalBankTransactionFamily1Code.construct(code=family),
+                        sub_family_code=ExternalBankTransactionSubFamily1Code.construct(code=sub_family),
+                    ),
+                ),
+            ),
+            end_to_end_id=Max35Text.construct(value=end_to_end_id) if end_to_end_id is not None else None,
+            additional_entry_information=(
+                Max500Text.construct(value=additional_entry_information)
+                if additional_entry_information is not None else None
+            ),
+        )
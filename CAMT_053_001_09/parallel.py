@@ -0,0 +1,102 @@
+"""
+Serialization of entries in worker processes.
+
+Serializing entries to XML takes most of the time of writing a large statement that is already in memory. Here the
+entries are cut into slices, every slice is serialized to `Ntry` bytes in a worker process of an executor, and the
+bytes are handed back in the order of the entries, so the output is the same as serializing them one by one::
+
+    with ProcessPoolExecutor() as executor:
+        statement.write_entries(entries, executor=executor)     # see `writer.StatementSession.write_entries`
+
+Entries are shipped to the workers as columns (`cache.entries_to_columns`: plain strings and integer minor units)
+encoded in the wire format of `wire`, about 40 bytes per entry, rather than as pickled models. Amounts not written
+with the minor unit of their currency, e.g. with `strip`, are shipped as text as well. The workers build the
+elements from the plain values with the function `ReportEntry12.to_xml` uses, without building models. Only a
+bounded number of slices is in flight, so the entries may come from a generator of any length.
+"""
+import os
+from collections import deque
+from concurrent.futures import Executor, Future
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from lxml.etree import tostring
+
+from CAMT_053_001_09.base_models import currency_decimal_places, from_minor_units
+from CAMT_053_001_09.cache import COLUMNS, entries_to_columns
+from CAMT_053_001_09.message_components import ReportEntry12, entry_element
+from CAMT_053_001_09.wire import decode_columns, encode_columns
+
+SLICE_SIZE = 10_000
+
+
+def serialize_entry(entry: ReportEntry12) -> bytes:
+    return tostring(entry.to_xml('Ntry'), encoding='utf-8')
+
+
+def amount_texts(entries: Sequence[ReportEntry12]) -> Dict[int, str]:
+    """
+    The amounts of the entries that are not written with the minor unit of their currency, e.g. amounts with
+    trailing zeros stripped (`strip`), as written by `ReportEntry12.to_xml`, by position.
+    """
+    texts = {}
+    for position, entry in enumerate(entries):
+        amount = entry.amount
+        if amount.amount.as_tuple().exponent != -currency_decimal_places(amount.ccy):
+            texts[position] = str(amount.amount)
+    return texts
+
+
+def serialize_columns(columns: Dict[str, Sequence[Any]],
+                      amounts: Optional[Dict[int, str]] = None) -> Tuple[bytes, List[int]]:
+    """
+    The `Ntry` elements of the packed entries, concatenated, and the size of each. Runs in a worker process, the
+    elements are built from the plain values without building the models.
+    :param amounts: the text of the amounts not written with the minor unit of their currency, see `amount_texts`.
+    """
+    amounts = amounts or {}
+    serialized = []
+    for position, (entry_reference, amount, ccy, credit_debit_indicator, status, booking_date, value_date,
+                   account_servicer_reference, domain, family, sub_family, end_to_end_id,
+                   additional_entry_information) in enumerate(zip(*(columns[name] for name in COLUMNS))):
+        text = amounts.get(position) or str(from_minor_units(amount, ccy))
+        serialized.append(tostring(entry_element(
+            text, ccy, credit_debit_indicator, status, domain, family, sub_family,
+            booking_date, value_date, entry_reference, account_servicer_reference, end_to_end_id,
+            additional_entry_information), encoding='utf-8'))
+    return b''.join(serialized), [len(data) for data in serialized]
+
+
+def serialize_encoded(data: bytes, amounts: Optional[Dict[int, str]] = None) -> Tuple[bytes, List[int]]:
+    """
+    `serialize_columns` of entries encoded with `wire.encode_columns`.
+    """
+    return serialize_columns(decode_columns(data), amounts)
+
+
+def serialize_entries(entries: Iterable[ReportEntry12], executor: Executor, slice_size: int = SLICE_SIZE,
+                      max_pending: int = 0) -> Iterator[Tuple[List[ReportEntry12], bytes, List[int]]]:
+    """
+    Serialize entries in the worker processes of `executor`. Yields, in order, every slice of entries with its
+    concatenated `Ntry` bytes and the size of each entry.
+    :param slice_size: entries per task.
+    :param max_pending: slices submitted but not yet yielded, defaults to twice the number of CPUs.
+    """
+    if slice_size < 1:
+        raise ValueError('slice_size must be positive')
+    max_pending = max_pending or 2 * (os.cpu_count() or 1)
+    iterator = iter(entries)
+    pending: Deque[Tuple[List[ReportEntry12], Future]] = deque()
+    try:
+        while True:
+            while len(pending) < max_pending and (entries_slice := list(islice(iterator, slice_size))):
+                data = encode_columns(entries_to_columns(entries_slice))
+                pending.append((entries_slice, executor.submit(serialize_encoded, data, amount_texts(entries_slice))))
+            if not pending:
+                return
+            entries_slice, future = pending.popleft()
+            data, sizes = future.result()
+            yield entries_slice, data, sizes
+    finally:
+        for _, future in pending:
+            future.cancel()
@@ -0,0 +1,165 @@
+"""
+In-memory query index over loaded entries.
+
+The index is built once for a list of entries and answers filter queries without scanning them::
+
+    index = EntryIndex(entries)
+    index.filter(booking_date=('2023-04-01', '2023-04-30'), domain='PMNT', ccy=('CHF', 'EUR'))
+    index.filter(account_servicer_reference='REF-123')
+
+Indexes: sorted arrays on the booking and value date for range queries, hash indexes on the account servicer
+reference and the end-to-end identification, inverted indexes on the bank transaction domain, family, sub-family,
+the currency and the credit/debit indicator. A query starts from the most selective criterion and checks the other
+criteria on its candidates only.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from CAMT_053_001_09.message_components import ReportEntry12
+
+RANGE_FIELDS = ('booking_date', 'value_date')
+HASH_FIELDS = ('account_servicer_reference', 'end_to_end_id')
+INVERTED_FIELDS = ('domain', 'family', 'sub_family', 'ccy', 'credit_debit_indicator')
+FIELDS = RANGE_FIELDS + HASH_FIELDS + INVERTED_FIELDS
+
+DateRange = Tuple[Optional[str], Optional[str]]
+
+
+def entry_values(entry: ReportEntry12) -> Tuple[Optional[str], ...]:
+    """
+    Values of `FIELDS` of an entry.
+    """
+    domain = entry.bank_transaction_code.domain
+    return (
+        entry.booking_date and entry.booking_date.value,
+        entry.value_date and entry.value_date.value,
+        entry.account_servicer_reference and entry.account_servicer_reference.value,
+        entry.end_to_end_id and entry.end_to_end_id.value,
+        domain.code.code,
+        domain.family.code.code,
+        domain.family.sub_family_code.code,
+        entry.amount.ccy,
+        entry.credit_debit_indicator.code,
+    )
+
+
+def _predicate(name: str, criterion: Any) -> Callable[[Optional[str]], bool]:
+    if name in RANGE_FIELDS:
+        start, end = criterion
+        return lambda value: value is not None and (start is None or value >= start) and (end is None or value <= end)
+    values = {criterion} if isinstance(criterion, str) else set(criterion)
+    return values.__contains__
+
+
+def _check_criteria(criteria: Dict[str, Any]) -> None:
+    for name, criterion in criteria.items():
+        if name not in FIELDS:
+            raise ValueError(f'Unknown filter field: {name}, allowed fields are {", ".join(FIELDS)}')
+        if name in RANGE_FIELDS and (isinstance(criterion, str) or len(criterion) != 2):
+            raise ValueError(f'{name} takes a (start, end) range, either bound may be None')
+
+
+def scan(entries: Sequence[ReportEntry12], **criteria: Any) -> List[int]:
+    """
+    Positions of the matching entries by a linear scan, the reference for `EntryIndex.positions`.
+    """
+    _check_criteria(criteria)
+    predicates = [(FIELDS.index(name), _predicate(name, criterion)) for name, criterion in criteria.items()]
+    matches = []
+    for position, entry in enumerate(entries):
+        values = entry_values(entry)
+        if all(predicate(values[field]) for field, predicate in predicates):
+            matches.append(position)
+    return matches
+
+
+class EntryIndex:
+    """
+    Query index over a fixed list of entries.
+
+    Criteria of `filter`, `positions` and `count`:
+
+    * `booking_date`, `value_date`: inclusive (start, end) range of YYYY-MM-DD dates, either bound may be None,
+    * other fields: a value or a collection of values, any of which matches.
+
+    Criteria are combined with AND.
+    """
+
+    def __init__(self, entries: Iterable[ReportEntry12]):
+        self.entries: List[ReportEntry12] = list(entries)
+        rows = [entry_values(entry) for entry in self.entries]
+        self._columns: List[List[Optional[str]]] = [[row[field] for row in rows] for field in range(len(FIELDS))]
+
+        # Sorted arrays: the dates in order and the position of the entry of each date
+        self._sorted: Dict[str, Tuple[List[str], List[int]]] = {}
+        for name in RANGE_FIELDS:
+            column = self._columns[FIELDS.index(name)]
+            pairs = sorted((value, position) for position, value in enumerate(column) if value is not None)
+            self._sorted[name] = ([value for value, _ in pairs], [position for _, position in pairs])
+
+        # Hash and inverted indexes: value -> positions in document order
+        self._postings: Dict[str, Dict[str, List[int]]] = {}
+        for name in HASH_FIELDS + INVERTED_FIELDS:
+            postings: Dict[str, List[int]] = {}
+            for position, value in enumerate(self._columns[FIELDS.index(name)]):
+                if value is not None:
+                    postings.setdefault(value, []).append(position)
+            self._postings[name] = postings
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def values(self, name: str) -> List[str]:
+        """
+        Distinct values of a hash or inverted index field, e.g. for the choices of a filter.
+        """
+        return sorted(self._postings[name])
+
+    def _range(self, name: str, criterion: DateRange) -> Tuple[int, int]:
+        keys = self._sorted[name][0]
+        start, end = criterion
+        low = bisect_left(keys, start) if start is not None else 0
+        high = bisect_right(keys, end) if end is not None else len(keys)
+        return low, max(low, high)
+
+    def _estimate(self, name: str, criterion: Any) -> int:
+        if name in RANGE_FIELDS:
+            low, high = self._range(name, criterion)
+            return high - low
+        postings = self._postings[name]
+        values = (criterion,) if isinstance(criterion, str) else set(criterion)
+        return sum(len(postings.get(value, ())) for value in values)
+
+    def _candidates(self, name: str, criterion: Any) -> List[int]:
+        if name in RANGE_FIELDS:
+            low, high = self._range(name, criterion)
+            return sorted(self._sorted[name][1][low:high])
+        postings = self._postings[name]
+        if isinstance(criterion, str):
+            return postings.get(criterion, [])
+        return sorted(position for value in set(criterion) for position in postings.get(value, ()))
+
+    def positions(self, **criteria: Any) -> List[int]:
+        """
+        Positions of the matching entries in ascending order.
+        """
+        _check_criteria(criteria)
+        if not criteria:
+            return list(range(len(self.entries)))
+        ordered = sorted(criteria.items(), key=lambda item: self._estimate(*item))
+        candidates = self._candidates(*ordered[0])
+        for name, criterion in ordered[1:]:
+            if not candidates:
+                break
+            column, predicate = self._columns[FIELDS.index(name)], _predicate(name, criterion)
+            candidates = [position for position in candidates if predicate(column[position])]
+        return candidates
+
+    def filter(self, **criteria: Any) -> List[ReportEntry12]:
+        return [self.entries[position] for position in self.positions(**criteria)]
+
+    def count(self, **criteria: Any) -> int:
+        if len(criteria) == 1:
+            _check_criteria(criteria)
+            return self._estimate(*next(iter(criteria.items())))
+        return len(self.positions(**criteria))
@@ -0,0 +1,29 @@
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+from lxml.etree import iterparse
+
+from CAMT_053_001_09.compression import open_input
+from CAMT_053_001_09.digest import CanonicalDigest, DigestingReader
+from CAMT_053_001_09.message_components import ReportEntry12
+
+
+def iter_entries(source: str | Path | BinaryIO, digest: Optional[CanonicalDigest] = None) -> Iterator[ReportEntry12]:
+    """
+    Stream the entries (`Ntry`) of a CAMT.053 file with bounded memory.
+    :param source: file path or binary file object, gzip or zstd compressed or not. Documents with and without the
+    CAMT.053 namespace are accepted.
+    Every entry is released from the parsed tree once it has been converted, so the memory used does not grow with
+    the size of the file.
+    :param digest: fed the bytes read, its `result()` holds the digests of the document once all entries are read.
+    """
+    with open_input(source) as stream:
+        if digest is not None:
+            stream = DigestingReader(stream, digest)
+        for _, element in iterparse(stream, events=('end',), tag='{*}Ntry'):
+            yield ReportEntry12.from_xml(element)
+
+            element.clear(keep_tail=True)
+            parent = element.getparent()
+            while element.getprevious() is not None:
+                del parent[0]
@@ -0,0 +1,499 @@
+"""
+asyncio ingestion service for broker statements.
+
+    camt053-serve inbox --output-dir camt053 --parse-workers 4 --validate-workers 4 --write-workers 2
+
+Files dropped into the inbox go through three stages, each with its own number of workers:
+
+* parse: the source file is read into raw records (FlexQuery records, TD Ameritrade CSV rows),
+* validate: the records are converted into entries with the datatypes and grouped into statements,
+* write: the statements are streamed into a CAMT.053 file with `StatementWriter`.
+
+The stages are connected by bounded queues, a burst of files waits in the inbox instead of piling up in memory: at
+most `queue_size` files are held between two stages. As every stage holds a whole file (its records, its entries),
+the size of the source files in the pipeline is bounded as well, by `max_bytes`. Parsing and validation run in an
+executor (a process pool can be passed for CPU bound validation), writing in a thread pool. Latency and throughput
+are recorded per stage. Converted files are moved to `processed/` in the inbox, files that fail to `failed/`.
+
+Files are never overwritten: a source whose target is in use by a file in the pipeline or already exists (`a.xml`
+and `a.csv`, or a file delivered again) is converted to `a-2.camt053.xml`, and likewise when it is moved.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import math
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Collection, Deque, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from CAMT_053_001_09.cli import FileResult, detect_format, is_source_file, target_path
+from CAMT_053_001_09.code_sets import registry as code_set_registry
+from CAMT_053_001_09.compression import COMPRESSIONS, open_input, uncompressed_path
+from CAMT_053_001_09.flexquery import cash_report_to_balance, iter_records, record_to_entry, statement_header
+from CAMT_053_001_09.message_components import CashBalance8, ReportEntry12
+from CAMT_053_001_09.message_datatypes import ISODate
+from CAMT_053_001_09.td_ameritrade import chunk_entries, column_indexes, validate_chunk
+from CAMT_053_001_09.writer import StatementWriter
+
+STAGES = ('parse', 'validate', 'write')
+
+
+@dataclass
+class ParsedFile:
+    """
+    Raw records of a source file, the output of the parse stage.
+    """
+    source_format: str
+    records: List[Any]
+
+
+@dataclass
+class StatementData:
+    """
+    A validated statement: keyword arguments of `StatementWriter.statement` and its entries.
+    """
+    header: Dict[str, Any]
+    entries: List[ReportEntry12] = field(default_factory=list)
+
+
+@dataclass
+class ValidatedFile:
+    """
+    Validated statements of a source file, the output of the validate stage.
+    """
+    message_id: str
+    statements: List[StatementData]
+
+
+def parse_file(source: Path, source_format: str) -> ParsedFile:
+    if source_format == 'flexquery':
+        return ParsedFile(source_format, list(iter_records(source)))
+    if source_format == 'td_ameritrade':
+        with open_input(source) as stream, io.TextIOWrapper(stream, encoding='utf-8-sig', newline='') as f:
+            return ParsedFile(source_format, list(csv.reader(f)))
+    raise ValueError(f'Unknown source format: {source_format}')
+
+
+def _validate_flexquery(records: List[Any]) -> ValidatedFile:
+    if not records or records[0].tag != 'FlexQueryResponse':
+        raise ValueError('Not a FlexQuery file, missing FlexQueryResponse root element')
+    message_id = (records[0].attributes.get('queryName') or 'FLEXQUERY')[:35]
+
+    statements: List[StatementData] = []
+    current: Dict[str, StatementData] = {}
+    opening_balances: Dict[str, CashBalance8] = {}
+    for record in records[1:]:
+        if record.tag == 'CashReportCurrency':
+            balance = cash_report_to_balance(record)
+            if balance is not None:
+                opening_balances[balance.amount.ccy] = balance
+                if balance.amount.ccy in current:
+                    current[balance.amount.ccy].header['opening_balance'] = balance
+        elif record.tag == 'FlexStatement':
+            current.clear()
+            opening_balances.clear()
+        else:
+            entry = record_to_entry(record)
+            ccy = entry.amount.ccy
+            if ccy not in current:
+                current[ccy] = StatementData(dict(statement_header(record.statement, ccy),
+                                                  opening_balance=opening_balances.get(ccy)))
+                statements.append(current[ccy])
+            current[ccy].entries.append(entry)
+    return ValidatedFile(message_id, statements)
+
+
+def _validate_td_ameritrade(rows: List[List[str]], account: str) -> ValidatedFile:
+    if not rows:
+        raise ValueError('Not a TD Ameritrade activity file, empty file')
+    chunk = validate_chunk(rows[1:], 2, column_indexes(rows[0]), {})
+    message_id = f'{account}-TDA'[:35]
+    last_date = max(chunk.dates, default=None)
+    header = dict(statement_id=f'{account}-{last_date}'[:35] if last_date else message_id, account=account,
+                  currency='USD', closing_date=ISODate(value=last_date) if last_date else None)
+    return ValidatedFile(message_id, [StatementData(header, list(chunk_entries(chunk)))])
+
+
+def validate_file(parsed: ParsedFile, account: str) -> ValidatedFile:
+    if parsed.source_format == 'flexquery':
+        return _validate_flexquery(parsed.records)
+    return _validate_td_ameritrade(parsed.records, account)
+
+
+def write_file(validated: ValidatedFile, target: Path) -> int:
+    written = 0
+    try:
+        with StatementWriter(target, message_id=validated.message_id) as writer:
+            for statement in validated.statements:
+                with writer.statement(**statement.header) as session:
+                    written += session.write_entries(statement.entries)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+    return written
+
+
+def available_path(path: Path, stem: str, taken: Collection[Path] = ()) -> Path:
+    """
+    `path` if it neither exists nor is in `taken`, otherwise the first free `<stem>-<n><rest of the name>`, counting
+    from 2, e.g. `a-2.camt053.xml` for `a.camt053.xml` with stem `a`.
+    """
+    rest = path.name[len(stem):]
+    candidate, counter = path, 1
+    while candidate in taken or candidate.exists():
+        counter += 1
+        candidate = path.with_name(f'{stem}-{counter}{rest}')
+    return candidate
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of `values`, 0.0 for no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+class StageMetrics:
+    """
+    Latency and throughput of a stage. Latencies are kept for the last `window` files.
+    """
+
+    def __init__(self, name: str, window: int = 10_000):
+        self.name = name
+        self.count = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.wait_times: Deque[float] = deque(maxlen=window)
+        self.processing_times: Deque[float] = deque(maxlen=window)
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+
+    def record(self, wait: float, start: float, end: float, failed: bool = False) -> None:
+        self.count += 1
+        self.failed += failed
+        self.busy += end - start
+        self.wait_times.append(wait)
+        self.processing_times.append(end - start)
+        self.first_start = start if self.first_start is None else min(self.first_start, start)
+        self.last_end = end if self.last_end is None else max(self.last_end, end)
+
+    @property
+    def throughput(self) -> float:
+        """
+        Files per second from the first start to the last end of the stage.
+        """
+        if self.first_start is None or self.last_end <= self.first_start:
+            return 0.0
+        return self.count / (self.last_end - self.first_start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        wait_times, processing_times = list(self.wait_times), list(self.processing_times)
+        return {
+            'count': self.count,
+            'failed': self.failed,
+            'throughput': self.throughput,
+            'busy_seconds': self.busy,
+            'wait_p50': percentile(wait_times, 50),
+            'wait_p95': percentile(wait_times, 95),
+            'latency_p50': percentile(processing_times, 50),
+            'latency_p95': percentile(processing_times, 95),
+            'latency_max': max(processing_times, default=0.0),
+        }
+
+
+@dataclass
+class _Job:
+    result: FileResult
+    source_format: str
+    future: asyncio.Future
+    payload: Any = None
+    received: float = field(default_factory=time.perf_counter)
+    queued: float = field(default_factory=time.perf_counter)
+
+
+class IngestionService:
+    """
+    Bounded parse -> validate -> write pipeline.
+
+    Usage::
+
+        async with IngestionService('camt053') as service:
+            result = await (await service.submit('statement.xml'))
+
+    `submit` waits while the parse queue is full and returns a future of the `FileResult`.
+    """
+
+    def __init__(self, output_dir: str | Path, parse_workers: int = 4, validate_workers: int = 4,
+                 write_workers: int = 2, queue_size: int = 16, executor: Optional[Executor] = None,
+                 source_format: Optional[str] = None, account: Optional[str] = None,
+                 compression: Optional[str] = None, max_bytes: int = 256 * 2 ** 20):
+        """
+        :param output_dir: directory for the CAMT.053 files.
+        :param parse_workers: concurrency limit of the parse stage, likewise for the other stages.
+        :param queue_size: number of files held in each queue between two stages.
+        :param executor: executor for parsing and validation, defaults to a thread pool.
+        :param source_format: source format of all files, detected by extension by default.
+        :param account: account identification for sources without one (TD Ameritrade).
+        :param compression: compression of the CAMT.053 files, 'gzip' or 'zstd'.
+        :param max_bytes: size on disk of the source files held in the pipeline at once, `submit` waits while it would
+        be exceeded. A larger file is converted alone.
+        """
+        if min(parse_workers, validate_workers, write_workers, queue_size, max_bytes) < 1:
+            raise ValueError('Workers, queue size and max_bytes must be at least 1')
+        self.output_dir = Path(output_dir)
+        self.workers = dict(zip(STAGES, (parse_workers, validate_workers, write_workers)))
+        self.queue_size = queue_size
+        self.source_format = source_format
+        self.account = account
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.bytes_held = 0
+        self.metrics = {stage: StageMetrics(stage) for stage in STAGES}
+        self._executor = executor
+        self._own_executors: List[Executor] = []
+        self._write_executor: Optional[Executor] = None
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._budget: Optional[asyncio.Condition] = None
+        # Targets of the files in the pipeline, not yet written
+        self._targets: Set[Path] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers['parse'] + self.workers['validate'],
+                                                thread_name_prefix='camt053-ingest')
+            self._own_executors.append(self._executor)
+        self._write_executor = ThreadPoolExecutor(self.workers['write'], thread_name_prefix='camt053-write')
+        self._own_executors.append(self._write_executor)
+
+        self._queues = {stage: asyncio.Queue(self.queue_size) for stage in STAGES}
+        self._budget = asyncio.Condition()
+        steps: Dict[str, Callable[[_Job], Any]] = {
+            'parse': lambda job: (self._executor, parse_file, job.result.source, job.source_format),
+            'validate': lambda job: (self._executor, validate_file, job.payload,
+                                     self.account or job.result.source.stem[:35]),
+            'write': lambda job: (self._write_executor, write_file, job.payload, job.result.target),
+        }
+        for index, stage in enumerate(STAGES):
+            next_stage = STAGES[index + 1] if index + 1 < len(STAGES) else None
+            self._tasks.extend(asyncio.create_task(self._worker(stage, steps[stage], next_stage))
+                               for _ in range(self.workers[stage]))
+
+    async def submit(self, source: str | Path) -> asyncio.Future:
+        """
+        Queue a file for conversion, waits while the parse queue is full or the files in the pipeline take up
+        `max_bytes`. The target is `cli.target_path`, with a counter if it is in use or exists, see `available_path`.
+        """
+        if not self._tasks:
+            raise ValueError('IngestionService is not started')
+        source = Path(source)
+        future = asyncio.get_running_loop().create_future()
+        result = FileResult(source, target_path(source, self.output_dir, self.compression), 0)
+        try:
+            result.size = source.stat().st_size
+            source_format = self.source_format or detect_format(source)
+        except (OSError, ValueError) as e:
+            result.error = f'{type(e).__name__}: {e}'
+            future.set_result(result)
+            return future
+        async with self._budget:
+            await self._budget.wait_for(
+                lambda: self.bytes_held == 0 or self.bytes_held + result.size <= self.max_bytes)
+            self.bytes_held += result.size
+        # Chosen after the wait, a file submitted meanwhile may have taken the target
+        result.target = available_path(result.target, uncompressed_path(source).stem, self._targets)
+        self._targets.add(result.target)
+        await self._queues['parse'].put(_Job(result, source_format, future))
+        return future
+
+    async def _worker(self, stage: str, step: Callable[[_Job], Any], next_stage: Optional[str]) -> None:
+        loop = asyncio.get_running_loop()
+        queue, metrics = self._queues[stage], self.metrics[stage]
+        while True:
+            job = await queue.get()
+            try:
+                start = time.perf_counter()
+                executor, function, *args = step(job)
+                try:
+                    job.payload = await loop.run_in_executor(executor, function, *args)
+                except Exception as e:
+                    metrics.record(start - job.queued, start, time.perf_counter(), failed=True)
+                    job.payload = None
+                    job.result.error = f'{type(e).__name__}: {e}'
+                    await self._finish(job)
+                    continue
+                end = time.perf_counter()
+                metrics.record(start - job.queued, start, end)
+
+                if next_stage is None:
+                    job.result.entries, job.payload = job.payload, None
+                    await self._finish(job)
+                else:
+                    job.queued = end
+                    # Blocks while the next stage is saturated, which in turn fills this queue
+                    await self._queues[next_stage].put(job)
+            finally:
+                queue.task_done()
+
+    async def _finish(self, job: _Job) -> None:
+        async with self._budget:
+            self.bytes_held -= job.result.size
+            self._budget.notify_all()
+        self._targets.discard(job.result.target)
+        job.result.seconds = time.perf_counter() - job.received
+        if job.result.error is None:
+            logger.info(f'{job.result.source.name}: {job.result.entries} entries in {job.result.seconds:.3f}s')
+        else:
+            logger.warning(f'{job.result.source.name}: {job.result.error}')
+        if not job.future.done():
+            job.future.set_result(job.result)
+
+    async def join(self) -> None:
+        """
+        Wait until every submitted file has gone through all stages.
+        """
+        for stage in STAGES:
+            await self._queues[stage].join()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        for executor in self._own_executors:
+            executor.shutdown(wait=True)
+        self._own_executors.clear()
+
+    async def __aenter__(self) -> 'IngestionService':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        try:
+            if exc_type is None:
+                await self.join()
+        finally:
+            await self.stop()
+
+    def metrics_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        snapshot = {stage: self.metrics[stage].snapshot() for stage in STAGES}
+        for stage in STAGES:
+            snapshot[stage]['queued'] = self._queues[stage].qsize() if self._queues else 0
+        return snapshot
+
+    async def watch(self, inbox: str | Path, interval: float = 1.0, once: bool = False) -> None:
+        """
+        Poll `inbox` for `.xml` and `.csv` files (compressed or not) and convert them, moving each file to `processed/`
+        or `failed/` once done, next to earlier files of the same name (`available_path`). With `once` the files
+        present are converted and the method returns.
+
+        A file is picked up once its size and modification time are unchanged over two polls, so a file still being
+        copied into the inbox is not converted half-written. Writers that cannot pause `interval` seconds within a
+        copy should write elsewhere and rename the finished file into the inbox.
+        New external code set releases in the directories of `code_sets.registry` are loaded on every poll.
+        """
+        inbox = Path(inbox)
+        pending: Set[Path] = set()
+        completions: List[asyncio.Future] = []
+        # Size and modification time of the files not yet submitted, as seen by the previous poll
+        unstable: Dict[Path, Tuple[int, int]] = {}
+
+        def move(source: Path, future: asyncio.Future) -> None:
+            folder = inbox / ('failed' if future.result().error else 'processed')
+            folder.mkdir(exist_ok=True)
+            try:
+                shutil.move(str(source), str(available_path(folder / source.name, uncompressed_path(source).stem)))
+            except OSError as e:
+                logger.error(f'Cannot move {source.name} to {folder}: {e}')
+            pending.discard(source)
+
+        while True:
+            for release in code_set_registry.refresh():
+                logger.info(f'Loaded external code sets {release.version} effective {release.effective}')
+            sources = []
+            previous, unstable = unstable, {}
+            for path in sorted(inbox.iterdir()):
+                if not path.is_file() or not is_source_file(path) or path in pending:
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                if previous.get(path) == (stat.st_size, stat.st_mtime_ns):
+                    sources.append(path)
+                else:
+                    unstable[path] = (stat.st_size, stat.st_mtime_ns)
+            for source in sources:
+                pending.add(source)
+                future = await self.submit(source)
+                future.add_done_callback(lambda f, source=source: move(source, f))
+                completions.append(future)
+            if once and not unstable:
+                await asyncio.gather(*completions)
+                # the done callbacks run on the next iteration of the event loop
+                await asyncio.sleep(0)
+                return
+            completions = [future for future in completions if not future.done()]
+            await asyncio.sleep(interval)
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    service = IngestionService(args.output_dir, args.parse_workers, args.validate_workers, args.write_workers,
+                               args.queue_size, source_format=args.format, account=args.account,
+                               compression=args.compress, max_bytes=args.max_megabytes * 2 ** 20)
+    async with service:
+        try:
+            await service.watch(args.inbox, args.interval, once=args.once)
+        finally:
+            print(json.dumps(service.metrics_snapshot(), indent=2))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='camt053-serve', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inbox', type=Path, help='directory watched for source files')
+    parser.add_argument('-o', '--output-dir', type=Path, default=Path('.'), help='directory for the CAMT.053 files')
+    parser.add_argument('--parse-workers', type=int, default=4, help='concurrency limit of the parse stage')
+    parser.add_argument('--validate-workers', type=int, default=4, help='concurrency limit of the validate stage')
+    parser.add_argument('--write-workers', type=int, default=2, help='concurrency limit of the write stage')
+    parser.add_argument('--queue-size', type=int, default=16, help='files held between two stages')
+    parser.add_argument('--max-megabytes', type=int, default=256,
+                        help='size of the source files held in the pipeline at once')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between two polls of the inbox')
+    parser.add_argument('--once', action='store_true', help='convert the files in the inbox and exit')
+    parser.add_argument('-f', '--format', choices=('flexquery', 'td_ameritrade'),
+                        help='source format, detected by extension')
+    parser.add_argument('-z', '--compress', choices=COMPRESSIONS, help='compress the CAMT.053 files')
+    parser.add_argument('--account', help='account identification for sources without one (TD Ameritrade)')
+    parser.add_argument('--code-sets', type=Path, help='directory watched for external code set releases')
+    parser.add_argument('--log-level', default='INFO', help='loguru level')
+    args = parser.parse_args(argv)
+
+    if not args.inbox.is_dir():
+        parser.error(f'{args.inbox} is not a directory')
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    if args.code_sets is not None:
+        code_set_registry.add_directory(args.code_sets)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
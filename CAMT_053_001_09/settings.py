@@ -0,0 +1,105 @@
+"""
+Resolved snapshot of the Dynaconf configuration and the context-local time zone override.
+
+The datetime validators read the configuration through `get_settings()`, an immutable snapshot resolved once,
+instead of the dynamic attribute lookup of Dynaconf on every value. `reload_settings()` re-reads the settings files
+and environment variables, replaces the snapshot and calls the hooks registered with `on_reload`.
+
+The time zone of naive datetime values can be overridden per context without touching the global configuration,
+e.g. by a worker processing statements of different banks::
+
+    with timezone_override('America/New_York'):
+        entries = list(iter_entries('ibkr.xml'))
+
+The override is held in a context variable, so it applies to the current thread or asyncio task only.
+`timezone_override` works as a decorator as well.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+from CAMT_053_001_09.timezones import get_timezone
+from config import settings as config
+
+
+def check_timezone(name: str) -> str:
+    """
+    Return `name` if it is 'local', 'utc' or a known IANA time zone, raise a ValueError otherwise.
+    """
+    get_timezone(name)
+    return name
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Immutable snapshot of the configuration used by the models.
+    :param naive_timezone: time zone of datetime values without offset, DateTime.naive in settings.toml
+    """
+    naive_timezone: str = 'local'
+
+    @classmethod
+    def from_config(cls) -> 'Settings':
+        return cls(naive_timezone=check_timezone(config.get('DateTime.naive', 'local')))
+
+
+_lock = threading.Lock()
+_settings: Optional[Settings] = None
+_hooks: List[Callable[[Settings], None]] = []
+_timezone_override: ContextVar[Optional[str]] = ContextVar('timezone_override', default=None)
+
+
+def get_settings() -> Settings:
+    """
+    The current settings snapshot, resolved on first use.
+    """
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                _settings = Settings.from_config()
+    return _settings
+
+
+def reload_settings() -> Settings:
+    """
+    Re-read the configuration, replace the snapshot and call the reload hooks with the new snapshot.
+    """
+    global _settings
+    with _lock:
+        config.reload()
+        _settings = Settings.from_config()
+        hooks = list(_hooks)
+    for hook in hooks:
+        hook(_settings)
+    return _settings
+
+
+def on_reload(hook: Callable[[Settings], None]) -> Callable[[Settings], None]:
+    """
+    Register `hook` to be called with the new snapshot after `reload_settings`. Usable as a decorator.
+    """
+    with _lock:
+        _hooks.append(hook)
+    return hook
+
+
+def naive_timezone() -> str:
+    """
+    Time zone of naive datetime values: the override of the current context, the configured one otherwise.
+    """
+    return _timezone_override.get() or get_settings().naive_timezone
+
+
+@contextmanager
+def timezone_override(name: str) -> Iterator[str]:
+    """
+    Treat naive datetime values as `name` within the block (or decorated function) in the current context.
+    """
+    token = _timezone_override.set(check_timezone(name))
+    try:
+        yield name
+    finally:
+        _timezone_override.reset(token)
@@ -0,0 +1,265 @@
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from CAMT_053_001_09.base_models import from_minor_units
+from CAMT_053_001_09.message_components import CashBalance8, ReportEntry12
+from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyAndAmount, ActiveOrHistoricCurrencyCode, \
+    CreditDebitCode, ExternalBalanceType1Code, ExternalBankTransactionDomain1Code, ExternalBankTransactionFamily1Code, \
+    ExternalBankTransactionSubFamily1Code, ExternalEntryStatus1Code, ISODate, ISODateTime, Max35Text
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS code (
+        id INTEGER PRIMARY KEY, code_set TEXT NOT NULL, code TEXT NOT NULL, UNIQUE (code_set, code)
+    );
+    CREATE TABLE IF NOT EXISTS statement (
+        id INTEGER PRIMARY KEY, statement_id TEXT NOT NULL, account TEXT NOT NULL, ccy TEXT NOT NULL,
+        creation_date_time TEXT, opening_amount INTEGER, opening_credit_debit INTEGER, opening_date TEXT,
+        closing_amount INTEGER, closing_credit_debit INTEGER, closing_date TEXT
+    );
+    CREATE TABLE IF NOT EXISTS entry (
+        id INTEGER PRIMARY KEY, statement INTEGER NOT NULL REFERENCES statement (id) ON DELETE CASCADE,
+        entry_reference TEXT, amount INTEGER NOT NULL, ccy TEXT NOT NULL, credit_debit INTEGER NOT NULL,
+        status INTEGER NOT NULL REFERENCES code (id), booking_date TEXT, value_date TEXT,
+        account_servicer_reference TEXT, domain INTEGER NOT NULL REFERENCES code (id),
+        family INTEGER NOT NULL REFERENCES code (id), sub_family INTEGER NOT NULL REFERENCES code (id),
+        end_to_end_id TEXT, additional_entry_information TEXT
+    );
+    CREATE INDEX IF NOT EXISTS statement_account ON statement (account, ccy);
+    CREATE INDEX IF NOT EXISTS entry_statement ON entry (statement);
+    CREATE INDEX IF NOT EXISTS entry_booking_date ON entry (booking_date);
+    CREATE INDEX IF NOT EXISTS entry_value_date ON entry (value_date);
+    CREATE INDEX IF NOT EXISTS entry_account_servicer_reference ON entry (account_servicer_reference);
+    CREATE INDEX IF NOT EXISTS entry_end_to_end_id ON entry (end_to_end_id);
+"""
+
+ENTRY_COLUMNS = ('entry_reference', 'amount', 'ccy', 'credit_debit', 'status', 'booking_date', 'value_date',
+                 'account_servicer_reference', 'domain', 'family', 'sub_family', 'end_to_end_id',
+                 'additional_entry_information')
+_CREDIT_DEBIT = ('CRDT', 'DBIT')
+
+
+@dataclass
+class StoredStatement:
+    id: int
+    statement_id: str
+    account: str
+    ccy: str
+    creation_date_time: Optional[str]
+    opening_balance: Optional[CashBalance8]
+    closing_balance: Optional[CashBalance8]
+    entry_count: int
+
+
+def _balance_columns(balance: Optional[CashBalance8]) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+    if balance is None:
+        return None, None, None
+    return (balance.amount.minor_units, _CREDIT_DEBIT.index(balance.credit_debit_indicator.code),
+            balance.date.value)
+
+
+def _balance(balance_type: str, ccy: str, amount: Optional[int], credit_debit: Optional[int],
+             date: Optional[str]) -> Optional[CashBalance8]:
+    if amount is None:
+        return None
+    return CashBalance8(
+        type=ExternalBalanceType1Code(code=balance_type),
+        amount=ActiveOrHistoricCurrencyAndAmount(amount=from_minor_units(amount, ccy), ccy=ccy),
+        credit_debit_indicator=CreditDebitCode(code=_CREDIT_DEBIT[credit_debit]),
+        date=ISODate(value=date),
+    )
+
+
+class StatementStore:
+    """
+    SQLite store of validated statements and entries.
+
+    Amounts are stored as integer minor units, codes as references to a table of the codes per code set (named
+    after the datatype, e.g. `ExternalBankTransactionDomain1Code`). Entries are written with `executemany` in one
+    transaction per statement, the database runs in WAL mode so readers are not blocked by a running import.
+
+    Usage::
+
+        with StatementStore('history.sqlite') as store:
+            store.add_statement('STMT-1', 'CH9300762011623852957', 'CHF', entries, opening_balance=opening)
+            for entry in store.entries(account='CH9300762011623852957', booking_date=('2023-04-01', '2023-04-30')):
+                ...
+    """
+
+    def __init__(self, path: str | Path = ':memory:', batch_size: int = 10_000):
+        """
+        :param path: SQLite file, `:memory:` for a non-persistent store.
+        :param batch_size: number of entries passed to a single `executemany`.
+        """
+        self._connection = sqlite3.connect(str(path))
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        self._connection.executescript(SCHEMA)
+        self._batch_size = batch_size
+        self._code_ids: Dict[Tuple[str, str], int] = {}
+        self._codes: Dict[int, str] = {}
+        self._load_codes()
+
+    def _load_codes(self) -> None:
+        self._code_ids.clear()
+        self._codes.clear()
+        for code_id, code_set, code in self._connection.execute('SELECT id, code_set, code FROM code'):
+            self._code_ids[code_set, code] = code_id
+            self._codes[code_id] = code
+
+    def _code_id(self, code_set: Type, code: str) -> int:
+        key = (code_set.__name__, code)
+        code_id = self._code_ids.get(key)
+        if code_id is None:
+            # Another connection to the database may have added the code since the codes were loaded
+            self._connection.execute('INSERT OR IGNORE INTO code (code_set, code) VALUES (?, ?)', key)
+            code_id = self._connection.execute('SELECT id FROM code WHERE code_set = ? AND code = ?', key).fetchone()[0]
+            self._code_ids[key] = code_id
+            self._codes[code_id] = code
+        return code_id
+
+    def _entry_row(self, statement: int, entry: ReportEntry12) -> Tuple[Any, ...]:
+        domain = entry.bank_transaction_code.domain
+        return (
+            statement,
+            entry.entry_reference and entry.entry_reference.value,
+            entry.amount.minor_units,
+            entry.amount.ccy,
+            _CREDIT_DEBIT.index(entry.credit_debit_indicator.code),
+            self._code_id(ExternalEntryStatus1Code, entry.status.code),
+            entry.booking_date and entry.booking_date.value,
+            entry.value_date and entry.value_date.value,
+            entry.account_servicer_reference and entry.account_servicer_reference.value,
+            self._code_id(ExternalBankTransactionDomain1Code, domain.code.code),
+            self._code_id(ExternalBankTransactionFamily1Code, domain.family.code.code),
+            self._code_id(ExternalBankTransactionSubFamily1Code, domain.family.sub_family_code.code),
+            entry.end_to_end_id and entry.end_to_end_id.value,
+            entry.additional_entry_information and entry.additional_entry_information.value,
+        )
+
+    def add_statement(self, statement_id: str, account: str, ccy: str, entries: Iterable[ReportEntry12],
+                      opening_balance: Optional[CashBalance8] = None, closing_balance: Optional[CashBalance8] = None,
+                      creation_date_time: Optional[datetime | str] = None) -> int:
+        """
+        Store a statement and its entries in a single transaction, returns the row id of the statement.
+        """
+        statement_id, account = Max35Text(value=statement_id).value, Max35Text(value=account).value
+        ccy = ActiveOrHistoricCurrencyCode(ccy)
+        creation_date_time = ISODateTime(value=creation_date_time).value if creation_date_time is not None else None
+        try:
+            with self._connection:
+                statement = self._insert_statement(statement_id, account, ccy, entries, opening_balance,
+                                                   closing_balance, creation_date_time)
+        except BaseException:
+            # Codes inserted by the failed transaction are gone again
+            self._load_codes()
+            raise
+        return statement
+
+    def _insert_statement(self, statement_id: str, account: str, ccy: str, entries: Iterable[ReportEntry12],
+                          opening_balance: Optional[CashBalance8], closing_balance: Optional[CashBalance8],
+                          creation_date_time: Optional[str]) -> int:
+        insert = (f'INSERT INTO entry (statement, {", ".join(ENTRY_COLUMNS)}) '
+                  f'VALUES ({", ".join("?" * (len(ENTRY_COLUMNS) + 1))})')
+        statement = self._connection.execute(
+            'INSERT INTO statement VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (statement_id, account, ccy, creation_date_time, *_balance_columns(opening_balance),
+             *_balance_columns(closing_balance))).lastrowid
+        iterator = iter(entries)
+        while batch := list(islice(iterator, self._batch_size)):
+            for entry in batch:
+                if entry.amount.ccy != ccy:
+                    raise ValueError(f'Entry currency {entry.amount.ccy} differs from statement currency {ccy}')
+            self._connection.executemany(insert, [self._entry_row(statement, entry) for entry in batch])
+        return statement
+
+    def delete_statement(self, statement: int) -> None:
+        with self._connection:
+            self._connection.execute('DELETE FROM statement WHERE id = ?', (statement,))
+
+    def statements(self, account: Optional[str] = None, ccy: Optional[str] = None) -> List[StoredStatement]:
+        conditions, parameters = [], []
+        for column, value in (('account', account), ('ccy', ccy)):
+            if value is not None:
+                conditions.append(f's.{column} = ?')
+                parameters.append(value)
+        rows = self._connection.execute(
+            'SELECT s.*, (SELECT COUNT(*) FROM entry e WHERE e.statement = s.id) FROM statement s'
+            f'{" WHERE " + " AND ".join(conditions) if conditions else ""} ORDER BY s.id', parameters)
+        return [
+            StoredStatement(row[0], row[1], row[2], row[3], row[4], _balance('OPBD', row[3], *row[5:8]),
+                            _balance('CLBD', row[3], *row[8:11]), row[11])
+            for row in rows
+        ]
+
+    def entries(self, account: Optional[str] = None, statement: Optional[int] = None, ccy: Optional[str] = None,
+                booking_date: Tuple[Optional[str], Optional[str]] = (None, None),
+                value_date: Tuple[Optional[str], Optional[str]] = (None, None),
+                account_servicer_reference: Optional[str] = None,
+                end_to_end_id: Optional[str] = None) -> Iterator[ReportEntry12]:
+        """
+        Stored entries matching all the given criteria, in insertion order. Dates are inclusive (start, end) ranges,
+        either bound may be None. Rows are turned into entries through the trusted construction path.
+        """
+        conditions, parameters = [], []
+        for column, value in (('s.account', account), ('e.statement', statement), ('e.ccy', ccy),
+                              ('e.account_servicer_reference', account_servicer_reference),
+                              ('e.end_to_end_id', end_to_end_id)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                parameters.append(value)
+        for column, (start, end) in (('e.booking_date', booking_date), ('e.value_date', value_date)):
+            if start is not None:
+                conditions.append(f'{column} >= ?')
+                parameters.append(start)
+            if end is not None:
+                conditions.append(f'{column} <= ?')
+                parameters.append(end)
+
+        join = ' JOIN statement s ON s.id = e.statement' if account is not None else ''
+        cursor = self._connection.execute(
+            f'SELECT {", ".join("e." + column for column in ENTRY_COLUMNS)} FROM entry e{join}'
+            f'{" WHERE " + " AND ".join(conditions) if conditions else ""} ORDER BY e.id', parameters)
+        codes = self._codes
+        for (entry_reference, amount, ccy, credit_debit, status, booking_date, value_date,
+             account_servicer_reference, domain, family, sub_family, end_to_end_id,
+             additional_entry_information) in cursor:
+            try:
+                status, domain, family, sub_family = codes[status], codes[domain], codes[family], codes[sub_family]
+            except KeyError:
+                # Codes added by another connection since they were loaded, `codes` is reloaded in place
+                self._load_codes()
+                status, domain, family, sub_family = codes[status], codes[domain], codes[family], codes[sub_family]
+            yield ReportEntry12.construct_trusted(
+                from_minor_units(amount, ccy), ccy, _CREDIT_DEBIT[credit_debit], status, domain,
+                family, sub_family, booking_date=booking_date, value_date=value_date,
+                entry_reference=entry_reference, account_servicer_reference=account_servicer_reference,
+                end_to_end_id=end_to_end_id, additional_entry_information=additional_entry_information,
+            )
+
+    def total(self, account: str, ccy: str, booking_date: Tuple[Optional[str], Optional[str]] = (None, None)) -> \
+            Decimal:
+        """
+        Net amount (credits - debits) of the account's entries in `ccy`, summed in minor units by SQLite.
+        """
+        start, end = booking_date
+        minor = self._connection.execute(
+            'SELECT COALESCE(SUM(CASE e.credit_debit WHEN 0 THEN e.amount ELSE -e.amount END), 0) FROM entry e '
+            'JOIN statement s ON s.id = e.statement WHERE s.account = ? AND e.ccy = ? '
+            'AND (? IS NULL OR e.booking_date >= ?) AND (? IS NULL OR e.booking_date <= ?)',
+            (account, ccy, start, start, end, end)).fetchone()[0]
+        return from_minor_units(minor, ccy)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'StatementStore':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,197 @@
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from CAMT_053_001_09.base_models import currency_decimal_places, from_minor_units
+from CAMT_053_001_09.message_components import AmountAndDirection35, CashBalance8, NumberAndSumOfTransactions1, \
+    NumberAndSumOfTransactions4, ReportEntry12, TotalTransactions6
+from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyAndAmount, CreditDebitCode, \
+    ExternalBalanceType1Code, ISODate, Max15NumericText
+
+
+class CurrencyTotals:
+    """
+    Running credit and debit totals of a single currency, kept as exact integer minor units.
+    """
+    __slots__ = ('ccy', 'credit_count', 'credit_sum', 'debit_count', 'debit_sum')
+
+    def __init__(self, ccy: str):
+        self.ccy = ccy
+        self.credit_count = 0
+        self.credit_sum = 0
+        self.debit_count = 0
+        self.debit_sum = 0
+
+    @property
+    def count(self) -> int:
+        return self.credit_count + self.debit_count
+
+    @property
+    def net(self) -> int:
+        """Signed net amount in minor units, positive for a net credit."""
+        return self.credit_sum - self.debit_sum
+
+
+class TransactionSummary:
+    """
+    Single-pass aggregator over statement entries.
+
+    Every entry is added as integer minor units of its currency, so the totals are exact regardless of the number
+    of entries. From the totals the `TxsSummry` block of a currency can be built and the closing balance can be
+    checked against the opening balance.
+
+    Usage::
+
+        summary = TransactionSummary(opening_balance)
+        for entry in summary.consume(entries):
+            ...  # entries pass through unchanged
+        summary.verify_closing_balance(closing_balance)
+        txs_summry = summary.to_total_transactions()
+    """
+
+    def __init__(self, opening_balance: Optional[CashBalance8] = None):
+        self.opening_balance = opening_balance
+        self._totals: Dict[str, CurrencyTotals] = {}
+        # Per-currency scale factors, the amount quantization done by the datatypes guarantees exactness
+        self._scales: Dict[str, int] = {}
+
+    def add(self, amount: Decimal, ccy: str, credit_debit_indicator: str) -> None:
+        """
+        Add a single amount. `credit_debit_indicator` is the plain code, `CRDT` or `DBIT`.
+        """
+        try:
+            totals = self._totals[ccy]
+            scale = self._scales[ccy]
+        except KeyError:
+            totals = self._totals[ccy] = CurrencyTotals(ccy)
+            scale = self._scales[ccy] = currency_decimal_places(ccy)
+
+        scaled = amount.scaleb(scale)
+        minor = int(scaled)
+        if minor != scaled:
+            raise ValueError(f'Amount {amount} has more fractional digits than allowed for {ccy}')
+
+        if credit_debit_indicator == 'CRDT':
+            totals.credit_count += 1
+            totals.credit_sum += minor
+        elif credit_debit_indicator == 'DBIT':
+            totals.debit_count += 1
+            totals.debit_sum += minor
+        else:
+            raise ValueError(f'Invalid credit debit indicator: `{credit_debit_indicator}`')
+
+    def restore_totals(self, totals: CurrencyTotals) -> None:
+        """
+        Continue from the running totals of a currency, e.g. those recorded in a checkpoint.
+        """
+        self._totals[totals.ccy] = totals
+        self._scales[totals.ccy] = currency_decimal_places(totals.ccy)
+
+    def add_entry(self, entry: ReportEntry12) -> None:
+        self.add(entry.amount.amount, entry.amount.ccy, entry.credit_debit_indicator.code)
+
+    def consume(self, entries: Iterable[ReportEntry12]) -> Iterator[ReportEntry12]:
+        """
+        Pass entries through unchanged while adding them, so the summary can sit in an existing entry stream.
+        """
+        add = self.add
+        for entry in entries:
+            add(entry.amount.amount, entry.amount.ccy, entry.credit_debit_indicator.code)
+            yield entry
+
+    def update(self, entries: Iterable[ReportEntry12]) -> 'TransactionSummary':
+        for _ in self.consume(entries):
+            pass
+        return self
+
+    @property
+    def currencies(self) -> List[str]:
+        return sorted(self._totals)
+
+    def totals(self, ccy: Optional[str] = None) -> CurrencyTotals:
+        """
+        Totals of `ccy`. May be omitted if all entries share a single currency.
+        """
+        if ccy is None:
+            if len(self._totals) > 1:
+                raise ValueError(f'Entries in several currencies ({", ".join(self.currencies)}), specify one')
+            ccy = next(iter(self._totals), None)
+            if ccy is None:
+                ccy = self.opening_balance.amount.ccy if self.opening_balance is not None else None
+            if ccy is None:
+                raise ValueError('No entries and no opening balance to derive a currency from')
+        return self._totals.get(ccy) or CurrencyTotals(ccy)
+
+    def net_amount(self, ccy: Optional[str] = None) -> ActiveOrHistoricCurrencyAndAmount:
+        """
+        Absolute net amount of `ccy`, use `net_credit_debit_indicator` for its direction.
+        """
+        totals = self.totals(ccy)
+        return ActiveOrHistoricCurrencyAndAmount(amount=from_minor_units(abs(totals.net), totals.ccy), ccy=totals.ccy)
+
+    def net_credit_debit_indicator(self, ccy: Optional[str] = None) -> CreditDebitCode:
+        return CreditDebitCode(code='CRDT' if self.totals(ccy).net >= 0 else 'DBIT')
+
+    def to_total_transactions(self, ccy: Optional[str] = None) -> TotalTransactions6:
+        """
+        Build the `TxsSummry` block of `ccy`. The ISO sums are unsigned and carry no currency.
+        """
+        totals = self.totals(ccy)
+        net = totals.net
+        return TotalTransactions6(
+            total_entries=NumberAndSumOfTransactions4(
+                number_of_entries=Max15NumericText(value=str(totals.count)),
+                sum=from_minor_units(totals.credit_sum + totals.debit_sum, totals.ccy),
+                total_net_entry=AmountAndDirection35(
+                    amount=from_minor_units(abs(net), totals.ccy),
+                    credit_debit_indicator=CreditDebitCode(code='CRDT' if net >= 0 else 'DBIT'),
+                ),
+            ),
+            total_credit_entries=NumberAndSumOfTransactions1(
+                number_of_entries=Max15NumericText(value=str(totals.credit_count)),
+                sum=from_minor_units(totals.credit_sum, totals.ccy),
+            ),
+            total_debit_entries=NumberAndSumOfTransactions1(
+                number_of_entries=Max15NumericText(value=str(totals.debit_count)),
+                sum=from_minor_units(totals.debit_sum, totals.ccy),
+            ),
+        )
+
+    def expected_closing_minor_units(self) -> int:
+        """
+        Signed closing balance in minor units: opening balance plus the net of all entries in its currency.
+        """
+        if self.opening_balance is None:
+            raise ValueError('An opening balance is required to compute the closing balance')
+        opening = self.opening_balance
+        opening_minor = opening.amount.minor_units
+        if opening.credit_debit_indicator.code == 'DBIT':
+            opening_minor = -opening_minor
+        return opening_minor + self.totals(opening.amount.ccy).net
+
+    def expected_closing_balance(self, date: ISODate, balance_type: str = 'CLBD') -> CashBalance8:
+        ccy = self.opening_balance.amount.ccy if self.opening_balance is not None else None
+        closing = self.expected_closing_minor_units()
+        return CashBalance8(
+            type=ExternalBalanceType1Code(code=balance_type),
+            amount=ActiveOrHistoricCurrencyAndAmount(amount=from_minor_units(abs(closing), ccy), ccy=ccy),
+            credit_debit_indicator=CreditDebitCode(code='CRDT' if closing >= 0 else 'DBIT'),
+            date=date,
+        )
+
+    def verify_closing_balance(self, closing_balance: CashBalance8) -> None:
+        """
+        Check that opening balance plus entries equals `closing_balance`, raises a ValueError otherwise.
+        """
+        if self.opening_balance is not None and closing_balance.amount.ccy != self.opening_balance.amount.ccy:
+            raise ValueError(
+                f'Closing balance currency {closing_balance.amount.ccy} differs from opening balance currency '
+                f'{self.opening_balance.amount.ccy}')
+        actual = closing_balance.amount.minor_units
+        if closing_balance.credit_debit_indicator.code == 'DBIT':
+            actual = -actual
+        expected = self.expected_closing_minor_units()
+        if actual != expected:
+            ccy = closing_balance.amount.ccy
+            raise ValueError(
+                f'Closing balance {from_minor_units(actual, ccy)} {ccy} does not match opening balance plus entries '
+                f'{from_minor_units(expected, ccy)} {ccy}')
@@ -0,0 +1,221 @@
+"""
+Chunked converter for TD Ameritrade activity (transaction history) CSV exports.
+
+Rows are read in chunks and every chunk is validated a column at a time: each distinct date is parsed once and the
+amounts are quantized in one sweep, then entries are built through the trusted construction path instead of
+validating every row with pydantic.
+"""
+import csv
+import io
+import re
+import time
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from loguru import logger
+
+from CAMT_053_001_09.base_models import currency_decimal_places
+from CAMT_053_001_09.compression import open_input
+from CAMT_053_001_09.dedup import EntryDeduplicator
+from CAMT_053_001_09.message_components import CashBalance8, ReportEntry12
+from CAMT_053_001_09.message_datatypes import ISODate, Max35Text
+from CAMT_053_001_09.writer import StatementWriter
+
+END_OF_FILE = '***END OF FILE***'
+DATE_REGEX = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+
+# Description keyword -> (domain, family, sub-family) for (credits, debits), the first match wins
+DESCRIPTION_CODES: List[Tuple[str, Tuple[str, str, str], Tuple[str, str, str]]] = [
+    ('BOUGHT', ('SECU', 'SETT', 'TRAD'), ('SECU', 'SETT', 'TRAD')),
+    ('SOLD', ('SECU', 'SETT', 'TRAD'), ('SECU', 'SETT', 'TRAD')),
+    ('DIVIDEND', ('SECU', 'CUST', 'DVCA'), ('SECU', 'CUST', 'DVCA')),
+    ('WITHHOLDING', ('ACMT', 'MCOP', 'TAXE'), ('ACMT', 'MDOP', 'TAXE')),
+    ('INTEREST', ('ACMT', 'MCOP', 'INTR'), ('ACMT', 'MDOP', 'INTR')),
+    ('FEE', ('ACMT', 'MCOP', 'FEES'), ('ACMT', 'MDOP', 'FEES')),
+    ('FUNDING', ('PMNT', 'RCDT', 'OTHR'), ('PMNT', 'ICDT', 'OTHR')),
+    ('WIRE', ('PMNT', 'RCDT', 'OTHR'), ('PMNT', 'ICDT', 'OTHR')),
+]
+DEFAULT_CODES = (('ACMT', 'MCOP', 'OTHR'), ('ACMT', 'MDOP', 'OTHR'))
+
+
+@dataclass
+class Chunk:
+    """
+    Validated columns of a chunk of rows, only rows with an amount are kept.
+    """
+    dates: List[str]
+    amounts: List[Decimal]
+    transaction_ids: List[Optional[str]]
+    descriptions: List[Optional[str]]
+
+
+def validate_date_column(values: Sequence[str], row_numbers: Sequence[int], cache: Dict[str, str]) -> List[str]:
+    """
+    Convert a column of MM/DD/YYYY dates to YYYY-MM-DD. Each distinct value is validated only once, `cache` keeps
+    the results across chunks.
+    """
+    for value in set(values).difference(cache):
+        match = DATE_REGEX.fullmatch(value.strip())
+        try:
+            if match is None:
+                raise ValueError
+            month, day, year = (int(group) for group in match.groups())
+            cache[value] = date(year, month, day).isoformat()
+        except ValueError:
+            raise ValueError(f'Invalid date `{value}` in row {row_numbers[values.index(value)]}') from None
+    return [cache[value] for value in values]
+
+
+def validate_amount_column(values: Sequence[str], row_numbers: Sequence[int], ccy: str) -> List[Decimal]:
+    """
+    Convert a column of signed amounts to decimals quantized for `ccy`, at most 18 digits as for the datatypes.
+    """
+    decimal_places = currency_decimal_places(ccy)
+    quantum = Decimal(f'1E-{decimal_places}')
+    limit = Decimal(10) ** (18 - decimal_places)
+    try:
+        amounts = [Decimal(value.replace(',', '')).quantize(quantum, rounding=ROUND_HALF_UP) for value in values]
+        if all(amount.is_finite() and abs(amount) < limit for amount in amounts):
+            return amounts
+    except InvalidOperation:
+        pass
+
+    # Locate the offending row for the error message
+    for value, row in zip(values, row_numbers):
+        try:
+            amount = Decimal(value.replace(',', ''))
+            if not amount.is_finite() or abs(amount) >= limit:
+                raise InvalidOperation
+        except InvalidOperation:
+            raise ValueError(f'Invalid amount `{value}` in row {row}') from None
+    raise ValueError('Invalid amount column')
+
+
+def validate_text_column(values: Sequence[str], max_length: int) -> List[Optional[str]]:
+    """
+    Strip a text column, empty values become None and longer values are truncated to `max_length`.
+    """
+    return [value.strip()[:max_length] or None for value in values]
+
+
+def column_indexes(header: Sequence[str]) -> Tuple[int, int, int, int]:
+    """
+    Indexes of the date, transaction id, description and amount columns in the header row.
+    """
+    header = [name.strip().upper() for name in header]
+    try:
+        return tuple(header.index(name) for name in ('DATE', 'TRANSACTION ID', 'DESCRIPTION', 'AMOUNT'))
+    except ValueError as e:
+        raise ValueError(f'Not a TD Ameritrade activity file, missing column: {e}') from None
+
+
+def validate_chunk(rows: Sequence[Sequence[str]], first_row_number: int, indexes: Tuple[int, int, int, int],
+                   date_cache: Dict[str, str]) -> Chunk:
+    """
+    Validate a chunk of rows column by column, `first_row_number` is the file row number of `rows[0]`.
+    """
+    date_index, id_index, description_index, amount_index = indexes
+    width = max(indexes) + 1
+    # Blank lines, the trailer and rows without an amount (e.g. share journals) carry no cash movement
+    numbered = []
+    for number, row in enumerate(rows, first_row_number):
+        if not any(row) or row[0] == END_OF_FILE:
+            continue
+        if len(row) < width:
+            raise ValueError(f'Expected at least {width} columns, got {len(row)} in row {number}')
+        if row[amount_index].strip():
+            numbered.append((number, row))
+    if not numbered:
+        return Chunk([], [], [], [])
+
+    row_numbers, rows = zip(*numbered)
+    columns = list(zip(*rows))
+    return Chunk(
+        dates=validate_date_column(columns[date_index], row_numbers, date_cache),
+        amounts=validate_amount_column(columns[amount_index], row_numbers, 'USD'),
+        transaction_ids=validate_text_column(columns[id_index], 35),
+        descriptions=validate_text_column(columns[description_index], 500),
+    )
+
+
+def iter_chunks(source: TextIO, chunk_size: int) -> Iterator[Tuple[int, Chunk]]:
+    """
+    Yield (number of rows read, validated chunk) for every `chunk_size` rows of the CSV file.
+    """
+    reader = csv.reader(source)
+    indexes = column_indexes(next(reader, []))
+    row_number = 2
+    date_cache: Dict[str, str] = {}
+    while rows := list(islice(reader, chunk_size)):
+        yield len(rows), validate_chunk(rows, row_number, indexes, date_cache)
+        row_number += len(rows)
+
+
+def bank_transaction_codes(description: Optional[str], credit: bool) -> Tuple[str, str, str]:
+    description = (description or '').upper()
+    for keyword, credit_codes, debit_codes in DESCRIPTION_CODES:
+        if keyword in description:
+            return credit_codes if credit else debit_codes
+    return DEFAULT_CODES[0] if credit else DEFAULT_CODES[1]
+
+
+def chunk_entries(chunk: Chunk, ccy: str = 'USD') -> Iterator[ReportEntry12]:
+    for booking_date, amount, transaction_id, description in zip(
+            chunk.dates, chunk.amounts, chunk.transaction_ids, chunk.descriptions):
+        credit = amount >= 0
+        domain, family, sub_family = bank_transaction_codes(description, credit)
+        yield ReportEntry12.construct_trusted(
+            abs(amount), ccy, 'CRDT' if credit else 'DBIT', 'BOOK', domain, family, sub_family,
+            booking_date=booking_date, value_date=booking_date, account_servicer_reference=transaction_id,
+            additional_entry_information=description,
+        )
+
+
+def convert_td_ameritrade(source: str | Path | TextIO, target: str | Path | BinaryIO, account: str,
+                          statement_id: Optional[str] = None, opening_balance: Optional[CashBalance8] = None,
+                          message_id: Optional[str] = None,
+                          deduplicator: Optional[EntryDeduplicator] = None, chunk_size: int = 10_000) -> int:
+    """
+    Convert a TD Ameritrade activity CSV file into a CAMT.053 file with a single USD statement.
+    :param source: CSV file path (gzip or zstd compressed or not) or text file object.
+    :param target: CAMT.053 file path (compressed by suffix, `.gz` or `.zst`) or binary file object.
+    :param account: account identification written to the statement.
+    :param statement_id: statement identification, defaults to the account and the last booking date.
+    :param opening_balance: optional opening balance, the closing balance is derived from it.
+    :param message_id: group header message identification, defaults to the statement identification.
+    :param deduplicator: optional deduplicator, entries already seen are dropped.
+    :param chunk_size: number of rows validated at a time.
+    :return: number of entries written. The throughput in rows per second is logged.
+    """
+    if isinstance(source, (str, Path)):
+        with open_input(source) as stream, io.TextIOWrapper(stream, encoding='utf-8-sig', newline='') as f:
+            return convert_td_ameritrade(f, target, account, statement_id, opening_balance, message_id,
+                                         deduplicator, chunk_size)
+
+    start = time.perf_counter()
+    rows = written = 0
+    last_date = None
+    message_id = (message_id or statement_id or f'{account}-TDA')[:35]
+    with StatementWriter(target, message_id=message_id, deduplicator=deduplicator) as writer:
+        statement = writer.statement(statement_id or message_id, account=account, currency='USD',
+                                     opening_balance=opening_balance)
+        for read, chunk in iter_chunks(source, chunk_size):
+            rows += read
+            written += statement.write_entries(chunk_entries(chunk))
+            if chunk.dates:
+                last_date = max(last_date or chunk.dates[0], max(chunk.dates))
+            logger.debug(f'TD Ameritrade: {rows} rows, {rows / (time.perf_counter() - start):.0f} rows/s')
+        if last_date is not None:
+            statement.closing_date = ISODate(value=last_date)
+            if statement_id is None:
+                statement.statement_id = Max35Text(value=f'{account}-{last_date}'[:35])
+        statement.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info(f'TD Ameritrade: converted {rows} rows into {written} entries in {elapsed:.2f}s '
+                f'({rows / elapsed if elapsed else 0:.0f} rows/s)')
+    return written
@@ -0,0 +1,173 @@
+"""
+Cached time zones and precomputed UTC offset tables.
+
+`get_timezone` resolves a time zone name ('local', 'utc' or an IANA name) once. `offset_table` precomputes the
+transitions of a time zone for a year, so that converting local timestamps is a bisection over a handful of
+boundaries plus a subtraction instead of a transition search per value::
+
+    to_utc(datetime(2023, 3, 26, 12, 0), 'Europe/Zurich')      # 2023-03-26 10:00:00+00:00
+    column_to_utc(trade_times, 'America/New_York')
+
+Nonexistent and ambiguous local times are resolved like pendulum does for `DateTime.replace(tzinfo=...)`, so the
+results match the datetime models:
+
+* in a DST gap (clocks moved forward) `fold=0` applies the offset after the transition, `fold=1` the one before,
+* in a DST fold (clocks moved back) `fold=0` applies the offset before the transition (the first occurrence),
+  `fold=1` the one after (the second occurrence).
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+import pendulum
+from pendulum.tz.timezone import Timezone
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+SAMPLE_SECONDS = 6 * 3600  # no time zone has two transitions within six hours
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name: str) -> Timezone:
+    """
+    The pendulum time zone of `name`, resolved once per name.
+    """
+    if name == 'local':
+        return pendulum.local_timezone()
+    try:
+        return pendulum.timezone(name)
+    except Exception as e:
+        raise ValueError(f'Unknown time zone: {name}') from e
+
+
+@lru_cache(maxsize=None)
+def fixed_offset(seconds: int) -> timezone:
+    return timezone(timedelta(seconds=seconds))
+
+
+def local_seconds(value: datetime) -> int:
+    """
+    Seconds since 1970-01-01T00:00:00 of the wall clock time of `value`, ignoring any tzinfo and microseconds.
+    """
+    return (value.toordinal() - EPOCH_ORDINAL) * 86400 + value.hour * 3600 + value.minute * 60 + value.second
+
+
+def wall_clock(value: datetime, tzinfo=None) -> datetime:
+    """
+    Plain `datetime` of the wall clock time of `value` (e.g. a pendulum DateTime) with `tzinfo`.
+    """
+    return datetime(value.year, value.month, value.day, value.hour, value.minute, value.second, value.microsecond,
+                    tzinfo)
+
+
+def _utcoffset(tz: Timezone, utc_seconds: int) -> int:
+    # pendulum keeps the fold of the local time, datetime.fromtimestamp(utc_seconds, tz) does not
+    return pendulum.from_timestamp(utc_seconds, tz).offset
+
+
+@dataclass(frozen=True)
+class OffsetTable:
+    """
+    UTC offsets of a time zone from two days before to two days after a year, in seconds.
+    :param transitions: UTC seconds of the transitions in the range
+    :param offsets: offset before the first transition, then the offset after each transition
+    """
+    name: str
+    year: int
+    transitions: Tuple[int, ...]
+    offsets: Tuple[int, ...]
+
+    def __post_init__(self):
+        # Wall clock boundaries of the transitions: the pre-transition offset applies up to T + before (fold=0)
+        # or T + after (fold=1) local time
+        object.__setattr__(self, '_bounds', (
+            tuple(t + self.offsets[i] for i, t in enumerate(self.transitions)),
+            tuple(t + self.offsets[i + 1] for i, t in enumerate(self.transitions)),
+        ))
+        object.__setattr__(self, '_deltas', tuple(timedelta(seconds=offset) for offset in self.offsets))
+
+    @classmethod
+    def build(cls, name: str, year: int) -> 'OffsetTable':
+        tz = get_timezone(name)
+        start = (date(year, 1, 1).toordinal() - EPOCH_ORDINAL - 2) * 86400
+        end = (date(year + 1, 1, 1).toordinal() - EPOCH_ORDINAL + 2) * 86400
+        transitions, offsets = [], [_utcoffset(tz, start)]
+        previous = start
+        for sample in range(start + SAMPLE_SECONDS, end + SAMPLE_SECONDS, SAMPLE_SECONDS):
+            offset = _utcoffset(tz, sample)
+            if offset != offsets[-1]:
+                # Bisect to the first second with the new offset
+                low, high = previous, sample
+                while high - low > 1:
+                    middle = (low + high) // 2
+                    if _utcoffset(tz, middle) == offset:
+                        high = middle
+                    else:
+                        low = middle
+                transitions.append(high)
+                offsets.append(offset)
+            previous = sample
+        return cls(name, year, tuple(transitions), tuple(offsets))
+
+    def utcoffset(self, seconds: int, fold: int = 0) -> int:
+        """
+        Offset of the wall clock time `seconds` (see `local_seconds`).
+        """
+        return self.offsets[bisect_right(self._bounds[fold], seconds)]
+
+    def to_utc(self, value: datetime, fold: int = 0) -> datetime:
+        """
+        UTC datetime of the wall clock time of `value`.
+        """
+        delta = self._deltas[bisect_right(self._bounds[fold], local_seconds(value))]
+        return wall_clock(value, timezone.utc) - delta
+
+    def utcoffset_at(self, utc_seconds: int) -> int:
+        """
+        Offset in effect at the instant `utc_seconds`.
+        """
+        return self.offsets[bisect_right(self.transitions, utc_seconds)]
+
+
+@lru_cache(maxsize=1024)
+def offset_table(name: str, year: int) -> OffsetTable:
+    """
+    The offset table of `name` for `year`, built once.
+    """
+    return OffsetTable.build(name, year)
+
+
+def to_utc(value: datetime, name: str, fold: int = 0) -> datetime:
+    """
+    Interpret the wall clock time of `value` in the time zone `name` and return the UTC datetime. Any tzinfo of
+    `value` is ignored.
+    """
+    return offset_table(name, value.year).to_utc(value, fold)
+
+
+def localize(value: datetime, name: str, fold: int = 0) -> datetime:
+    """
+    Interpret the wall clock time of `value` in the time zone `name`. Returns a datetime with the fixed offset in
+    effect at that instant; a time in a DST gap is shifted to an existing wall clock time like pendulum does.
+    """
+    table = offset_table(name, value.year)
+    seconds = local_seconds(value)
+    offset = table.utcoffset(seconds, fold)
+    actual = table.utcoffset_at(seconds - offset)
+    value = wall_clock(value, fixed_offset(actual))
+    return value + timedelta(seconds=actual - offset) if actual != offset else value
+
+
+def column_to_utc(values: Iterable[datetime], name: str, fold: int = 0) -> List[datetime]:
+    """
+    `to_utc` of a column of naive datetimes, looking up the offset table once per year.
+    """
+    tables = {}
+    result = []
+    for value in values:
+        table = tables.get(value.year)
+        if table is None:
+            table = tables[value.year] = offset_table(name, value.year)
+        result.append(table.to_utc(value, fold))
+    return result
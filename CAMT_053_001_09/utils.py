@@ -1,5 +1,7 @@
-import json
-from pathlib import Path
+import gc
+from contextlib import contextmanager
+
+from CAMT_053_001_09.code_sets import registry
 
 
 def set_valid_codes_decorator(valid_codes):
@@ -19,23 +21,12 @@ def set_regex_decorator(regex_pattern: str):
 
 
 def set_external_code_set_decorator():
-    json_path = Path(__file__).parent / 'json' / '4Q2022_ExternalCodeSets_v1.json'
-    with json_path.open(mode='r', encoding='utf-8') as f:
-        data = json.load(f)
-
+    """
+    Validate the codes of the decorated class against the external code set of the same name, in the release of
+    `code_sets.registry` in effect (see `code_sets.code_sets_as_of`).
+    """
     def decorator(cls):
-        class_name = cls.__name__
-        item = data['definitions'][class_name]
-
-        if t := item.get('type') != 'string':
-            raise ValueError(f'Unhandled type for {class_name}: {t}')
-        if e := item.get('enum'):
-            valid_codes = set(e)
-            cls.set_valid_codes(valid_codes)
-        elif (minl := item.get('minLength')) and (maxl := item.get('maxLength')):
-            regex = f'^[A-Z]{{{minl},{maxl}}}$'
-            cls.set_regex(regex)
-        return cls
+        return registry.bind(cls)
 
     return decorator
 
@@ -46,3 +37,18 @@ def set_datetime_format_decorator(format_string: str):
         return cls
 
     return decorator
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector while building many long-lived objects at once. Every model instance would
+    otherwise count towards the collection thresholds and trigger repeated full collections.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
@@ -0,0 +1,225 @@
+"""
+Compact binary format for shipping entries between processes.
+
+Pickled models are large (about 500 bytes per entry) and slow to build. The wire format packs a batch of entries
+column by column with `struct`, in little endian byte order::
+
+    data = encode_entries(entries)                  # bytes, e.g. the argument of a worker task
+    entries = decode_entries(data)                  # models built through the trusted construction path
+
+    columns = decode_columns(encode_columns(entries_to_columns(entries)))   # plain values, without models
+
+Every column of `cache.COLUMNS` is encoded by its kind:
+
+- amount: integer minor units, int64.
+- currency, codes and dates: the distinct values of the batch, then for every entry the index of its value in one,
+  two or four bytes. Currencies and codes are sent as integer IDs (see `code_id`), codes without an ID as text.
+  Dates are sent as days since 1970-01-01, int32.
+- text: the lengths in characters, uint16, and the UTF-8 text of the whole column.
+
+Code IDs are computed from the letters of the code, not looked up in the releases of the code-set registry. The codes
+of every release are at most four uppercase letters, and an ID derived from the letters is the same in every process,
+whatever releases it has loaded.
+"""
+import struct
+from datetime import date
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from CAMT_053_001_09.cache import COLUMNS, columns_to_entries, entries_to_columns
+from CAMT_053_001_09.message_components import ReportEntry12
+
+WIRE_MAGIC = b'CAW1'
+CODE_LETTERS = 6
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# IDs of None, and of codes without an ID of their own which follow as text
+NO_CURRENCY_ID = 0xFFFF
+NO_CODE_ID = 0xFFFFFFFF
+NO_DATE = -2 ** 31
+NO_TEXT = 0xFFFF
+ID_FORMATS = {
+    'ccy': ('H', NO_CURRENCY_ID),
+    'credit_debit_indicator': ('I', NO_CODE_ID),
+    'status': ('I', NO_CODE_ID),
+    'booking_date': ('i', NO_DATE),
+    'value_date': ('i', NO_DATE),
+    'domain': ('I', NO_CODE_ID),
+    'family': ('I', NO_CODE_ID),
+    'sub_family': ('I', NO_CODE_ID),
+}
+DATE_COLUMNS = frozenset(('booking_date', 'value_date'))
+
+
+def code_id(code: str, letters: int = CODE_LETTERS) -> Optional[int]:
+    """
+    ID of a code of up to `letters` uppercase letters: the letters as digits 1 to 26 of a number in base 27, so codes
+    of different lengths never share an ID. None for other codes. Currencies (3 letters) fit in 16 bits, codes of up
+    to 6 letters in 32 bits.
+    """
+    if not 0 < len(code) <= letters:
+        return None
+    value = 0
+    for character in reversed(code):
+        digit = ord(character) - 64
+        if not 0 < digit < 27:
+            return None
+        value = value * 27 + digit
+    return value
+
+
+def code_from_id(value: int) -> str:
+    letters = []
+    while value:
+        value, digit = divmod(value, 27)
+        letters.append(chr(digit + 64))
+    return ''.join(letters)
+
+
+def epoch_days(value: str) -> int:
+    """
+    Days since 1970-01-01 of an ISO date `YYYY-MM-DD`.
+    """
+    return date.fromisoformat(value).toordinal() - EPOCH_ORDINAL
+
+
+def date_from_epoch_days(days: int) -> str:
+    return date.fromordinal(days + EPOCH_ORDINAL).isoformat()
+
+
+def _index_format(size: int) -> str:
+    return 'B' if size <= 0x100 else 'H' if size <= 0x10000 else 'I'
+
+
+def _pack_text(values: Sequence[Optional[str]]) -> List[bytes]:
+    if None in values:
+        lengths = [len(value) if value is not None else NO_TEXT for value in values]
+        longest = max((len(value) for value in values if value is not None), default=0)
+    else:
+        lengths = list(map(len, values))
+        longest = max(lengths, default=0)
+    # A text of NO_TEXT characters would be read as None
+    if longest >= NO_TEXT:
+        raise ValueError(f'Text longer than {NO_TEXT - 1} characters')
+    text = ''.join(filter(None, values)).encode('utf-8')
+    return [struct.pack(f'<{len(lengths)}H', *lengths), struct.pack('<I', len(text)), text]
+
+
+def _unpack_text(reader: '_Reader', rows: int) -> List[Optional[str]]:
+    lengths = reader.unpack(f'<{rows}H')
+    size, = reader.unpack('<I')
+    text = str(reader.data[reader.offset:reader.offset + size], 'utf-8')
+    reader.offset += size
+    if NO_TEXT not in lengths:
+        offsets = list(accumulate(lengths, initial=0))
+        return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+    values: List[Optional[str]] = []
+    position = 0
+    for length in lengths:
+        if length == NO_TEXT:
+            values.append(None)
+        else:
+            values.append(text[position:position + length])
+            position += length
+    return values
+
+
+def _pack_dictionary(name: str, values: Sequence[Optional[str]]) -> List[bytes]:
+    # The distinct values of the batch in order of appearance, then the index of every value
+    positions = {value: position for position, value in enumerate(dict.fromkeys(values))}
+    indices = list(map(positions.__getitem__, values))
+    fmt, no_id = ID_FORMATS[name]
+    parts = [struct.pack('<I', len(positions))]
+    if name in DATE_COLUMNS:
+        for value in positions:
+            if value is not None and len(value) != 10:
+                raise ValueError(f'Not an ISO date: {value}')
+        parts.append(struct.pack(f'<{len(positions)}{fmt}',
+                                 *(epoch_days(value) if value is not None else no_id for value in positions)))
+    else:
+        ids = [code_id(value, CODE_LETTERS if fmt == 'I' else 3) if value is not None else None
+               for value in positions]
+        parts.append(struct.pack(f'<{len(ids)}{fmt}', *(no_id if value is None else value for value in ids)))
+        escaped = [value for value, value_id in zip(positions, ids) if value_id is None]
+        if escaped:
+            parts.extend(_pack_text(escaped))
+    parts.append(struct.pack(f'<{len(indices)}{_index_format(len(positions))}', *indices))
+    return parts
+
+
+def _unpack_dictionary(name: str, reader: '_Reader', rows: int) -> List[Optional[str]]:
+    fmt, no_id = ID_FORMATS[name]
+    size, = reader.unpack('<I')
+    ids = reader.unpack(f'<{size}{fmt}')
+    if name in DATE_COLUMNS:
+        table = [date_from_epoch_days(value) if value != no_id else None for value in ids]
+    else:
+        table = [code_from_id(value) if value != no_id else None for value in ids]
+        escaped = ids.count(no_id)
+        if escaped:
+            escaped_values = iter(_unpack_text(reader, escaped))
+            table = [next(escaped_values) if value == no_id else code for value, code in zip(ids, table)]
+    return list(map(table.__getitem__, reader.unpack(f'<{rows}{_index_format(size)}')))
+
+
+def encode_columns(columns: Dict[str, Sequence[Any]]) -> bytes:
+    """
+    Encode the columns of `cache.entries_to_columns`.
+    """
+    rows = len(columns['amount'])
+    parts = [WIRE_MAGIC, struct.pack('<I', rows)]
+    for name in COLUMNS:
+        values = columns[name]
+        if len(values) != rows:
+            raise ValueError(f'Column {name} has {len(values)} values, expected {rows}')
+        if name == 'amount':
+            parts.append(struct.pack(f'<{rows}q', *values))
+        elif name in ID_FORMATS:
+            parts.extend(_pack_dictionary(name, values))
+        else:
+            parts.extend(_pack_text(values))
+    return b''.join(parts)
+
+
+class _Reader:
+
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, fmt: str) -> Tuple:
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+
+def decode_columns(data: bytes) -> Dict[str, List[Any]]:
+    """
+    The columns of entries encoded with `encode_columns` or `encode_entries`.
+    """
+    if data[:len(WIRE_MAGIC)] != WIRE_MAGIC:
+        raise ValueError('Not encoded in the wire format')
+    reader = _Reader(data)
+    reader.offset = len(WIRE_MAGIC)
+    rows, = reader.unpack('<I')
+    columns: Dict[str, List[Any]] = {}
+    for name in COLUMNS:
+        if name == 'amount':
+            columns[name] = list(reader.unpack(f'<{rows}q'))
+        elif name in ID_FORMATS:
+            columns[name] = _unpack_dictionary(name, reader, rows)
+        else:
+            columns[name] = _unpack_text(reader, rows)
+    if reader.offset != len(data):
+        raise ValueError(f'{len(data) - reader.offset} bytes left after {rows} entries')
+    return columns
+
+
+def encode_entries(entries: Iterable[ReportEntry12]) -> bytes:
+    return encode_columns(entries_to_columns(entries))
+
+
+def decode_entries(data: bytes) -> List[ReportEntry12]:
+    """
+    Entries encoded with `encode_entries`, built without validation like entries loaded from the cache.
+    """
+    return list(columns_to_entries(decode_columns(data)))
@@ -0,0 +1,561 @@
+import io
+import os
+import re
+import shutil
+from concurrent.futures import Executor
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+from lxml.etree import Element, SubElement, tostring, xmlfile
+
+from CAMT_053_001_09.checkpoint import CheckpointStore, balance_from_state, balance_to_state, sync
+from CAMT_053_001_09.compression import compression_for_path, open_output
+from CAMT_053_001_09.dedup import EntryDeduplicator
+from CAMT_053_001_09.digest import CanonicalDigest, DigestingWriter, DocumentDigests
+from CAMT_053_001_09.message_components import CAMT_053_NAMESPACE, CashBalance8, Pagination1, ReportEntry12
+from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyCode, ISODate, ISODateTime, Max35Text, \
+    Max5NumericText
+from CAMT_053_001_09.parallel import serialize_entries, serialize_entry
+from CAMT_053_001_09.summary import CurrencyTotals, TransactionSummary
+
+IBAN_REGEX = re.compile(r'^[A-Z]{2}[0-9]{2}[a-zA-Z0-9]{1,30}$')
+# Bytes reserved per statement on a page for the statement elements preceding the entries (identification,
+# pagination, account, balances and transaction summary take about 1 kB)
+STATEMENT_HEADER_RESERVE = 2048
+
+
+def _text_element(tag: str, text: str) -> Element:
+    element = Element(tag)
+    element.text = text
+    return element
+
+
+def _pagination(page_number: int, last: bool) -> Pagination1:
+    return Pagination1(page_number=Max5NumericText(value=str(page_number)), last_page_indicator=last)
+
+
+class _ResumedOutput(io.RawIOBase):
+    """
+    Output of a writer resumed from a checkpoint. The document header written again is compared with `header`, the
+    header already in the file, and dropped. Everything after it is appended to `stream`.
+    """
+
+    def __init__(self, stream: BinaryIO, header: bytes):
+        super().__init__()
+        self._stream = stream
+        self._header = header
+        self.compared = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        size = len(data)
+        if self.compared < len(self._header):
+            count = min(size, len(self._header) - self.compared)
+            if data[:count] != self._header[self.compared:self.compared + count]:
+                raise ValueError('The output file does not match the checkpoint')
+            self.compared += count
+            data = data[count:]
+        if data:
+            self._stream.write(data)
+        return size
+
+
+class StatementSession:
+    """
+    A statement (`Stmt`) being written by a `StatementWriter`.
+
+    Entries are serialized immediately into a spooled buffer while the transaction summary is aggregated, because
+    the balances and `TxsSummry` precede the entries in the document. The statement is written out when the session
+    is closed, memory use is bounded by the spool size.
+
+    If the writer paginates, a statement may be split over several pages: each page of the statement carries its
+    page number (`StmtPgntn`), the summary of its own entries and interim booked balances (`ITBD`) where it is cut.
+    """
+
+    def __init__(self, writer: 'StatementWriter', statement_id: str, account: str, currency: str,
+                 opening_balance: Optional[CashBalance8] = None, closing_date: Optional[ISODate] = None,
+                 creation_date_time: Optional[ISODateTime] = None, spool: Optional[Tuple[str, int]] = None):
+        """
+        :param spool: name and length of the spool file to continue, when resuming from a checkpoint.
+        """
+        self._writer = writer
+        self.statement_id = Max35Text(value=statement_id)
+        self.account = Max35Text(value=account)
+        self.currency = ActiveOrHistoricCurrencyCode(currency)
+        self.closing_date = closing_date
+        self.creation_date_time = creation_date_time or writer.creation_date_time
+        self.summary = TransactionSummary(opening_balance)
+        self.page_number = 1
+        self.opening_balance = opening_balance
+        self._spool = writer._open_spool(spool)
+        self.closed = False
+
+    @property
+    def opening_balance(self) -> Optional[CashBalance8]:
+        return self._opening_balance
+
+    @opening_balance.setter
+    def opening_balance(self, balance: Optional[CashBalance8]) -> None:
+        """
+        The opening balance may be set after the session was opened, e.g. when it is reported after the entries. The
+        summary of the first page opens with it, later pages open with the interim balance of the page before.
+        """
+        self._opening_balance = balance
+        if self.page_number == 1:
+            self.summary.opening_balance = balance
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """
+        State of the open statement for a checkpoint, the spool has to be flushed first.
+        """
+        totals = self.summary.totals(self.currency)
+        return dict(
+            statement_id=self.statement_id.value, account=self.account.value, currency=self.currency,
+            opening_balance=balance_to_state(self.opening_balance),
+            closing_date=self.closing_date.value if self.closing_date is not None else None,
+            creation_date_time=self.creation_date_time.value, spool=Path(self._spool.name).name,
+            spool_length=self._spool.tell(),
+            totals=[totals.credit_count, totals.credit_sum, totals.debit_count, totals.debit_sum],
+        )
+
+    @classmethod
+    def from_checkpoint(cls, writer: 'StatementWriter', state: Dict[str, Any]) -> 'StatementSession':
+        session = cls(writer, state['statement_id'], state['account'], state['currency'],
+                      balance_from_state(state['opening_balance']),
+                      ISODate(value=state['closing_date']) if state['closing_date'] is not None else None,
+                      ISODateTime(value=state['creation_date_time']), (state['spool'], state['spool_length']))
+        totals = CurrencyTotals(session.currency)
+        totals.credit_count, totals.credit_sum, totals.debit_count, totals.debit_sum = state['totals']
+        session.summary.restore_totals(totals)
+        return session
+
+    def _accept(self, entry: ReportEntry12) -> bool:
+        if self.closed:
+            raise ValueError(f'Statement {self.statement_id.value} is already closed')
+        if entry.amount.ccy != self.currency:
+            raise ValueError(
+                f'Entry currency {entry.amount.ccy} differs from statement currency {self.currency}')
+        deduplicator = self._writer.deduplicator
+        return deduplicator is None or deduplicator.add(entry)
+
+    def _append(self, entry: ReportEntry12, data: bytes) -> None:
+        self._writer._reserve(len(data))
+        self.summary.add_entry(entry)
+        self._spool.write(data)
+
+    def write_entry(self, entry: ReportEntry12) -> bool:
+        """
+        Add an entry to the statement. Returns False if it was dropped as a duplicate.
+        """
+        if not self._accept(entry):
+            return False
+        self._append(entry, serialize_entry(entry))
+        return True
+
+    def write_entries(self, entries: Iterable[ReportEntry12], executor: Optional[Executor] = None) -> int:
+        """
+        Add entries to the statement, returns the number written.
+        :param executor: serialize the entries in the worker processes of this executor (see `parallel`), with the
+        same output.
+        """
+        if executor is None:
+            return sum(self.write_entry(entry) for entry in entries)
+        written = 0
+        for entries_slice, data, sizes in serialize_entries(entries, executor):
+            view = memoryview(data)
+            offset = 0
+            for entry, size in zip(entries_slice, sizes):
+                # Accepted only when appended, the deduplicator must not record entries still in flight
+                if self._accept(entry):
+                    self._append(entry, view[offset:offset + size])
+                    written += 1
+                offset += size
+        return written
+
+    @property
+    def entry_count(self) -> int:
+        """Entries of the current page of the statement, all entries unless the writer paginates."""
+        return self.summary.totals(self.currency).count
+
+    def header(self, last: bool = True) -> List[Element]:
+        """
+        Elements preceding the entries of the current page: identification, pagination, account, balances and
+        transaction summary.
+        """
+        elements = [_text_element('Id', self.statement_id.value)]
+        if self._writer.paginated:
+            elements.append(_pagination(self.page_number, last).to_xml('StmtPgntn'))
+        elements.append(_text_element('CreDtTm', self.creation_date_time.value))
+
+        account = Element('Acct')
+        account_id = SubElement(account, 'Id')
+        if IBAN_REGEX.match(self.account.value):
+            SubElement(account_id, 'IBAN').text = self.account.value
+        else:
+            SubElement(SubElement(account_id, 'Othr'), 'Id').text = self.account.value
+        SubElement(account, 'Ccy').text = self.currency
+        elements.append(account)
+
+        opening_balance = self.summary.opening_balance
+        if opening_balance is not None:
+            elements.append(opening_balance.to_xml('Bal'))
+            elements.append(self._closing_balance('CLBD' if last else 'ITBD').to_xml('Bal'))
+        if self.entry_count:
+            elements.append(self.summary.to_total_transactions(self.currency).to_xml('TxsSummry'))
+        return elements
+
+    def _closing_balance(self, balance_type: str) -> CashBalance8:
+        return self.summary.expected_closing_balance(self.closing_date or self.opening_balance.date, balance_type)
+
+    def next_page(self) -> None:
+        """
+        Hand the entries written so far to the writer as a page of the statement that is not the last one. The
+        next page starts with the interim booked balance of this one.
+        """
+        self._writer._add_statement(self.header(last=False), self._spool)
+        opening_balance = self._closing_balance('ITBD') if self.opening_balance is not None else None
+        self.summary = TransactionSummary(opening_balance)
+        self.page_number += 1
+        self._spool = self._writer._open_spool()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._writer._add_statement(self.header(), self._spool)
+
+    def __enter__(self) -> 'StatementSession':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.closed = True
+            self._spool.close()
+
+
+class StatementWriter:
+    """
+    Incremental CAMT.053 writer based on `lxml.etree.xmlfile`.
+
+    The group header is written on enter, each statement when its session is closed, so any number of statements
+    can be open at the same time (e.g. one per currency) and the document is never held in memory.
+
+    With `max_entries` or `max_bytes` the message is split on the fly into several files (pages) of the same message
+    identification, numbered in the group header (`MsgPgntn`). A statement that does not fit is continued on the
+    next page. Entries stay spooled until their page is complete, as only then it is known whether it is the last.
+
+    With `checkpoints` the entries are spooled to files in the checkpoint directory and `checkpoint_state` records the
+    output position and the open statements, from which a writer is resumed with `resume` (see `checkpoint`).
+
+    The fingerprints of the entries written are committed to the `deduplicator` when the writer exits without error,
+    or at checkpoints. If it fails they are discarded, so the same file can be converted again.
+
+    Usage::
+
+        with StatementWriter('statement.xml', message_id='MSG-1') as writer:
+            with writer.statement('STMT-1', account='CH9300762011623852957', currency='CHF',
+                                  opening_balance=opening_balance) as statement:
+                statement.write_entries(entries)
+
+        with StatementWriter('statement-{page:03}.xml', message_id='MSG-1', max_entries=10_000) as writer:
+            ...
+        writer.pages  # ['statement-001.xml', 'statement-002.xml', ...]
+    """
+
+    def __init__(self, target: str | Path | BinaryIO | Callable[[int], str | Path | BinaryIO], message_id: str,
+                 creation_date_time: Optional[datetime | str] = None,
+                 deduplicator: Optional[EntryDeduplicator] = None, spool_size: int = 16 * 1024 * 1024,
+                 compression: Optional[str] = None, digest: bool = False, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, checkpoints: Optional[CheckpointStore] = None,
+                 resume: Optional[Dict[str, Any]] = None):
+        """
+        :param target: file path or binary file object. When paginating, a path with a `{page}` placeholder
+        (`str.format` syntax) or a callable returning the path or binary file object of a page number.
+        :param message_id: group header message identification.
+        :param creation_date_time: creation date and time of the message, defaults to now.
+        :param deduplicator: optional deduplicator, entries already seen are dropped. Its fingerprints are held as
+        pending while the writer is open (`batch_size` None).
+        :param spool_size: bytes of serialized entries kept in memory per statement before spilling to disk.
+        :param compression: 'gzip' or 'zstd', defaults to the compression of the target suffix (`.gz`, `.zst`).
+        :param digest: compute the raw and canonical digests of the document, its statements and entries while
+        writing, available as `digests` once the writer is closed (see `digest.CanonicalDigest`).
+        :param max_entries: maximum number of entries per page.
+        :param max_bytes: maximum size of a page in bytes, before compression. A single entry larger than a page is
+        written on a page of its own.
+        :param checkpoints: checkpoint store of the conversion, requires an uncompressed target path and neither
+        pagination nor digests.
+        :param resume: writer state of the checkpoint to resume from. The target is truncated to the recorded
+        position, message identification and creation date and time are those of the checkpoint.
+        """
+        self.paginated = max_entries is not None or max_bytes is not None
+        if self.paginated:
+            if not (callable(target) or isinstance(target, (str, Path)) and '{page' in str(target)):
+                raise ValueError('Pagination needs a target with a {page} placeholder or a callable target')
+            if digest:
+                raise ValueError('Digests are not supported with pagination')
+            if (max_entries is not None and max_entries < 1) or (max_bytes is not None and max_bytes < 1):
+                raise ValueError('max_entries and max_bytes must be positive')
+        if checkpoints is not None:
+            if not isinstance(target, (str, Path)) or (compression or compression_for_path(target)) is not None:
+                raise ValueError('Checkpoints need an uncompressed target path')
+            if self.paginated or digest:
+                raise ValueError('Checkpoints are not supported with pagination or digests')
+        elif resume is not None:
+            raise ValueError('Resuming needs the checkpoint store')
+        if resume is not None:
+            message_id, creation_date_time = resume['message_id'], resume['creation_date_time']
+        self._target = target
+        self.message_id = Max35Text(value=message_id)
+        self.creation_date_time = ISODateTime(value=creation_date_time or datetime.now())
+        self.deduplicator = deduplicator
+        self._batch_size: Optional[int] = None
+        self.spool_size = spool_size
+        self.compression = compression
+        self.digests: Optional[DocumentDigests] = None
+        self._digest = CanonicalDigest() if digest else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.pages: List[str | Path | BinaryIO] = []
+        self._sessions: List[StatementSession] = []
+        self._stack: Optional[ExitStack] = None
+        self._stream: Optional[BinaryIO] = None
+        self._xf = None
+        # Statements of the page being filled, with the entry count and size of the page so far
+        self._page_statements: List[Tuple[List[Element], SpooledTemporaryFile]] = []
+        self._page_entries = 0
+        self._page_bytes = 0
+        self._page_overhead = 0
+        self._open = False
+        self._checkpoints = checkpoints
+        self._resume = resume
+        # Uncompressed output file when checkpointing, with the length of the document header
+        self._file: Optional[BinaryIO] = None
+        self._header_length = 0
+        self._next_spool = 1
+
+    def _group_header(self, pagination: Optional[Pagination1] = None) -> Element:
+        group_header = Element('GrpHdr')
+        SubElement(group_header, 'MsgId').text = self.message_id.value
+        SubElement(group_header, 'CreDtTm').text = self.creation_date_time.value
+        if pagination is not None:
+            group_header.append(pagination.to_xml('MsgPgntn'))
+        return group_header
+
+    def _open_document(self, stack: ExitStack, stream: BinaryIO, pagination: Optional[Pagination1] = None):
+        xf = stack.enter_context(xmlfile(stream, encoding='utf-8', buffered=False))
+        xf.write_declaration()
+        stack.enter_context(xf.element(f'{{{CAMT_053_NAMESPACE}}}Document', nsmap={None: CAMT_053_NAMESPACE}))
+        stack.enter_context(xf.element('BkToCstmrStmt'))
+        xf.write(self._group_header(pagination))
+        return xf
+
+    def _open_spool(self, spool: Optional[Tuple[str, int]] = None) -> BinaryIO:
+        """
+        A new spool for the entries of a statement, a file in the checkpoint directory when checkpointing, or the
+        existing spool file `spool` (name and length) of a checkpoint.
+        """
+        if self._checkpoints is None:
+            return SpooledTemporaryFile(max_size=self.spool_size)
+        if spool is None:
+            path = self._checkpoints.spool_path(f'spool-{self._next_spool}.ntry')
+            self._next_spool += 1
+            return open(path, 'w+b')
+        name, length = spool
+        stream = open(self._checkpoints.spool_path(name), 'r+b')
+        stream.truncate(length)
+        stream.seek(length)
+        return stream
+
+    def _open_checkpointed(self) -> None:
+        if self._resume is None:
+            self._file = self._stack.enter_context(open(self._target, 'wb'))
+            self._stream = self._file
+            self._xf = self._open_document(self._stack, self._stream)
+            self._xf.flush()
+            self._header_length = self._file.tell()
+            return
+
+        state = self._resume
+        self._file = self._stack.enter_context(open(self._target, 'r+b'))
+        if self._file.seek(0, os.SEEK_END) < state['output_position']:
+            raise ValueError(f'The output file {self._target} is shorter than recorded in the checkpoint')
+        self._file.truncate(state['output_position'])
+        self._file.seek(0)
+        header = self._file.read(state['header_length'])
+        self._file.seek(state['output_position'])
+        self._stream = _ResumedOutput(self._file, header)
+        self._xf = self._open_document(self._stack, self._stream)
+        self._xf.flush()
+        if self._stream.compared != len(header):
+            raise ValueError('The output file does not match the checkpoint')
+        self._header_length = len(header)
+        self._next_spool = state['next_spool']
+        self._sessions = [StatementSession.from_checkpoint(self, session) for session in state['sessions']]
+
+    def __enter__(self) -> 'StatementWriter':
+        if self.deduplicator is not None:
+            self.deduplicator.flush()
+            self._batch_size, self.deduplicator.batch_size = self.deduplicator.batch_size, None
+        try:
+            return self._enter()
+        except BaseException:
+            self._end_deduplication(failed=True)
+            raise
+
+    def _enter(self) -> 'StatementWriter':
+        self._open = True
+        if self.paginated:
+            # Size of a page without statements, with the largest page number
+            with ExitStack() as stack:
+                empty = io.BytesIO()
+                self._open_document(stack, empty, _pagination(99999, False))
+            self._page_overhead = len(empty.getvalue())
+            return self
+        self._stack = ExitStack()
+        if self._checkpoints is not None:
+            self._open_checkpointed()
+            return self
+        self._stream = self._stack.enter_context(open_output(self._target, self.compression))
+        if self._digest is not None:
+            self._stream = DigestingWriter(self._stream, self._digest)
+        self._xf = self._open_document(self._stack, self._stream)
+        return self
+
+    def statement(self, statement_id: str, account: str, currency: str,
+                  opening_balance: Optional[CashBalance8] = None, closing_date: Optional[ISODate] = None,
+                  creation_date_time: Optional[ISODateTime] = None) -> StatementSession:
+        """
+        Open a new statement. The closing balance is derived from `opening_balance` and the entries written.
+        """
+        if not self._open:
+            raise ValueError('StatementWriter must be used as a context manager')
+        session = StatementSession(self, statement_id, account, currency, opening_balance, closing_date,
+                                   creation_date_time)
+        self._sessions.append(session)
+        return session
+
+    @property
+    def open_sessions(self) -> List[StatementSession]:
+        return [session for session in self._sessions if not session.closed]
+
+    def checkpoint_state(self, durable: bool = True) -> Dict[str, Any]:
+        """
+        Writer state for a checkpoint: output position and open statements. Output and spools are flushed, and
+        synced to disk if `durable`.
+        """
+        if self._file is None:
+            raise ValueError('Checkpoints need a writer opened with a checkpoint store')
+        self._xf.flush()
+        sessions = self.open_sessions
+        for stream in [self._file] + [session._spool for session in sessions]:
+            if durable:
+                sync(stream)
+            else:
+                stream.flush()
+        return dict(message_id=self.message_id.value, creation_date_time=self.creation_date_time.value,
+                    header_length=self._header_length, output_position=self._file.tell(),
+                    next_spool=self._next_spool, sessions=[session.checkpoint_state() for session in sessions])
+
+    @staticmethod
+    def _write_statement(xf, stream: BinaryIO, header: List[Element], spool: SpooledTemporaryFile) -> None:
+        with xf.element('Stmt'):
+            for element in header:
+                xf.write(element)
+            # Entries are already serialized, copy them verbatim into the output
+            xf.flush()
+            spool.seek(0)
+            shutil.copyfileobj(spool, stream)
+        xf.flush()
+
+    def _add_statement(self, header: List[Element], spool: SpooledTemporaryFile) -> None:
+        """
+        Write a statement, or a page of it, or keep it for the page being filled. Takes ownership of `spool`.
+        """
+        if not self.paginated:
+            try:
+                self._write_statement(self._xf, self._stream, header, spool)
+            finally:
+                spool.close()
+            return
+        self._page_statements.append((header, spool))
+        self._page_bytes += len(b'<Stmt></Stmt>') + sum(len(tostring(element)) for element in header)
+
+    def _reserve(self, size: int) -> None:
+        """
+        Account for an entry of `size` bytes about to be written, starting a new page first if it does not fit.
+        """
+        if not self.paginated:
+            return
+        if self._page_entries and (
+                (self.max_entries is not None and self._page_entries >= self.max_entries) or
+                (self.max_bytes is not None and self._page_overhead + self._page_bytes + size +
+                 STATEMENT_HEADER_RESERVE * sum(not session.closed for session in self._sessions) > self.max_bytes)):
+            for session in self._sessions:
+                if not session.closed and session.entry_count:
+                    session.next_page()
+            self._write_page(last=False)
+        self._page_entries += 1
+        self._page_bytes += size
+
+    def _write_page(self, last: bool) -> None:
+        page_number = len(self.pages) + 1
+        target = self._target(page_number) if callable(self._target) else str(self._target).format(page=page_number)
+        statements, self._page_statements = self._page_statements, []
+        self._page_entries = self._page_bytes = 0
+        try:
+            with ExitStack() as stack:
+                stream = stack.enter_context(open_output(target, self.compression))
+                xf = self._open_document(stack, stream, _pagination(page_number, last))
+                for header, spool in statements:
+                    self._write_statement(xf, stream, header, spool)
+        finally:
+            for _, spool in statements:
+                spool.close()
+        self.pages.append(target)
+
+    def _end_deduplication(self, failed: bool) -> None:
+        if self.deduplicator is not None:
+            self.deduplicator.batch_size = self._batch_size
+            if failed:
+                self.deduplicator.discard()
+            else:
+                self.deduplicator.flush()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        failed = True
+        try:
+            self._close(exc_type, exc_val, exc_tb)
+            failed = exc_type is not None
+        finally:
+            self._end_deduplication(failed)
+
+    def _close(self, exc_type, exc_val, exc_tb) -> None:
+        try:
+            if exc_type is None:
+                for session in self._sessions:
+                    session.close()
+                if self.paginated:
+                    self._write_page(last=True)
+        finally:
+            for session in self._sessions:
+                if not session.closed:
+                    session._spool.close()
+            self._sessions.clear()
+            for _, spool in self._page_statements:
+                spool.close()
+            self._page_statements.clear()
+            self._open = False
+            if self._stack is not None:
+                self._stack.__exit__(exc_type, exc_val, exc_tb)
+                self._stack = None
+            self._xf = None
+            self._file = None
+        if exc_type is None and self._digest is not None:
+            self.digests = self._digest.result()
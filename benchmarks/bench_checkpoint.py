@@ -0,0 +1,97 @@
+"""
+Overhead of checkpoints on the FlexQuery converter, and the time to resume after a crash.
+
+    python -m benchmarks.bench_checkpoint --transactions 200000 --intervals 1000 10000 100000
+
+Converts a generated FlexQuery file without a checkpoint store, then with a store but an interval above the record
+count, which costs the hashing of the input and the spool files but takes no checkpoint, then with checkpoints every
+`interval` records (synced to disk or not). The overhead of checkpoints is measured against the run with a store, and
+reported next to the time spent in the store itself (`CheckpointStore.seconds`). Every conversion is run `--repeat`
+times and the fastest run is reported. Finally a conversion is interrupted at 90% of the input and resumed from its
+last checkpoint.
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from CAMT_053_001_09.checkpoint import CheckpointStore
+from CAMT_053_001_09.dedup import EntryDeduplicator
+from CAMT_053_001_09.flexquery import convert_flexquery
+from tests.factories import FailingReader, flexquery_xml
+
+
+def convert(source, directory: str, name: str, checkpoints=None) -> float:
+    start = time.perf_counter()
+    with EntryDeduplicator(os.path.join(directory, f'{name}.sqlite')) as deduplicator:
+        convert_flexquery(source, os.path.join(directory, f'{name}.xml'), deduplicator=deduplicator,
+                          checkpoints=checkpoints)
+    return time.perf_counter() - start
+
+
+def fastest(source, directory: str, name: str, repeat: int, interval: Optional[int] = None,
+            durable: bool = True) -> Tuple[float, Optional[CheckpointStore]]:
+    """
+    Time of the fastest of `repeat` conversions, each with a new deduplicator, and the checkpoint store of that run.
+    """
+    runs = []
+    for run in range(repeat):
+        checkpoints = None
+        if interval is not None:
+            checkpoints = CheckpointStore(os.path.join(directory, f'{name}-{run}'), interval=interval, durable=durable)
+        runs.append((convert(source, directory, f'{name}-{run}', checkpoints), checkpoints))
+    return min(runs, key=lambda result: result[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=200_000, help='transactions per statement')
+    parser.add_argument('--statements', type=int, default=2)
+    parser.add_argument('--intervals', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every conversion, the fastest is reported')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        data = flexquery_xml(args.statements, args.transactions)
+        source = os.path.join(directory, 'flexquery.xml')
+        with open(source, 'wb') as f:
+            f.write(data)
+        records = args.statements * (args.transactions + 2)
+
+        baseline, _ = fastest(source, directory, 'baseline', args.repeat)
+        logger.info(f'no checkpoint store: {records} records ({len(data) / 2 ** 20:.1f} MB) in {baseline:.2f}s, '
+                    f'{records / baseline:.0f} records/s')
+        store_baseline, _ = fastest(source, directory, 'store', args.repeat, interval=records + 1)
+        logger.info(f'checkpoint store, no checkpoint taken: {store_baseline:.2f}s, '
+                    f'{(store_baseline / baseline - 1) * 100:+.1f}% (input hashing, spool files)')
+        for interval in args.intervals:
+            for durable in (True, False):
+                mode = 'durable' if durable else 'flushed'
+                elapsed, checkpoints = fastest(source, directory, f'checkpoint-{interval}-{mode}', args.repeat,
+                                               interval, durable)
+                logger.info(f'interval {interval}, {mode}: {elapsed:.2f}s, '
+                            f'{(elapsed / store_baseline - 1) * 100:+.1f}% against the store without checkpoints, '
+                            f'{checkpoints.count} checkpoints of '
+                            f'{checkpoints.seconds / max(checkpoints.count, 1) * 1000:.1f} ms, '
+                            f'{checkpoints.seconds:.3f}s in the store, {checkpoints.seconds / elapsed * 100:.2f}% of '
+                            f'the time')
+
+        interval = args.intervals[len(args.intervals) // 2]
+        checkpoints = CheckpointStore(os.path.join(directory, 'crash'), interval=interval)
+        start = time.perf_counter()
+        try:
+            convert(FailingReader(data, len(data) * 9 // 10), directory, 'crash', checkpoints)
+        except OSError:
+            pass
+        crashed = time.perf_counter() - start
+        resumed = convert(source, directory, 'crash', CheckpointStore(os.path.join(directory, 'crash'),
+                                                                       interval=interval))
+        logger.info(f'interrupted at 90% after {crashed:.2f}s, resumed with interval {interval} in {resumed:.2f}s '
+                    f'({resumed / baseline * 100:.0f}% of a full conversion)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Memory footprint and construction time of statements in model and lite mode.
+
+    python -m benchmarks.bench_memory --entries 1000000
+
+Builds the same validated entries as `ReportEntry12` model trees and as `LiteEntry` objects and reports the
+construction time and the memory held by each list (tracemalloc). Both lists are built one after the other, so the
+peak memory of the process is that of the larger one.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from loguru import logger
+
+from CAMT_053_001_09.lite import LiteAmount, LiteEntry
+from CAMT_053_001_09.message_components import BankTransactionCodeStructure4, BankTransactionCodeStructure5, \
+    BankTransactionCodeStructure6, ReportEntry12
+from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyAndAmount, CreditDebitCode, \
+    ExternalBankTransactionDomain1Code, ExternalBankTransactionFamily1Code, ExternalBankTransactionSubFamily1Code, \
+    ExternalEntryStatus1Code, ISODate, Max35Text
+
+CODES = [('PMNT', 'RCDT', 'ESCT'), ('PMNT', 'ICDT', 'ESCT'), ('ACMT', 'MDOP', 'FEES'), ('SECU', 'SETT', 'TRAD')]
+
+
+def generate_rows(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(count):
+        domain, family, sub_family = rng.choice(CODES)
+        booking_date = f'2023-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}'
+        yield (f'{rng.randint(1, 1_000_000) / 100:.2f}', rng.choice(('CHF', 'EUR')), rng.choice(('CRDT', 'DBIT')),
+               domain, family, sub_family, booking_date, f'REF-{i}')
+
+
+def model_entry(amount, ccy, credit_debit_indicator, domain, family, sub_family, booking_date, reference):
+    return ReportEntry12(
+        amount=ActiveOrHistoricCurrencyAndAmount(amount=amount, ccy=ccy),
+        credit_debit_indicator=CreditDebitCode(code=credit_debit_indicator),
+        status=ExternalEntryStatus1Code(code='BOOK'),
+        booking_date=ISODate(value=booking_date),
+        value_date=ISODate(value=booking_date),
+        account_servicer_reference=Max35Text(value=reference),
+        bank_transaction_code=BankTransactionCodeStructure4(domain=BankTransactionCodeStructure5(
+            code=ExternalBankTransactionDomain1Code(code=domain),
+            family=BankTransactionCodeStructure6(
+                code=ExternalBankTransactionFamily1Code(code=family),
+                sub_family_code=ExternalBankTransactionSubFamily1Code(code=sub_family),
+            ),
+        )),
+    )
+
+
+def lite_entry(amount, ccy, credit_debit_indicator, domain, family, sub_family, booking_date, reference):
+    return LiteEntry(LiteAmount(amount, ccy), credit_debit_indicator, 'BOOK', domain, family, sub_family,
+                     booking_date=booking_date, value_date=booking_date, account_servicer_reference=reference)
+
+
+def measure(name: str, build, rows):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    entries = [build(*row) for row in rows]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    logger.info(f'{name}: {len(entries)} entries in {elapsed:.1f}s ({len(entries) / elapsed:.0f} entries/s), '
+                f'{size / 2 ** 20:.0f} MiB, {size / len(entries):.0f} bytes/entry')
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows = list(generate_rows(args.entries))
+    model_time, model_size = measure('model', model_entry, rows)
+    lite_time, lite_size = measure('lite', lite_entry, rows)
+    logger.info(f'lite mode: {model_size / lite_size:.1f}x less memory, {model_time / lite_time:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Serialization of entries in worker processes against a single process.
+
+    python -m benchmarks.bench_parallel --entries 1000000 --workers 1 2 4 8
+
+Serializes the same in-memory entries to `Ntry` bytes in the parent process and through `parallel.serialize_entries`
+with process pools of the given sizes, checks that the bytes are identical and reports the entries per second.
+"""
+import argparse
+import hashlib
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from loguru import logger
+
+from CAMT_053_001_09.message_components import ReportEntry12
+from CAMT_053_001_09.parallel import SLICE_SIZE, serialize_entries, serialize_entry
+
+CODES = [('PMNT', 'RCDT', 'ESCT'), ('PMNT', 'ICDT', 'ESCT'), ('ACMT', 'MDOP', 'FEES'), ('SECU', 'SETT', 'TRAD')]
+
+
+def generate_entries(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(count):
+        domain, family, sub_family = rng.choice(CODES)
+        booking_date = f'2023-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}'
+        yield ReportEntry12.construct_trusted(
+            Decimal(rng.randint(1, 1_000_000)).scaleb(-2), rng.choice(('CHF', 'EUR')), rng.choice(('CRDT', 'DBIT')),
+            'BOOK', domain, family, sub_family, booking_date=booking_date, value_date=booking_date,
+            account_servicer_reference=f'REF-{i}', end_to_end_id=f'E2E-{i}' if i % 2 else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--slice-size', type=int, default=SLICE_SIZE)
+    args = parser.parse_args()
+
+    entries = list(generate_entries(args.entries))
+    start = time.perf_counter()
+    expected = hashlib.sha256()
+    for entry in entries:
+        expected.update(serialize_entry(entry))
+    single = time.perf_counter() - start
+    logger.info(f'single process: {args.entries} entries in {single:.2f}s, {args.entries / single:.0f} entries/s')
+
+    for workers in sorted(set(args.workers)):
+        with ProcessPoolExecutor(workers) as executor:
+            # Start the workers before timing
+            list(serialize_entries(entries[:workers], executor, slice_size=1))
+            start = time.perf_counter()
+            digest = hashlib.sha256()
+            for _, data, _ in serialize_entries(entries, executor, args.slice_size):
+                digest.update(data)
+            elapsed = time.perf_counter() - start
+        if digest.digest() != expected.digest():
+            raise AssertionError(f'Output of {workers} workers differs from the single process output')
+        logger.info(f'{workers} workers: {elapsed:.2f}s, {args.entries / elapsed:.0f} entries/s, '
+                    f'speedup {single / elapsed:.2f}')
+
+
+if __name__ == '__main__':
+    main()
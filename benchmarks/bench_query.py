@@ -0,0 +1,82 @@
+"""
+Benchmark of the entry query index against linear scans.
+
+    python -m benchmarks.bench_query --entries 200000 --queries 1000
+
+Runs the same mix of reconciliation-style queries (reference lookups, date ranges combined with codes) through
+`EntryIndex` and a linear scan, and reports the index build time and queries per second of both.
+"""
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from loguru import logger
+
+from CAMT_053_001_09.message_components import ReportEntry12
+from CAMT_053_001_09.query import EntryIndex, scan
+
+CODES = [('PMNT', 'RCDT', 'ESCT'), ('PMNT', 'ICDT', 'ESCT'), ('PMNT', 'RDDT', 'ESDD'), ('ACMT', 'MDOP', 'FEES'),
+         ('ACMT', 'MCOP', 'INTR'), ('SECU', 'SETT', 'TRAD'), ('SECU', 'CUST', 'DVCA')]
+CURRENCIES = ('CHF', 'EUR', 'USD', 'GBP')
+
+
+def generate_entries(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(count):
+        domain, family, sub_family = rng.choice(CODES)
+        booking_date = f'2023-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}'
+        yield ReportEntry12.construct_trusted(
+            Decimal(rng.randint(1, 1_000_000)).scaleb(-2), rng.choice(CURRENCIES), rng.choice(('CRDT', 'DBIT')),
+            'BOOK', domain, family, sub_family, booking_date=booking_date, value_date=booking_date,
+            account_servicer_reference=f'REF-{i}', end_to_end_id=f'E2E-{i // 3}')
+
+
+def generate_queries(count: int, entries: int, seed: int = 1):
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            queries.append(dict(account_servicer_reference=f'REF-{rng.randrange(entries)}'))
+        elif kind == 1:
+            queries.append(dict(end_to_end_id=f'E2E-{rng.randrange(entries // 3)}', credit_debit_indicator='CRDT'))
+        else:
+            month = rng.randint(1, 12)
+            day = rng.randint(1, 20)
+            query = dict(booking_date=(f'2023-{month:02}-{day:02}', f'2023-{month:02}-{day + 7:02}'),
+                         ccy=rng.choice(CURRENCIES))
+            if kind == 3:
+                query['domain'], query['family'], _ = rng.choice(CODES)
+            queries.append(query)
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=200_000)
+    parser.add_argument('--queries', type=int, default=1_000)
+    parser.add_argument('--scan-queries', type=int, default=20, help='queries run through the linear scan')
+    args = parser.parse_args()
+
+    entries = list(generate_entries(args.entries))
+    queries = generate_queries(args.queries, args.entries)
+
+    start = time.perf_counter()
+    index = EntryIndex(entries)
+    logger.info(f'index of {args.entries} entries built in {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    matches = sum(len(index.positions(**query)) for query in queries)
+    indexed = args.queries / (time.perf_counter() - start)
+    logger.info(f'index: {indexed:.0f} queries/s ({matches} matches)')
+
+    start = time.perf_counter()
+    for query in queries[:args.scan_queries]:
+        scan(entries, **query)
+    scanned = args.scan_queries / (time.perf_counter() - start)
+    logger.info(f'linear scan: {scanned:.1f} queries/s, index speed-up {indexed / scanned:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
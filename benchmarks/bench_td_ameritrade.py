@@ -0,0 +1,94 @@
+"""
+Benchmark of the chunked TD Ameritrade converter on a generated activity CSV.
+
+    python -m benchmarks.bench_td_ameritrade --rows 1000000
+
+Reports the end-to-end conversion throughput, and the throughput of building entries from chunk-validated columns
+compared with validating the same rows one by one through the pydantic entry model.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+from loguru import logger
+
+from CAMT_053_001_09.td_ameritrade import bank_transaction_codes, chunk_entries, convert_td_ameritrade, \
+    iter_chunks
+from tests.factories import make_entry
+
+DESCRIPTIONS = ['Bought 10 AAPL @ 125.07', 'Sold 5 MSFT @ 250.10', 'ORDINARY DIVIDEND (AAPL)',
+                'W-8 WITHHOLDING (AAPL)', 'FREE BALANCE INTEREST ADJUSTMENT', 'CLIENT REQUESTED ELECTRONIC FUNDING']
+
+
+def generate_csv(path: str, rows: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as f:
+        f.write('DATE,TRANSACTION ID,DESCRIPTION,QUANTITY,SYMBOL,PRICE,COMMISSION,AMOUNT,REG FEE\n')
+        for i in range(rows):
+            f.write(f'{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(2015, 2023)},{10_000_000 + i},'
+                    f'{rng.choice(DESCRIPTIONS)},,,,,{rng.randint(-10_000_00, 10_000_00) / 100:.2f},\n')
+        f.write('***END OF FILE***\n')
+
+
+def chunked_entries(path: str, chunk_size: int) -> float:
+    start = time.perf_counter()
+    rows = 0
+    with open(path, newline='') as f:
+        for read, chunk in iter_chunks(f, chunk_size):
+            rows += read
+            for _ in chunk_entries(chunk):
+                pass
+    return rows / (time.perf_counter() - start)
+
+
+def pydantic_entries(path: str, rows: int) -> float:
+    """
+    Rows per second of validating up to `rows` rows one by one, fewer if the file ends before.
+    """
+    start = time.perf_counter()
+    processed = 0
+    with open(path) as f:
+        next(f)
+        for line in f:
+            if processed == rows or line.startswith('***END OF FILE***'):
+                break
+            processed += 1
+            date, transaction_id, description, *_, amount, _ = line.rstrip('\n').split(',')
+            month, day, year = date.split('/')
+            amount = Decimal(amount)
+            domain, family, sub_family = bank_transaction_codes(description, amount >= 0)
+            make_entry(abs(amount), 'CRDT' if amount >= 0 else 'DBIT', ccy='USD',
+                       booking_date=f'{year}-{month}-{day}', account_servicer_reference=transaction_id,
+                       domain=domain, family=family, sub_family=sub_family)
+    return processed / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunk-size', type=int, default=10_000)
+    parser.add_argument('--baseline-rows', type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'activity.csv')
+        generate_csv(source, args.rows)
+        size = os.path.getsize(source)
+
+        start = time.perf_counter()
+        convert_td_ameritrade(source, os.path.join(directory, 'camt053.xml'), account='123456789',
+                              chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - start
+
+        logger.info(f'chunked converter: {args.rows} rows ({size / 2 ** 20:.1f} MB) in {elapsed:.2f}s, '
+                    f'{args.rows / elapsed:.0f} rows/s')
+        logger.info(f'entries from chunk-validated columns: {chunked_entries(source, args.chunk_size):.0f} rows/s')
+        baseline = pydantic_entries(source, min(args.baseline_rows, args.rows))
+        logger.info(f'entries validated row by row: {baseline:.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
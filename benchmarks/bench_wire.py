@@ -0,0 +1,52 @@
+"""
+Size and speed of the wire format against pickle, for shipping entries to worker processes.
+
+    python -m benchmarks.bench_wire --entries 100000 --slice-size 10000
+
+Ships the same entries, slice by slice, as pickled models, as pickled columns (`cache.entries_to_columns`) and in the
+wire format (`wire.encode_columns`), and reports the bytes per entry and the time to encode and decode them.
+"""
+import argparse
+import pickle
+import time
+
+from loguru import logger
+
+from CAMT_053_001_09.cache import columns_to_entries, entries_to_columns
+from CAMT_053_001_09.wire import decode_columns, encode_columns
+from benchmarks.bench_parallel import generate_entries
+
+FORMATS = {
+    'pickled models': (lambda entries: pickle.dumps(entries, pickle.HIGHEST_PROTOCOL), pickle.loads),
+    'pickled columns': (lambda entries: pickle.dumps(entries_to_columns(entries), pickle.HIGHEST_PROTOCOL),
+                        pickle.loads),
+    'wire': (lambda entries: encode_columns(entries_to_columns(entries)), decode_columns),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--slice-size', type=int, default=10_000)
+    args = parser.parse_args()
+
+    entries = list(generate_entries(args.entries))
+    slices = [entries[i:i + args.slice_size] for i in range(0, len(entries), args.slice_size)]
+    expected = entries_to_columns(slices[0])
+    for name, (encode, decode) in FORMATS.items():
+        start = time.perf_counter()
+        encoded = [encode(entries_slice) for entries_slice in slices]
+        encoding = time.perf_counter() - start
+        start = time.perf_counter()
+        decoded = [decode(data) for data in encoded]
+        decoding = time.perf_counter() - start
+        first = decoded[0] if isinstance(decoded[0], dict) else entries_to_columns(decoded[0])
+        if first != expected or list(columns_to_entries(first)) != slices[0]:
+            raise AssertionError(f'{name} does not round trip')
+        size = sum(map(len, encoded))
+        logger.info(f'{name}: {size / args.entries:.1f} bytes/entry, encode {encoding / args.entries * 1e6:.2f} µs, '
+                    f'decode {decoding / args.entries * 1e6:.2f} µs per entry')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import re
+from pathlib import Path
+
+from setuptools import find_packages, setup
+
+HERE = Path(__file__).parent
+# Read from the package, not imported, as its dependencies may not be installed yet. The entry cache keys on it.
+VERSION = re.search(r"^__version__ = '([^']+)'$",
+                    (HERE / 'CAMT_053_001_09' / '__init__.py').read_text(encoding='utf-8'), re.MULTILINE)[1]
+
+setup(
+    name='CAMT_053_001_09',
+    version=VERSION,
+    description='Generate and parse ISO 20022 CAMT.053.001.09 compliant XML files',
+    long_description=(HERE / 'README.md').read_text(encoding='utf-8'),
+    long_description_content_type='text/markdown',
+    url='https://github.com/Elektra58/CAMT_053_001_09',
+    license='MIT',
+    packages=find_packages(include=['CAMT_053_001_09', 'CAMT_053_001_09.*']),
+    py_modules=['config'],
+    package_data={'CAMT_053_001_09': ['json/*.json']},
+    python_requires='>=3.10',
+    install_requires=[
+        'loguru~=0.6.0',
+        'lxml~=4.9.2',
+        'pydantic~=1.10.7',
+        'pendulum~=2.1.2',
+        'python-dateutil~=2.8.2',
+        'dynaconf~=3.1',
+    ],
+    extras_require={
+        'zstd': ['zstandard>=0.18'],
+        'arrow': ['pyarrow>=12'],
+        'pandas': ['pandas>=1.5'],
+        'fx': ['numpy>=1.22'],
+    },
+    entry_points={
+        'console_scripts': [
+            'camt053-convert=CAMT_053_001_09.cli:main',
+            'camt053-serve=CAMT_053_001_09.service:main',
+        ],
+    },
+)
@@ -0,0 +1,111 @@
+import io
+import random
+
+from lxml.etree import Element, SubElement, tostring
+
+from CAMT_053_001_09.message_components import CAMT_053_NAMESPACE, BankTransactionCodeStructure4, \
+    BankTransactionCodeStructure5, BankTransactionCodeStructure6, CashBalance8, ReportEntry12
+from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyAndAmount, CreditDebitCode, \
+    ExternalBalanceType1Code, ExternalBankTransactionDomain1Code, ExternalBankTransactionFamily1Code, \
+    ExternalBankTransactionSubFamily1Code, ExternalEntryStatus1Code, ISODate, Max35Text, Max500Text
+
+
+def make_entry(amount, cdt_dbt, ccy='CHF', booking_date='2023-04-06', account_servicer_reference=None,
+               domain='PMNT', family='RCDT', sub_family='ESCT'):
+    return ReportEntry12(
+        amount=ActiveOrHistoricCurrencyAndAmount(amount=amount, ccy=ccy),
+        credit_debit_indicator=CreditDebitCode(code=cdt_dbt),
+        status=ExternalEntryStatus1Code(code='BOOK'),
+        booking_date=ISODate(value=booking_date),
+        account_servicer_reference=(
+            Max35Text(value=account_servicer_reference) if account_servicer_reference is not None else None
+        ),
+        bank_transaction_code=BankTransactionCodeStructure4(domain=BankTransactionCodeStructure5(
+            code=ExternalBankTransactionDomain1Code(code=domain),
+            family=BankTransactionCodeStructure6(
+                code=ExternalBankTransactionFamily1Code(code=family),
+                sub_family_code=ExternalBankTransactionSubFamily1Code(code=sub_family),
+            ),
+        )),
+    )
+
+
+def make_balance(balance_type, amount, cdt_dbt, ccy='CHF', date='2023-04-06'):
+    return CashBalance8(
+        type=ExternalBalanceType1Code(code=balance_type),
+        amount=ActiveOrHistoricCurrencyAndAmount(amount=amount, ccy=ccy),
+        credit_debit_indicator=CreditDebitCode(code=cdt_dbt),
+        date=ISODate(value=date),
+    )
+
+
+def make_entries():
+    entries = [make_entry('12.30', 'CRDT', account_servicer_reference='REF-1'),
+               make_entry('1000000', 'DBIT', ccy='JPY', booking_date='2023-04-07', domain='ACMT', family='MDOP',
+                          sub_family='FEES'),
+               make_entry('0.125', 'DBIT', ccy='KWD')]
+    entries[1].end_to_end_id = Max35Text(value='E2E-1')
+    entries[2].additional_entry_information = Max500Text(value='Zinsen Überweisung')
+    return entries
+
+
+def make_document(entries, namespace=CAMT_053_NAMESPACE):
+    document = Element('Document', nsmap={None: namespace} if namespace else None)
+    statement = SubElement(SubElement(document, 'BkToCstmrStmt'), 'Stmt')
+    for entry in entries:
+        statement.append(entry.to_xml())
+    return tostring(document, xml_declaration=True, encoding='utf-8')
+
+
+def make_random_entries(count, seed=0):
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        entry = make_entry(f'{rng.randint(0, 10 ** rng.randint(1, 12)) / 100:.2f}', rng.choice(('CRDT', 'DBIT')),
+                           booking_date=f'2023-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}',
+                           account_servicer_reference=f'REF-{i}' if i % 7 else None)
+        if i % 3 == 0:
+            entry = ReportEntry12(**{**entry.dict(), 'end_to_end_id': {'value': f'E2E <{i}> & co'},
+                                     'additional_entry_information': {'value': f'Zahlung {i} ä'}})
+        entries.append(entry)
+    return entries
+
+
+def flexquery_xml(statements: int = 2, transactions: int = 300) -> bytes:
+    """
+    A FlexQuery file of USD and EUR dividends, the transaction ids of every statement repeat after 250 transactions.
+    """
+    lines = ['<FlexQueryResponse queryName="Activity" type="AF">', f'<FlexStatements count="{statements}">']
+    for statement in range(statements):
+        lines.append(f'<FlexStatement accountId="U{statement:07}" fromDate="20230101" toDate="20230131" '
+                     f'whenGenerated="20230201;083000">')
+        lines.append(f'<CashReport><CashReportCurrency currency="USD" fromDate="20230101" '
+                     f'startingCash="{1000 + statement}" /></CashReport>')
+        lines.append('<CashTransactions>')
+        for i in range(transactions):
+            n = i % 250
+            lines.append(f'<CashTransaction currency="{"EUR" if n % 3 == 0 else "USD"}" type="Dividends" '
+                         f'settleDate="202301{n % 28 + 1:02}" amount="{n * 7919 % 100000 / 100 - 300:.2f}" '
+                         f'transactionID="{statement}-{n}" description="DIVIDEND {n}" levelOfDetail="DETAIL" />')
+        lines.append('</CashTransactions></FlexStatement>')
+    lines.append('</FlexStatements></FlexQueryResponse>')
+    return '\n'.join(lines).encode('utf-8')
+
+
+class FailingReader(io.RawIOBase):
+    """
+    A source failing once `fail_at` bytes have been read, like a dropped connection.
+    """
+
+    def __init__(self, data: bytes, fail_at: int):
+        super().__init__()
+        self._data = io.BytesIO(data)
+        self._fail_at = fail_at
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._data.tell() >= self._fail_at:
+            raise OSError('Connection reset by peer')
+        return self._data.readinto(buffer)
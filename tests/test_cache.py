@@ -0,0 +1,70 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from CAMT_053_001_09 import cache as cache_module
+from CAMT_053_001_09.cache import ColumnFile, EntryCache, columns_to_entries, entries_to_columns, pyarrow
+from tests.factories import make_document, make_entries
+
+
+class TestEntryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.entries = make_entries()
+        self.source = self.directory / 'statement.xml'
+        self.source.write_bytes(make_document(self.entries))
+
+    def test_columns_round_trip(self):
+        columns = entries_to_columns(self.entries)
+        self.assertEqual(columns['amount'], [1230, 1000000, 125])
+        self.assertEqual(list(columns_to_entries(columns)), self.entries)
+
+    def test_column_file(self):
+        path = self.directory / 'entries.cols'
+        cache_module._write_columns(path, entries_to_columns(self.entries))
+        with ColumnFile(path) as columns:
+            self.assertEqual(len(columns), 3)
+            self.assertEqual(list(columns.columns['ccy']), ['CHF', 'JPY', 'KWD'])
+            self.assertEqual(columns.columns['account_servicer_reference'][:], ['REF-1', None, None])
+            self.assertEqual(columns.columns['additional_entry_information'][-1], 'Zinsen Überweisung')
+            self.assertEqual(list(columns_to_entries(columns.columns)), self.entries)
+
+    def _check_cache(self, backend):
+        entry_cache = EntryCache(self.directory / 'cache', backend)
+        self.assertEqual(entry_cache.entries(self.source), self.entries)
+        with mock.patch.object(cache_module, 'iter_entries', side_effect=AssertionError('parsed again')):
+            self.assertEqual(entry_cache.entries(self.source), self.entries)
+        self.assertEqual((entry_cache.hits, entry_cache.misses), (1, 1))
+
+        # A changed file is a different key
+        self.source.write_bytes(make_document(self.entries[:1]))
+        self.assertEqual(entry_cache.entries(self.source), self.entries[:1])
+        self.assertEqual(entry_cache.misses, 2)
+        self.assertEqual(len(list((self.directory / 'cache').iterdir())), 2)
+
+    def test_columns_backend(self):
+        self._check_cache('columns')
+
+    @unittest.skipUnless(pyarrow, 'pyarrow is not installed')
+    def test_arrow_backend(self):
+        self._check_cache('arrow')
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            EntryCache(self.directory, 'parquet')
+
+    def test_empty_file(self):
+        entry_cache = EntryCache(self.directory / 'cache', 'columns')
+        empty = self.directory / 'empty.xml'
+        empty.write_bytes(make_document([]))
+        self.assertEqual(entry_cache.entries(empty), [])
+        self.assertEqual(entry_cache.entries(empty), [])
+        self.assertEqual(entry_cache.hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import io
+import json
+import re
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from CAMT_053_001_09.checkpoint import CheckpointStore
+from CAMT_053_001_09.dedup import EntryDeduplicator
+from CAMT_053_001_09.flexquery import convert_flexquery
+from CAMT_053_001_09.writer import StatementWriter
+from tests.factories import FailingReader, flexquery_xml, make_balance, make_entry
+
+
+def without_creation_date_time(xml: bytes) -> bytes:
+    # The creation date and time of the group header is the time of the first run
+    return re.sub(rb'<GrpHdr>(.*?)<CreDtTm>[^<]*</CreDtTm>', rb'<GrpHdr>\1<CreDtTm/>', xml, count=1)
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.data = flexquery_xml()
+        self.source = self.directory / 'flexquery.xml'
+        self.source.write_bytes(self.data)
+
+    def convert(self, source, target, name, **kwargs):
+        with EntryDeduplicator(self.directory / f'{name}.sqlite') as deduplicator:
+            return convert_flexquery(source, target, deduplicator=deduplicator, **kwargs)
+
+    def test_resume(self):
+        expected = self.directory / 'expected.xml'
+        self.assertEqual(self.convert(self.source, expected, 'expected'), 500)
+
+        for fail_at in (len(self.data) // 3, len(self.data) * 9 // 10):
+            with self.subTest(fail_at=fail_at):
+                target = self.directory / f'resumed-{fail_at}.xml'
+                checkpoints = CheckpointStore(self.directory / f'checkpoint-{fail_at}', interval=40)
+                with self.assertRaises(OSError):
+                    self.convert(FailingReader(self.data, fail_at), target, f'resumed-{fail_at}',
+                                 checkpoints=checkpoints)
+                self.assertGreater(checkpoints.count, 0)
+                checkpoint = json.loads(checkpoints.path.read_text())
+                self.assertGreater(checkpoint['input_offset'], 0)
+                self.assertGreaterEqual(target.stat().st_size, checkpoint['writer']['output_position'])
+
+                checkpoints = CheckpointStore(self.directory / f'checkpoint-{fail_at}', interval=40)
+                self.assertEqual(self.convert(self.source, target, f'resumed-{fail_at}', checkpoints=checkpoints), 500)
+                self.assertEqual(without_creation_date_time(target.read_bytes()),
+                                 without_creation_date_time(expected.read_bytes()))
+                self.assertEqual(list(checkpoints.directory.iterdir()), [])
+
+    def test_source_changed(self):
+        checkpoints = CheckpointStore(self.directory / 'checkpoint', interval=40)
+        with self.assertRaises(OSError):
+            self.convert(FailingReader(self.data, len(self.data) // 2), self.directory / 'out.xml', 'out',
+                         checkpoints=checkpoints)
+        changed = self.directory / 'changed.xml'
+        changed.write_bytes(self.data.replace(b'DIVIDEND', b'DIV'))
+        with self.assertRaises(ValueError):
+            self.convert(changed, self.directory / 'out.xml', 'out', checkpoints=checkpoints)
+
+    def test_writer_resume(self):
+        target = self.directory / 'statement.xml'
+        checkpoints = CheckpointStore(self.directory / 'checkpoint')
+        with self.assertRaises(ZeroDivisionError):
+            with StatementWriter(target, 'MSG-1', checkpoints=checkpoints) as writer:
+                statement = writer.statement('STMT-1', 'ACCOUNT', 'CHF', make_balance('OPBD', '10', 'CRDT'))
+                statement.write_entry(make_entry('1', 'CRDT'))
+                state = writer.checkpoint_state(durable=False)
+                statement.write_entry(make_entry('2', 'DBIT'))
+                1 / 0
+
+        with StatementWriter(target, 'MSG-1', checkpoints=checkpoints, resume=state) as writer:
+            statement, = writer.open_sessions
+            statement.write_entry(make_entry('5', 'CRDT'))
+        xml = target.read_bytes()
+        self.assertEqual(xml.count(b'<Ntry>'), 2)
+        self.assertIn(b'<Amt ccy="CHF">16.00</Amt>', xml)
+
+        with self.assertRaises(ValueError):
+            StatementWriter(self.directory / 'statement.xml.gz', 'MSG-1', checkpoints=checkpoints)
+        with self.assertRaises(ValueError):
+            StatementWriter(io.BytesIO(), 'MSG-1', checkpoints=checkpoints)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import contextlib
+import io
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from CAMT_053_001_09.cli import collect_sources, detect_format, main, target_paths
+from CAMT_053_001_09.reader import iter_entries
+
+DATA = Path(__file__).parent / 'data'
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        for name in ('flexquery.xml', 'td_ameritrade.csv'):
+            shutil.copy(DATA / name, self.directory / name)
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format(Path('a.XML')), 'flexquery')
+        self.assertEqual(detect_format(Path('a.csv')), 'td_ameritrade')
+        with self.assertRaises(ValueError):
+            detect_format(Path('a.txt'))
+
+    def test_collect_sources(self):
+        (self.directory / 'notes.txt').write_text('')
+        self.assertEqual([path.name for path in collect_sources([str(self.directory)])],
+                         ['flexquery.xml', 'td_ameritrade.csv'])
+        self.assertEqual([path.name for path in collect_sources([str(self.directory / '*.csv')])],
+                         ['td_ameritrade.csv'])
+
+    def test_main(self):
+        (self.directory / 'broken.xml').write_text('<FlexQueryResponse><FlexStatements>')
+        output_dir = self.directory / 'out'
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            exit_code = main([str(self.directory), '-o', str(output_dir), '-w', '2', '-q'])
+
+        self.assertEqual(exit_code, 1)
+        self.assertIn('2 files converted, 1 failed, 10 entries', stdout.getvalue())
+        self.assertIn('files/s', stdout.getvalue())
+        self.assertEqual(sorted(path.name for path in output_dir.iterdir()),
+                         ['flexquery.camt053.xml', 'td_ameritrade.camt053.xml'])
+        self.assertEqual(len(list(iter_entries(output_dir / 'flexquery.camt053.xml'))), 5)
+
+    def test_target_paths(self):
+        sources = [Path('exports/2023-01/flexquery.xml'), Path('exports/2023-02/flexquery.xml.gz')]
+        self.assertEqual(list(target_paths(sources, Path('out')).values()),
+                         [Path('out/2023-01/flexquery.camt053.xml'), Path('out/2023-02/flexquery.camt053.xml')])
+        with self.assertRaisesRegex(ValueError, 'both be converted'):
+            target_paths([Path('a.xml'), Path('a.csv')], Path('out'))
+
+    def test_same_names_in_several_directories(self):
+        for month in ('2023-01', '2023-02'):
+            (self.directory / month).mkdir()
+            shutil.copy(DATA / 'flexquery.xml', self.directory / month / 'flexquery.xml')
+        output_dir = self.directory / 'out'
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            exit_code = main([str(self.directory / '*' / '*.xml'), '-o', str(output_dir), '-w', '2', '-q'])
+        self.assertEqual(exit_code, 0)
+        for month in ('2023-01', '2023-02'):
+            self.assertEqual(len(list(iter_entries(output_dir / month / 'flexquery.camt053.xml'))), 5)
+
+        # Nothing is converted if two sources share a target
+        shutil.copy(DATA / 'td_ameritrade.csv', self.directory / 'flexquery.csv')
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit):
+            main([str(self.directory), '-o', str(self.directory / 'other'), '-q'])
+        self.assertIn('would both be converted', stderr.getvalue())
+        self.assertFalse((self.directory / 'other').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import json
+import tempfile
+import threading
+import unittest
+from datetime import date
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from CAMT_053_001_09.code_sets import PACKAGE_DIRECTORY, CodeSetRegistry, CodeSetRelease, code_sets_as_of, registry
+from CAMT_053_001_09.lite import LiteEntryStatus
+from CAMT_053_001_09.message_datatypes import ExternalBankTransactionDomain1Code, ExternalEntryStatus1Code
+
+RELEASE = PACKAGE_DIRECTORY / '4Q2022_ExternalCodeSets_v1.json'
+
+
+def write_release(directory: Path, name: str, statuses) -> Path:
+    data = json.loads(RELEASE.read_text(encoding='utf-8'))
+    data['definitions']['ExternalEntryStatus1Code']['enum'] = statuses
+    path = directory / name
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return path
+
+
+class TestCodeSetRegistry(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def test_release(self):
+        release = CodeSetRelease.from_json(RELEASE)
+        self.assertEqual((release.version, release.revision, release.effective), ('4Q2022', 1, date(2022, 10, 1)))
+        status = release.code_sets['ExternalEntryStatus1Code']
+        self.assertTrue(status.is_valid('BOOK'))
+        self.assertFalse(status.is_valid('XXXX'))
+        domain = release.code_sets['ExternalBankTransactionDomain1Code']
+        self.assertTrue(domain.is_valid('PMNT'))
+        self.assertFalse(domain.is_valid('PAYMENT'))
+        with self.assertRaises(ValueError):
+            CodeSetRelease.from_json(write_release(self.directory, 'codes.json', ['BOOK']))
+        self.assertEqual(CodeSetRelease.from_json(self.directory / 'codes.json', date(2023, 1, 1)).version, 'codes')
+
+    def test_versions_by_date(self):
+        codes = CodeSetRegistry((self.directory,))
+        write_release(self.directory, '4Q2022_ExternalCodeSets_v1.json', ['BOOK', 'PDNG'])
+        write_release(self.directory, '2Q2023_ExternalCodeSets_v1.json', ['BOOK', 'PDNG', 'NEWS'])
+        self.assertEqual([release.version for release in codes.refresh()], ['2Q2023', '4Q2022'])
+        self.assertEqual(codes.refresh(), [])
+        self.assertEqual([release.version for release in codes.releases], ['4Q2022', '2Q2023'])
+
+        self.assertFalse(codes.code_set('ExternalEntryStatus1Code', date(2023, 3, 31)).is_valid('NEWS'))
+        self.assertTrue(codes.code_set('ExternalEntryStatus1Code', date(2023, 4, 1)).is_valid('NEWS'))
+        self.assertTrue(codes.code_set('ExternalEntryStatus1Code').is_valid('NEWS'))
+        # Before the first release the first one applies
+        self.assertFalse(codes.code_set('ExternalEntryStatus1Code', date(2000, 1, 1)).is_valid('NEWS'))
+        with code_sets_as_of('2023-01-15'):
+            self.assertFalse(codes.code_set('ExternalEntryStatus1Code').is_valid('NEWS'))
+        with self.assertRaises(ValueError):
+            codes.code_set('Unknown1Code')
+
+        # A later revision of a release replaces it, an earlier one does not
+        write_release(self.directory, '2Q2023_ExternalCodeSets_v2.json', ['BOOK'])
+        self.assertEqual([(release.version, release.revision) for release in codes.refresh()], [('2Q2023', 2)])
+        # The replaced v1 file is not read again
+        self.assertEqual(codes.refresh(), [])
+        self.assertEqual([(release.version, release.revision) for release in codes.releases],
+                         [('4Q2022', 1), ('2Q2023', 2)])
+        self.assertFalse(codes.code_set('ExternalEntryStatus1Code').is_valid('PDNG'))
+
+        # Both revisions of a release in the directory from the start
+        fresh = CodeSetRegistry((self.directory,))
+        self.assertEqual([(release.version, release.revision) for release in fresh.refresh()],
+                         [('2Q2023', 2), ('4Q2022', 1)])
+        self.assertEqual(fresh.refresh(), [])
+
+    def test_malformed_release(self):
+        codes = CodeSetRegistry((self.directory,))
+        path = write_release(self.directory, '1Q2023_ExternalCodeSets_v1.json', ['BOOK'])
+        content = path.read_bytes()
+        path.write_bytes(content[:len(content) // 2])
+        self.assertEqual(codes.refresh(), [])
+        self.assertEqual(codes.releases, ())
+
+        # Read again once complete
+        path.write_bytes(content)
+        self.assertEqual([release.version for release in codes.refresh()], ['1Q2023'])
+
+    def test_lookups_during_reload(self):
+        codes = CodeSetRegistry()
+        codes.load(RELEASE)
+        errors = []
+        stop = threading.Event()
+
+        def lookup():
+            while not stop.is_set():
+                if not codes.code_set('ExternalEntryStatus1Code').is_valid('BOOK'):
+                    errors.append('BOOK')
+
+        threads = [threading.Thread(target=lookup) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for quarter in range(1, 5):
+            codes.load(write_release(self.directory, f'{quarter}Q2023_ExternalCodeSets_v1.json', ['BOOK']))
+        stop.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(codes.releases), 5)
+
+
+class TestModelValidation(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        registry.load(write_release(Path(directory.name), '2Q2023_ExternalCodeSets_v1.json', ['BOOK', 'NEWS']))
+        self.addCleanup(registry.remove, '2Q2023')
+
+    def test_hot_reload(self):
+        self.assertEqual(ExternalEntryStatus1Code(code='news').code, 'NEWS')
+        self.assertEqual(ExternalEntryStatus1Code._valid_codes, {'BOOK', 'NEWS'})
+        with self.assertRaises(ValidationError):
+            ExternalEntryStatus1Code(code='PDNG')
+        self.assertEqual(ExternalBankTransactionDomain1Code(code='PMNT').code, 'PMNT')
+        self.assertEqual(LiteEntryStatus('NEWS'), 'NEWS')
+
+        with code_sets_as_of('2022-12-31'):
+            self.assertEqual(ExternalEntryStatus1Code(code='PDNG').code, 'PDNG')
+            with self.assertRaises(ValidationError):
+                ExternalEntryStatus1Code(code='NEWS')
+            with self.assertRaises(ValueError):
+                LiteEntryStatus('NEWS')
+            self.assertEqual(LiteEntryStatus('pdng'), 'PDNG')
+        # A code valid only in the earlier release is not taken for valid in the latest one
+        with self.assertRaises(ValueError):
+            LiteEntryStatus('pdng')
+
+        registry.remove('2Q2023')
+        self.assertEqual(ExternalEntryStatus1Code._valid_codes, {'BOOK', 'FUTR', 'INFO', 'PDNG'})
+        with self.assertRaises(ValueError):
+            LiteEntryStatus('NEWS')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from CAMT_053_001_09.cli import detect_format, target_path
+from CAMT_053_001_09.compression import detect_compression, open_input, open_output, uncompressed_path, zstandard
+from CAMT_053_001_09.flexquery import convert_flexquery
+from CAMT_053_001_09.reader import iter_entries
+from CAMT_053_001_09.td_ameritrade import convert_td_ameritrade
+
+DATA = Path(__file__).parent / 'data'
+
+
+class TestCompression(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        # Incompressible enough to span several chunks of the background thread
+        self.data = os.urandom(300_000) * 4
+
+    def test_detect_compression(self):
+        self.assertEqual(detect_compression(gzip.compress(b'<x/>')), 'gzip')
+        self.assertEqual(detect_compression(b'\x28\xb5\x2f\xfd\x00'), 'zstd')
+        self.assertIsNone(detect_compression(b'<?xml'))
+        self.assertEqual(uncompressed_path('a/statement.xml.GZ'), Path('a/statement.xml'))
+        self.assertEqual(uncompressed_path('statement.xml'), Path('statement.xml'))
+
+    def test_gzip_round_trip(self):
+        path = self.directory / 'data.bin.gz'
+        with open_output(path) as f:
+            for offset in range(0, len(self.data), 1000):
+                f.write(self.data[offset:offset + 1000])
+        self.assertEqual(gzip.decompress(path.read_bytes()), self.data)
+        with open_input(path) as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_uncompressed_stream(self):
+        stream = io.BytesIO(b'<Document/>')
+        with open_input(stream) as f:
+            self.assertEqual(f.read(), b'<Document/>')
+        self.assertFalse(stream.closed)
+
+        stream = io.BytesIO()
+        with open_output(stream, 'gzip') as f:
+            f.write(b'<Document/>')
+        self.assertFalse(stream.closed)
+        self.assertEqual(gzip.decompress(stream.getvalue()), b'<Document/>')
+
+    def test_corrupt_input(self):
+        path = self.directory / 'corrupt.gz'
+        path.write_bytes(gzip.compress(self.data)[:100_000])
+        with self.assertRaises(EOFError), open_input(path) as f:
+            f.read()
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError), open_output(io.BytesIO(), 'bzip2'):
+            pass
+
+    @unittest.skipUnless(zstandard, 'zstandard is not installed')
+    def test_zstd_round_trip(self):
+        path = self.directory / 'data.bin.zst'
+        with open_output(path) as f:
+            f.write(self.data)
+        self.assertEqual(detect_compression(path.read_bytes()), 'zstd')
+        with open_input(path) as f:
+            self.assertEqual(f.read(), self.data)
+
+
+class TestCompressedConversion(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_flexquery(self):
+        source = self.directory / 'flexquery.xml.gz'
+        source.write_bytes(gzip.compress((DATA / 'flexquery.xml').read_bytes()))
+        self.assertEqual(detect_format(source), 'flexquery')
+        target = target_path(source, self.directory, 'gzip')
+        self.assertEqual(target.name, 'flexquery.camt053.xml.gz')
+
+        self.assertEqual(convert_flexquery(source, target), 5)
+        self.assertTrue(gzip.decompress(target.read_bytes()).startswith(b"<?xml version='1.0' encoding='utf-8'?>"))
+        plain = self.directory / 'plain.xml'
+        convert_flexquery(DATA / 'flexquery.xml', plain)
+        self.assertEqual([entry.dict() for entry in iter_entries(target)],
+                         [entry.dict() for entry in iter_entries(plain)])
+
+    def test_td_ameritrade(self):
+        source = self.directory / 'td_ameritrade.csv.gz'
+        source.write_bytes(gzip.compress((DATA / 'td_ameritrade.csv').read_bytes()))
+        target = self.directory / 'td_ameritrade.camt053.xml.gz'
+        self.assertEqual(convert_td_ameritrade(source, target, account='123456789'), 5)
+        self.assertEqual(len(list(iter_entries(target))), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
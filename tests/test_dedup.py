@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+
+from CAMT_053_001_09.dedup import BloomFilter, EntryDeduplicator, entry_fingerprint
+from tests.factories import make_entry
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_sizing(self):
+        bloom = BloomFilter.for_capacity(1_000_000, 0.01)
+        self.assertLess(len(bloom.bits), 1_300_000)
+        self.assertEqual(bloom.hash_count, 7)
+
+    def test_membership(self):
+        bloom = BloomFilter.for_capacity(1000, 0.01)
+        added = [os.urandom(16) for _ in range(1000)]
+        for fingerprint in added:
+            bloom.add(fingerprint)
+
+        self.assertTrue(all(fingerprint in bloom for fingerprint in added))
+        false_positives = sum(os.urandom(16) in bloom for _ in range(10_000))
+        self.assertLess(false_positives, 300)
+
+
+class TestEntryDeduplicator(unittest.TestCase):
+
+    def test_fingerprint(self):
+        self.assertEqual(entry_fingerprint(make_entry('10', 'CRDT', account_servicer_reference='A')),
+                         entry_fingerprint(make_entry('10.00', 'CRDT', account_servicer_reference='A')))
+        self.assertNotEqual(entry_fingerprint(make_entry('10', 'CRDT', account_servicer_reference='A')),
+                            entry_fingerprint(make_entry('10', 'DBIT', account_servicer_reference='A')))
+        self.assertIsNone(entry_fingerprint(make_entry('10', 'CRDT')))
+
+    def test_entries_without_reference(self):
+        # Two identical card payments on the same day
+        payments = [make_entry('4.50', 'DBIT', sub_family='POSD'), make_entry('4.50', 'DBIT', sub_family='POSD')]
+        with EntryDeduplicator() as dedup:
+            self.assertEqual(list(dedup.filter(payments)), payments)
+            self.assertFalse(dedup.seen(payments[0]))
+            self.assertEqual(dedup.duplicates, 0)
+
+    def test_filter(self):
+        intraday = [make_entry('10', 'CRDT', account_servicer_reference='A'),
+                    make_entry('20', 'DBIT', account_servicer_reference='B')]
+        end_of_day = intraday + [make_entry('30', 'CRDT', account_servicer_reference='C')]
+
+        with EntryDeduplicator() as dedup:
+            self.assertEqual(list(dedup.filter(intraday)), intraday)
+            self.assertEqual(list(dedup.filter(end_of_day)), end_of_day[2:])
+            self.assertEqual(dedup.duplicates, 2)
+
+    def test_persistence(self):
+        entry = make_entry('10', 'CRDT', account_servicer_reference='A')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dedup.sqlite')
+            with EntryDeduplicator(path, batch_size=1) as dedup:
+                self.assertTrue(dedup.add(entry))
+
+            with EntryDeduplicator(path) as dedup:
+                self.assertTrue(dedup.seen(entry))
+                self.assertFalse(dedup.add(entry))
+
+    def test_rebuild_stale_filter(self):
+        entry = make_entry('10', 'CRDT', account_servicer_reference='A')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dedup.sqlite')
+            dedup = EntryDeduplicator(path)
+            dedup.add(entry)
+            dedup.flush()  # stored, but the filter itself is never saved
+            dedup._connection.close()
+
+            with EntryDeduplicator(path) as dedup:
+                self.assertTrue(dedup.seen(entry))
+
+    def test_discard_keeps_filter(self):
+        first, second = (make_entry('10', 'CRDT', account_servicer_reference=reference) for reference in 'AB')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dedup.sqlite')
+            with EntryDeduplicator(path, batch_size=None) as dedup:
+                dedup.add(first)
+                dedup.save()
+                dedup.add(second)
+                dedup.discard()
+                bits = bytes(dedup.bloom.bits)
+
+            # Loaded as saved, a rebuilt filter would not have the bits of the discarded fingerprint
+            with EntryDeduplicator(path) as dedup:
+                self.assertEqual(dedup.bloom.count, 1)
+                self.assertEqual(bytes(dedup.bloom.bits), bits)
+
+    def test_pending_restore(self):
+        first, second = (make_entry('10', 'CRDT', account_servicer_reference=reference) for reference in 'AB')
+        with EntryDeduplicator(batch_size=None) as dedup:
+            dedup.add(first)
+            pending = dedup.pending()
+            self.assertEqual(pending, entry_fingerprint(first))
+            dedup.add(second)
+            dedup.discard()
+            self.assertFalse(dedup.seen(second))
+            self.assertFalse(dedup.seen(first))
+
+            dedup.restore(pending)
+            dedup.restore(pending)
+            self.assertTrue(dedup.seen(first))
+            self.assertEqual(dedup._connection.execute('SELECT COUNT(*) FROM fingerprint').fetchone()[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import gzip
+import hashlib
+import io
+import re
+import unittest
+from xml.etree.ElementTree import canonicalize
+
+from lxml.etree import fromstring, tostring
+
+from CAMT_053_001_09.digest import CanonicalDigest, digest_file
+from CAMT_053_001_09.reader import iter_entries
+from CAMT_053_001_09.writer import StatementWriter
+from tests.factories import make_balance, make_entry
+
+
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class TestCanonicalDigest(unittest.TestCase):
+
+    def setUp(self):
+        self.output = io.BytesIO()
+        with StatementWriter(self.output, 'MSG-1', creation_date_time='2023-04-06T10:00:00Z', digest=True) as writer:
+            with writer.statement('STMT-CHF', 'CH9300762011623852957', 'CHF',
+                                  opening_balance=make_balance('OPBD', '10', 'CRDT')) as statement:
+                statement.write_entries([make_entry('5', 'DBIT', account_servicer_reference='A & B'),
+                                         make_entry('1', 'CRDT')])
+            with writer.statement('STMT-EUR', 'ACCOUNT', 'EUR') as statement:
+                statement.write_entry(make_entry('2', 'CRDT', ccy='EUR'))
+        self.digests = writer.digests
+        self.data = self.output.getvalue()
+
+    def test_writer_digests(self):
+        canonical = canonicalize(self.data.decode('utf-8'))
+        self.assertEqual(self.digests.raw, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(self.digests.document, sha256(canonical))
+        self.assertEqual([statement.statement_id for statement in self.digests.statements], ['STMT-CHF', 'STMT-EUR'])
+        self.assertEqual(self.digests.entries, [sha256(entry) for entry in re.findall(r'<Ntry>.*?</Ntry>', canonical)])
+        self.assertEqual([statement.digest for statement in self.digests.statements],
+                         [sha256(statement) for statement in re.findall(r'<Stmt>.*?</Stmt>', canonical)])
+        self.assertEqual(len(set(self.digests.entries)), 3)
+
+    def test_reader_digests(self):
+        digest = CanonicalDigest()
+        self.assertEqual(len(list(iter_entries(io.BytesIO(gzip.compress(self.data)), digest=digest))), 3)
+        self.assertEqual(digest.result(), self.digests)
+        self.assertEqual(digest_file(io.BytesIO(self.data)), self.digests)
+
+    def test_serialization_independent(self):
+        # Another declaration, attribute quoting and character references: same canonical digests
+        data = self.data.replace(b"<?xml version='1.0' encoding='utf-8'?>", b'<?xml version="1.0"?>') \
+            .replace(b'<MsgId>MSG-1</MsgId>', b'<MsgId>MSG&#45;1</MsgId>').replace(b'ccy="CHF"', b"ccy='CHF'")
+        digests = digest_file(io.BytesIO(data))
+        self.assertNotEqual(digests.raw, self.digests.raw)
+        self.assertEqual(digests.document, self.digests.document)
+        self.assertEqual(digests.statements, self.digests.statements)
+
+        # Whitespace is content: indented entries have other entry digests
+        document = fromstring(self.data)
+        for entry in document.iterfind('.//{*}Ntry'):
+            entry[0].tail = '\n'
+        digests = digest_file(io.BytesIO(tostring(document)))
+        self.assertNotEqual(digests.entries[0], self.digests.entries[0])
+        self.assertEqual(len(digests.entries), 3)
+
+    def test_complete(self):
+        digest = CanonicalDigest()
+        digest.feed(self.data)
+        digest.result()
+        with self.assertRaises(ValueError):
+            digest.feed(b'<Document/>')
+
+
+if __name__ == '__main__':
+    unittest.main()
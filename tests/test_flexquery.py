@@ -0,0 +1,70 @@
+import io
+import unittest
+from decimal import Decimal
+from pathlib import Path
+
+from lxml.etree import fromstring
+
+from CAMT_053_001_09.dedup import EntryDeduplicator
+from CAMT_053_001_09.flexquery import convert_flexquery, parse_flex_date, parse_flex_date_time
+from CAMT_053_001_09.reader import iter_entries
+
+FLEXQUERY_XML = Path(__file__).parent / 'data' / 'flexquery.xml'
+
+
+class TestFlexQueryDates(unittest.TestCase):
+
+    def test_parse_flex_date(self):
+        for value in ('20230105', '2023-01-05', '01/05/2023', '20230105;202000'):
+            with self.subTest(value=value):
+                self.assertEqual(parse_flex_date(value), '2023-01-05')
+
+        with self.assertRaises(ValueError):
+            parse_flex_date('2023015')
+
+    def test_parse_flex_date_time(self):
+        self.assertEqual(parse_flex_date_time('20230105;202000'), '2023-01-05T20:20:00')
+        self.assertEqual(parse_flex_date_time('2023-01-05;20:20:00'), '2023-01-05T20:20:00')
+
+
+class TestConvertFlexQuery(unittest.TestCase):
+
+    def convert(self, **kwargs):
+        output = io.BytesIO()
+        written = convert_flexquery(FLEXQUERY_XML, output, **kwargs)
+        return written, output.getvalue()
+
+    def test_entries(self):
+        written, xml = self.convert()
+        entries = list(iter_entries(io.BytesIO(xml)))
+
+        self.assertEqual(written, 5)
+        self.assertEqual([entry.account_servicer_reference.value for entry in entries],
+                         ['1001', '2001', '2002', '2003', '1002'])
+        trade = entries[0]
+        self.assertEqual((trade.amount.amount, trade.amount.ccy), (Decimal('1251.70'), 'USD'))
+        self.assertEqual(trade.credit_debit_indicator.code, 'DBIT')
+        self.assertEqual(trade.booking_date.value, '2023-01-05')
+        self.assertEqual(trade.bank_transaction_code.domain.code.code, 'SECU')
+        dividend = entries[2]
+        self.assertEqual(dividend.bank_transaction_code.domain.family.sub_family_code.code, 'DVCA')
+
+    def test_statements(self):
+        _, xml = self.convert()
+        document = fromstring(xml)
+        statements = document.findall('.//{*}Stmt')
+
+        self.assertEqual([statement.findtext('{*}Acct/{*}Ccy') for statement in statements], ['USD', 'EUR'])
+        balances = statements[0].findall('{*}Bal')
+        self.assertEqual([balance.findtext('{*}Amt') for balance in balances], ['1000.00', '4750.25'])
+        self.assertEqual(statements[0].findtext('{*}TxsSummry/{*}TtlNtries/{*}NbOfNtries'), '4')
+        self.assertEqual(document.findtext('.//{*}GrpHdr/{*}MsgId'), 'Activity')
+
+    def test_deduplicator(self):
+        with EntryDeduplicator() as dedup:
+            self.assertEqual(self.convert(deduplicator=dedup)[0], 5)
+            self.assertEqual(self.convert(deduplicator=dedup)[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
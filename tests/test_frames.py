@@ -0,0 +1,50 @@
+import unittest
+
+from CAMT_053_001_09.frames import categories, pandas, pyarrow, to_arrow, to_dataframe
+from tests.factories import make_entries
+
+
+class TestCategories(unittest.TestCase):
+
+    def test_categories(self):
+        self.assertEqual(categories('credit_debit_indicator', ['DBIT']), ['CRDT', 'DBIT'])
+        # Pattern-only code sets and currencies use the values seen
+        self.assertEqual(categories('domain', ['SECU', None, 'ACMT', 'SECU']), ['ACMT', 'SECU'])
+        self.assertIn('BOOK', categories('status', []))
+
+
+@unittest.skipUnless(pyarrow, 'pyarrow is not installed')
+class TestToArrow(unittest.TestCase):
+
+    def test_to_arrow(self):
+        table = to_arrow(make_entries() * 3, batch_size=4)
+        self.assertEqual(table.num_rows, 9)
+        self.assertEqual(table.column('amount').to_pylist()[:3], [1230, 1000000, 125])
+        self.assertEqual(str(table.schema.field('booking_date').type), 'date32[day]')
+        self.assertEqual(str(table.schema.field('ccy').type), 'dictionary<values=string, indices=int32, ordered=0>')
+        self.assertEqual(table.column('ccy').to_pylist()[:3], ['CHF', 'JPY', 'KWD'])
+        self.assertEqual(table.column('end_to_end_id').to_pylist()[:3], [None, 'E2E-1', None])
+
+    def test_empty(self):
+        self.assertEqual(to_arrow([]).num_rows, 0)
+
+
+@unittest.skipUnless(pandas, 'pandas is not installed')
+class TestToDataFrame(unittest.TestCase):
+
+    def test_to_dataframe(self):
+        entries = make_entries()
+        entries[0].value_date = None
+        frame = to_dataframe(entries)
+        self.assertEqual(len(frame), 3)
+        self.assertEqual(str(frame['amount'].dtype), 'int64')
+        self.assertEqual(list(frame['amount']), [1230, 1000000, 125])
+        self.assertTrue(str(frame['booking_date'].dtype).startswith('datetime64'))
+        self.assertTrue(frame['value_date'].isna().all())
+        self.assertEqual(list(frame['credit_debit_indicator'].cat.categories), ['CRDT', 'DBIT'])
+        self.assertEqual(list(frame['sub_family']), ['ESCT', 'FEES', 'ESCT'])
+        self.assertEqual(frame['additional_entry_information'].iloc[2], 'Zinsen Überweisung')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import random
+import unittest
+from decimal import Decimal
+from fractions import Fraction
+
+from CAMT_053_001_09.cache import entries_to_columns
+from CAMT_053_001_09.fx import RateTable
+from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyAndAmount
+from tests.factories import make_entry
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+RATES = b'''date,from,to,rate
+2023-01-02,EUR,CHF,0.9875
+2023-02-01,EUR,CHF,1.0015
+2023-01-02,USD,CHF,0.925
+2023-01-02,CHF,JPY,142.37
+2023-01-02,KWD,CHF,3.0123
+'''
+
+
+def amount(value, ccy):
+    return ActiveOrHistoricCurrencyAndAmount(amount=value, ccy=ccy)
+
+
+class TestRateTable(unittest.TestCase):
+
+    def setUp(self):
+        self.rates = RateTable.from_csv(io.BytesIO(RATES))
+
+    def test_as_of_rate(self):
+        self.assertEqual(self.rates.rate('EUR', 'CHF', '2023-01-31'), Fraction('0.9875'))
+        self.assertEqual(self.rates.rate('EUR', 'CHF', '2023-02-01'), Fraction('1.0015'))
+        self.assertEqual(self.rates.rate('EUR', 'CHF', '2024-01-01'), Fraction('1.0015'))
+        self.assertEqual(self.rates.rate('CHF', 'EUR', '2023-02-01'), 1 / Fraction('1.0015'))
+        self.assertEqual(self.rates.rate('CHF', 'CHF', '2000-01-01'), 1)
+        with self.assertRaises(ValueError):
+            self.rates.rate('EUR', 'CHF', '2023-01-01')
+        with self.assertRaises(ValueError):
+            self.rates.rate('GBP', 'CHF', '2023-01-02')
+
+    def test_convert(self):
+        self.assertEqual(self.rates.convert(amount('100', 'EUR'), 'CHF', '2023-01-15'), amount('98.75', 'CHF'))
+        # 0.02 * 0.925 = 0.0185, a half rounded up
+        self.assertEqual(self.rates.convert(amount('0.02', 'USD'), 'CHF', '2023-01-15').amount, Decimal('0.02'))
+        self.assertEqual(self.rates.convert(amount('10.55', 'CHF'), 'JPY', '2023-01-15').amount, Decimal('1502'))
+        self.assertEqual(self.rates.convert(amount('1.005', 'KWD'), 'CHF', '2023-01-15').amount, Decimal('3.03'))
+        self.assertEqual(self.rates.convert(amount('100', 'CHF'), 'EUR', '2023-02-01').amount, Decimal('99.85'))
+
+    def test_invalid_tables(self):
+        with self.assertRaises(ValueError):
+            RateTable.from_csv(io.BytesIO(b'date,ccy,rate\n2023-01-02,EUR,1\n'))
+        with self.assertRaises(ValueError):
+            RateTable([('2023-01-02', 'EUR', 'CHF', '0')])
+        with self.assertRaises(ValueError):
+            RateTable([('2023-01-02', 'eur', 'CHF', '1')])
+
+
+@unittest.skipUnless(numpy is not None, 'numpy is not installed')
+class TestConvertColumns(unittest.TestCase):
+
+    def setUp(self):
+        self.rates = RateTable.from_csv(io.BytesIO(RATES))
+
+    def test_matches_scalar(self):
+        rng = random.Random(0)
+        entries = []
+        for _ in range(2000):
+            ccy = rng.choice(('EUR', 'CHF', 'USD', 'KWD'))
+            value = Decimal(rng.randint(1, 10 ** rng.randint(1, 15))).scaleb(-3 if ccy == 'KWD' else -2)
+            entries.append(make_entry(value, 'CRDT', ccy=ccy, booking_date=f'2023-{rng.randint(1, 3):02}-15'))
+        # Exact halves and amounts beyond float64 precision
+        entries += [make_entry('0.02', 'CRDT', ccy='USD'), make_entry('0.06', 'CRDT', ccy='USD'),
+                    make_entry('98765432109876.54', 'DBIT', ccy='EUR')]
+
+        columns = entries_to_columns(entries)
+        for to_ccy in ('CHF', 'JPY'):
+            with self.subTest(to_ccy=to_ccy):
+                if to_ccy == 'JPY':
+                    rows = [i for i, ccy in enumerate(columns['ccy']) if ccy == 'CHF']
+                    columns = {name: [values[i] for i in rows] for name, values in columns.items()}
+                    entries = [entries[i] for i in rows]
+                converted = self.rates.convert_columns(columns['amount'], columns['ccy'], columns['booking_date'],
+                                                       to_ccy)
+                self.assertEqual(converted.dtype, numpy.int64)
+                self.assertEqual([int(minor) for minor in converted],
+                                 [self.rates.convert_minor_units(entry.amount.minor_units, entry.amount.ccy, to_ccy,
+                                                                 entry.booking_date) for entry in entries])
+
+    def test_missing(self):
+        with self.assertRaises(ValueError):
+            self.rates.convert_columns([100], ['EUR'], ['2022-12-31'], 'CHF')
+        with self.assertRaises(ValueError):
+            self.rates.convert_columns([100], ['EUR'], [None], 'CHF')
+        self.assertEqual(list(self.rates.convert_columns([100], ['CHF'], [None], 'CHF')), [100])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+from pathlib import Path
+
+from CAMT_053_001_09.index import StatementIndex, build_index, index_path_for
+from CAMT_053_001_09.message_components import CAMT_053_NAMESPACE
+from CAMT_053_001_09.writer import StatementWriter
+from tests.factories import make_entry
+
+
+class TestStatementIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = self.directory / 'statement.xml'
+        self.chf = [make_entry(f'{i}.05', 'CRDT' if i % 2 else 'DBIT', booking_date=f'2023-04-{i % 28 + 1:02}',
+                               account_servicer_reference=f'REF-{i}') for i in range(1, 251)]
+        self.eur = [make_entry('7.5', 'DBIT', ccy='EUR'), make_entry('1', 'CRDT', ccy='EUR')]
+        with StatementWriter(self.source, message_id='MSG-1') as writer:
+            with writer.statement('STMT-CHF', account='CH9300762011623852957', currency='CHF') as statement:
+                statement.write_entries(self.chf)
+            with writer.statement('STMT-EUR', account='CH9300762011623852957', currency='EUR') as statement:
+                statement.write_entries(self.eur)
+
+    def test_build(self):
+        with StatementIndex.open(self.source) as index:
+            self.assertTrue(index_path_for(self.source).exists())
+            self.assertEqual(len(index), 252)
+            self.assertEqual([(s.statement_id, s.entry_start, s.entry_count) for s in index.statements],
+                             [('STMT-CHF', 0, 250), ('STMT-EUR', 250, 2)])
+
+            entry = index[2]
+            self.assertEqual((entry.booking_date, entry.amount, entry.ccy, entry.credit_debit_indicator,
+                              entry.account_servicer_reference, entry.statement),
+                             ('2023-04-04', Decimal('3.05'), 'CHF', 'CRDT', 'REF-3', 0))
+            self.assertEqual(index[-1].account_servicer_reference, None)
+            self.assertEqual(self.source.read_bytes()[entry.offset:entry.offset + 6], b'<Ntry>')
+
+    def test_random_access(self):
+        with StatementIndex.open(self.source) as index:
+            self.assertEqual(index.lookup('REF-123'), [122])
+            self.assertEqual(index.lookup('REF-999'), [])
+            self.assertEqual(index.read_entry(122), self.chf[122])
+            self.assertEqual(index.read_page(2, page_size=100), self.chf[200:] + self.eur)
+            self.assertEqual(index.read_page(0, statement=1), self.eur)
+            with self.assertRaises(IndexError):
+                index[252]
+
+    def test_multi_byte_reference(self):
+        reference = 'Zahlung Müller Gärtnerei Zürich ÄÖÜ'
+        self.assertEqual(len(reference), 35)
+        source = self.directory / 'umlauts.xml'
+        with StatementWriter(source, message_id='MSG-1') as writer:
+            with writer.statement('STMT-ÄÖÜ', account='CH9300762011623852957', currency='CHF') as statement:
+                statement.write_entries([make_entry('1', 'CRDT', account_servicer_reference=reference)])
+        with StatementIndex.open(source) as index:
+            self.assertEqual(index.lookup(reference), [0])
+            self.assertEqual(index[0].account_servicer_reference, reference)
+            self.assertEqual(index.statements[0].statement_id, 'STMT-ÄÖÜ')
+
+    def test_prefixed_namespace(self):
+        document = self.source.read_bytes().replace(b'<', b'<camt:').replace(b'<camt:/', b'</camt:') \
+            .replace(b'<camt:?xml', b'<?xml').replace(b'xmlns=', b'xmlns:camt=')
+        self.assertIn(f'xmlns:camt="{CAMT_053_NAMESPACE}"'.encode(), document)
+        prefixed = self.directory / 'prefixed.xml'
+        prefixed.write_bytes(document)
+        with StatementIndex.open(prefixed) as index:
+            self.assertEqual(len(index), 252)
+            self.assertEqual(index.read_entry(5), self.chf[5])
+
+    def test_stale_index(self):
+        index_path = build_index(self.source)
+        self.assertTrue(StatementIndex.is_current(self.source, index_path))
+        stat = self.source.stat()
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertFalse(StatementIndex.is_current(self.source, index_path))
+        with self.assertRaises(ValueError):
+            StatementIndex.open(self.source, build=False)
+        with StatementIndex.open(self.source) as index:
+            self.assertEqual(len(index), 252)
+
+
+if __name__ == '__main__':
+    unittest.main()
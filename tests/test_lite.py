@@ -0,0 +1,79 @@
+import sys
+import unittest
+from decimal import Decimal
+
+from CAMT_053_001_09.lite import LiteAmount, LiteCreditDebitCode, LiteEntry, LiteISODate, LiteMax35Text, lite_type
+from CAMT_053_001_09.message_datatypes import ActiveCurrencyAndAmount, AddressType2Code, CreditDebitCode, \
+    ISODateTime, Max35Text
+from tests.factories import make_entry
+
+
+class TestLiteTypes(unittest.TestCase):
+
+    def test_codes(self):
+        code = LiteCreditDebitCode(' crdt ')
+        self.assertEqual(code, 'CRDT')
+        self.assertIs(LiteCreditDebitCode('CRDT'), code)
+        self.assertIs(LiteCreditDebitCode.trusted('CRDT'), code)
+        self.assertIs(lite_type(CreditDebitCode), LiteCreditDebitCode)
+        self.assertEqual(code.to_model(), CreditDebitCode(code='CRDT'))
+        self.assertEqual(lite_type(AddressType2Code)('home'), 'HOME')
+        with self.assertRaises(ValueError):
+            LiteCreditDebitCode('XXXX')
+        with self.assertRaises(TypeError):
+            LiteCreditDebitCode(1)
+        with self.assertRaises(AttributeError):
+            code.__dict__
+
+    def test_texts_and_dates(self):
+        self.assertEqual(LiteMax35Text('REF-1').to_model(), Max35Text(value='REF-1'))
+        with self.assertRaises(ValueError):
+            LiteMax35Text('x' * 36)
+
+        self.assertEqual(LiteISODate('2023-04-01'), '2023-04-01')
+        self.assertEqual(LiteISODate('2023-04-01T23:00:00'), '2023-04-01')
+        with self.assertRaises(ValueError):
+            LiteISODate('2023-02-30')
+        self.assertEqual(lite_type(ISODateTime)('2023-04-06T12:00:00+02:00'), '2023-04-06T10:00:00.000Z')
+        with self.assertRaises(TypeError):
+            lite_type(ActiveCurrencyAndAmount)
+
+    def test_amount(self):
+        amount = LiteAmount('1.005', 'CHF')
+        self.assertEqual(amount.amount, Decimal('1.01'))
+        self.assertEqual(LiteAmount(1, 'JPY').amount, Decimal('1'))
+        self.assertEqual(amount.minor_units, 101)
+        self.assertEqual(amount.to_model(), ActiveCurrencyAndAmount(amount='1.01', ccy='CHF'))
+        self.assertEqual(LiteAmount.from_model(amount.to_model()), amount)
+        with self.assertRaises(ValueError):
+            LiteAmount('1', 'chf')
+        with self.assertRaises(AttributeError):
+            amount.rate = 1
+
+
+class TestLiteEntry(unittest.TestCase):
+
+    def test_round_trip(self):
+        entries = [make_entry('100.00', 'CRDT', booking_date='2023-04-03', account_servicer_reference='REF-1'),
+                   make_entry('20.25', 'DBIT', ccy='EUR', domain='ACMT', family='MDOP', sub_family='FEES')]
+        for entry in entries:
+            with self.subTest(entry=entry):
+                lite = LiteEntry.from_model(entry)
+                self.assertEqual(lite.to_model(), entry)
+                self.assertIs(type(lite.to_model().credit_debit_indicator.code), str)
+
+    def test_validation(self):
+        entry = LiteEntry(LiteAmount('100', 'CHF'), 'crdt', 'BOOK', 'PMNT', 'RCDT', 'ESCT', booking_date='2023-04-03',
+                          account_servicer_reference='REF-1')
+        self.assertEqual(entry.to_model(), make_entry('100.00', 'CRDT', booking_date='2023-04-03',
+                                                      account_servicer_reference='REF-1'))
+        self.assertEqual(LiteEntry.from_model(entry.to_model()), entry)
+        self.assertLess(sys.getsizeof(entry), sys.getsizeof(entry.to_model().__dict__))
+        with self.assertRaises(ValueError):
+            LiteEntry(LiteAmount('100', 'CHF'), 'CRDT', 'UNKNOWN', 'PMNT', 'RCDT', 'ESCT')
+        with self.assertRaises(TypeError):
+            LiteEntry('100', 'CRDT', 'BOOK', 'PMNT', 'RCDT', 'ESCT')
+
+
+if __name__ == '__main__':
+    unittest.main()
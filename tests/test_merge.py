@@ -0,0 +1,69 @@
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from CAMT_053_001_09.merge import booking_date_key, merge_entries, sort_entries
+from tests.factories import make_entry
+
+
+def booking_dates(entries):
+    return [entry.booking_date.value if entry.booking_date is not None else None for entry in entries]
+
+
+class TestMergeEntries(unittest.TestCase):
+
+    def test_merge(self):
+        bank = [make_entry('1', 'CRDT', booking_date=f'2023-04-{day:02}') for day in (1, 3, 3, 7)]
+        broker = [make_entry('2', 'DBIT', ccy='USD', booking_date=f'2023-04-{day:02}') for day in (2, 3, 8)]
+        merged = list(merge_entries(iter(bank), iter(broker), []))
+        self.assertEqual(booking_dates(merged), ['2023-04-01', '2023-04-02', '2023-04-03', '2023-04-03', '2023-04-03',
+                                                 '2023-04-07', '2023-04-08'])
+        # Equal booking dates keep the order of the sources
+        self.assertEqual([entry.amount.ccy for entry in merged[2:5]], ['CHF', 'CHF', 'USD'])
+
+        merged = list(merge_entries(bank, broker, tie_break=lambda entry: entry.amount.ccy != 'USD'))
+        self.assertEqual([entry.amount.ccy for entry in merged[2:5]], ['USD', 'CHF', 'CHF'])
+
+    def test_pending_entries_last(self):
+        pending = make_entry('1', 'CRDT')
+        pending.booking_date = None
+        merged = list(merge_entries([make_entry('1', 'CRDT', booking_date='2023-04-01'), pending],
+                                    [make_entry('1', 'CRDT', booking_date='2023-04-02')]))
+        self.assertEqual(booking_dates(merged), ['2023-04-01', '2023-04-02', None])
+
+    def test_unsorted_source(self):
+        entries = [make_entry('1', 'CRDT', booking_date='2023-04-02'),
+                   make_entry('1', 'CRDT', booking_date='2023-04-01')]
+        with self.assertRaises(ValueError):
+            list(merge_entries(entries))
+        self.assertEqual(len(list(merge_entries(entries, check=False))), 2)
+
+
+class TestSortEntries(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.entries = [make_entry(str(i), 'CRDT', booking_date=f'2023-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}',
+                                   account_servicer_reference=f'REF-{i}') for i in range(250)]
+
+    def test_external_sort(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result = sort_entries(self.entries, run_size=40, directory=directory)
+            self.assertEqual(len(list(Path(directory).iterdir())), 0)  # unnamed temporary files
+            result = list(result)
+        self.assertEqual(result, sorted(self.entries, key=booking_date_key))
+        self.assertEqual(list(sort_entries(self.entries)), result)
+
+    def test_tie_break(self):
+        tie_break = lambda entry: -entry.amount.amount  # noqa: E731
+        result = list(sort_entries(reversed(self.entries), tie_break=tie_break, run_size=64))
+        self.assertEqual(result, sorted(self.entries, key=lambda entry: (booking_date_key(entry), tie_break(entry))))
+        self.assertEqual(list(merge_entries(result, tie_break=tie_break)), result)
+
+        with self.assertRaises(ValueError):
+            sort_entries(self.entries, run_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,11 +3,14 @@ from datetime import datetime, timezone
 from decimal import Decimal
 from xml.etree.ElementTree import tostring
 
+from lxml import etree
+
 import pendulum
 
 from CAMT_053_001_09.base_models import AmountBaseModel, DateTimeBaseModel
 from CAMT_053_001_09.message_datatypes import ActiveOrHistoricCurrencyAnd13DecimalAmount, ActiveCurrencyCode, \
-    AddressType2Code, CountryCode, ExternalAccountIdentification1Code
+    AddressType2Code, CountryCode, ExternalAccountIdentification1Code, ActiveOrHistoricCurrencyAndAmount, \
+    ActiveCurrencyAndAmount, CreditDebitCode, ISODate, ISODateTime, Max35Text
 from CAMT_053_001_09.utils import set_datetime_format_decorator
 
 
@@ -369,5 +372,102 @@ class TestDateTimeBaseModel(unittest.TestCase):
                             DateTimeModel(value=invalid_input)
 
 
+class TestImmutableModels(unittest.TestCase):
+
+    def test_frozen_amount(self):
+        FrozenAmount = ActiveOrHistoricCurrencyAndAmount.frozen()
+        self.assertIs(ActiveOrHistoricCurrencyAndAmount.frozen(), FrozenAmount)
+        self.assertIs(FrozenAmount.frozen(), FrozenAmount)
+        self.assertTrue(issubclass(FrozenAmount, ActiveOrHistoricCurrencyAndAmount))
+
+        amount = FrozenAmount(amount='1.5', ccy='CHF')
+        self.assertEqual(amount.amount, Decimal('1.50'))
+        self.assertEqual(amount, FrozenAmount(amount=Decimal('1.500'), ccy='CHF'))
+        self.assertEqual(hash(amount), hash(FrozenAmount(amount=1.5, ccy='CHF')))
+        self.assertNotEqual(amount, FrozenAmount(amount='1.5', ccy='EUR'))
+        self.assertNotEqual(amount, ActiveCurrencyAndAmount.frozen()(amount='1.5', ccy='CHF'))
+        self.assertEqual(len({amount, FrozenAmount(amount='1.50', ccy='CHF'), FrozenAmount(amount='2', ccy='CHF')}), 2)
+
+        with self.assertRaises(TypeError):
+            amount.amount = Decimal('2')
+        with self.assertRaises(ValueError):
+            FrozenAmount(amount='1.5', ccy='chf')
+
+    def test_frozen_codes_and_values(self):
+        codes = {CreditDebitCode.frozen()(code=' crdt '): 'credit'}
+        self.assertEqual(codes[CreditDebitCode.frozen()(code='CRDT')], 'credit')
+        self.assertEqual(ExternalAccountIdentification1Code.frozen()(code='aiin').code, 'AIIN')
+        self.assertEqual(len({Max35Text.frozen()(value='REF-1'), Max35Text.frozen()(value='REF-1')}), 1)
+        self.assertEqual(hash(ISODate.frozen()(value='2023-04-01')), hash(ISODate.frozen()(value=datetime(2023, 4, 1))))
+        with self.assertRaises(ValueError):
+            CreditDebitCode.frozen()(code='XXXX')
+
+    def test_freeze_and_thaw(self):
+        amount = ActiveOrHistoricCurrencyAndAmount(amount='1.5', ccy='CHF')
+        frozen = amount.freeze()
+        self.assertTrue(frozen.is_frozen)
+        self.assertFalse(amount.is_frozen)
+        self.assertIs(frozen.freeze(), frozen)
+        self.assertEqual(frozen, amount)
+        self.assertEqual(amount, frozen)
+
+        thawed = frozen.thaw()
+        self.assertIs(type(thawed), ActiveOrHistoricCurrencyAndAmount)
+        thawed.amount = Decimal('2')
+        self.assertEqual(thawed.amount, Decimal('2.00'))
+        self.assertEqual(frozen.amount, Decimal('1.50'))
+
+
+class TestXmlRoundTrip(unittest.TestCase):
+
+    def test_from_xml(self):
+        values = [
+            ActiveOrHistoricCurrencyAndAmount(amount='1234.5', ccy='CHF'),
+            ActiveOrHistoricCurrencyAnd13DecimalAmount(amount='1.5', ccy='EUR'),
+            CreditDebitCode(code='DBIT'),
+            ExternalAccountIdentification1Code(code='AIIN'),
+            Max35Text(value='REF-1'),
+            ISODate(value='2023-04-06'),
+            ISODateTime(value='2023-04-06T12:34:56.789Z'),
+        ]
+        for value in values:
+            with self.subTest(value=value):
+                self.assertEqual(type(value).from_xml(value.to_xml('Tag')), value)
+
+        element = etree.fromstring('<Amt Ccy="JPY">1500.4</Amt>')
+        self.assertEqual(ActiveCurrencyAndAmount.from_xml(element), ActiveCurrencyAndAmount(amount='1500', ccy='JPY'))
+        self.assertEqual(CreditDebitCode.from_xml(etree.fromstring('<CdtDbtInd> crdt </CdtDbtInd>')).code, 'CRDT')
+        with self.assertRaises(ValueError):
+            CreditDebitCode.from_xml(etree.fromstring('<CdtDbtInd>XXXX</CdtDbtInd>'))
+
+    def test_from_xml_many(self):
+        document = etree.fromstring(
+            '<Stmt xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.09">'
+            + ''.join(f'<Ntry><Amt Ccy="{ccy}">{amount}</Amt><CdtDbtInd>{code}</CdtDbtInd>'
+                      f'<BookgDt><Dt>2023-04-0{i % 3 + 1}</Dt></BookgDt></Ntry>'
+                      for i, (amount, ccy, code) in enumerate([('1.005', 'CHF', 'CRDT'), ('2', 'JPY', 'dbit'),
+                                                               ('3.1', 'CHF', 'CRDT'), ('1e2', 'EUR', 'DBIT'),
+                                                               ('12345678901234567.891', 'CHF', 'CRDT')]))
+            + '</Stmt>')
+        amounts = document.findall('.//{*}Amt')
+        self.assertEqual(ActiveOrHistoricCurrencyAndAmount.from_xml_many(amounts),
+                         [ActiveOrHistoricCurrencyAndAmount.from_xml(amount) for amount in amounts])
+        # more than 18 digits are converted through float by the model
+        self.assertEqual(ActiveOrHistoricCurrencyAndAmount.from_xml_many(document, './/{*}Amt')[-1].amount,
+                         Decimal('12345678901234568.00'))
+        self.assertEqual(ActiveOrHistoricCurrencyAnd13DecimalAmount.from_xml_many(amounts[:4]),
+                         [ActiveOrHistoricCurrencyAnd13DecimalAmount.from_xml(amount) for amount in amounts[:4]])
+        self.assertEqual([code.code for code in CreditDebitCode.from_xml_many(document, './/{*}CdtDbtInd')],
+                         ['CRDT', 'DBIT', 'CRDT', 'DBIT', 'CRDT'])
+        self.assertEqual([date.value for date in ISODate.frozen().from_xml_many(document, './/{*}Dt')],
+                         ['2023-04-01', '2023-04-02', '2023-04-03', '2023-04-01', '2023-04-02'])
+
+        invalid = etree.fromstring('<Stmt><Amt Ccy="CHF">1</Amt><Amt Ccy="CHF">x</Amt></Stmt>')
+        with self.assertRaises(ValueError):
+            ActiveOrHistoricCurrencyAndAmount.from_xml_many(invalid, 'Amt')
+        with self.assertRaises(ValueError):
+            ActiveOrHistoricCurrencyAndAmount.from_xml_many([etree.fromstring('<Amt Ccy="chf">1</Amt>')])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,73 @@
+import io
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from CAMT_053_001_09.dedup import EntryDeduplicator
+from CAMT_053_001_09.message_components import ReportEntry12
+from CAMT_053_001_09.parallel import serialize_entries, serialize_entry
+from CAMT_053_001_09.writer import StatementWriter
+from tests.factories import make_balance, make_random_entries
+
+
+class TestParallelSerialization(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = ProcessPoolExecutor(2)
+        entries = make_random_entries(495)
+        cls.entries = entries + entries[15:20]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def test_serialize_entries(self):
+        slices = list(serialize_entries(iter(self.entries), self.executor, slice_size=64, max_pending=3))
+        self.assertEqual([len(entries) for entries, _, _ in slices], [64] * 7 + [52])
+        self.assertEqual([entry for entries, _, _ in slices for entry in entries], self.entries)
+        self.assertEqual(b''.join(data for _, data, _ in slices),
+                         b''.join(serialize_entry(entry) for entry in self.entries))
+        self.assertEqual([size for _, _, sizes in slices for size in sizes],
+                         [len(serialize_entry(entry)) for entry in self.entries])
+        with self.assertRaises(ValueError):
+            list(serialize_entries(self.entries, self.executor, slice_size=0))
+
+    def write(self, executor=None, **kwargs):
+        pages = {}
+        with StatementWriter(lambda page: pages.setdefault(page, io.BytesIO()), 'MSG-1',
+                             creation_date_time='2023-04-06T10:00:00Z', deduplicator=EntryDeduplicator(),
+                             **kwargs) as writer:
+            with writer.statement('STMT-1', 'CH9300762011623852957', 'CHF',
+                                  opening_balance=make_balance('OPBD', '100', 'CRDT')) as statement:
+                written = statement.write_entries(self.entries, executor=executor)
+        return written, [pages[page].getvalue() for page in sorted(pages)]
+
+    def test_same_output(self):
+        for kwargs in (dict(max_entries=10 ** 6), dict(max_entries=120), dict(max_bytes=30_000)):
+            with self.subTest(**kwargs):
+                written, pages = self.write(**kwargs)
+                self.assertEqual(written, 495)  # repeated entries are dropped as duplicates
+                self.assertEqual(self.write(self.executor, **kwargs), (written, pages))
+
+    def test_stripped_amounts(self):
+        entries = [ReportEntry12(**{**entry.dict(), 'amount': {'amount': amount, 'ccy': 'CHF', 'strip': True}})
+                   for entry, amount in zip(self.entries, ('1.50', '1000', '2.25'))]
+        slices = list(serialize_entries(entries, self.executor))
+        self.assertIn(b'<Amt ccy="CHF">1.5</Amt>', slices[0][1])
+        self.assertEqual(slices[0][1], b''.join(serialize_entry(entry) for entry in entries))
+
+    def test_failed_write_records_no_entries(self):
+        def entries():
+            yield from self.entries[:100]
+            raise RuntimeError('source failed')
+
+        deduplicator = EntryDeduplicator()
+        with self.assertRaises(RuntimeError):
+            with StatementWriter(io.BytesIO(), 'MSG-1', deduplicator=deduplicator) as writer:
+                with writer.statement('STMT-1', 'CH9300762011623852957', 'CHF') as statement:
+                    statement.write_entries(entries(), executor=self.executor)
+        self.assertFalse(any(deduplicator.seen(entry) for entry in self.entries[:100]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import random
+import unittest
+
+from CAMT_053_001_09.message_datatypes import ISODate, Max35Text
+from CAMT_053_001_09.query import EntryIndex, scan
+from tests.factories import make_entry
+
+CODES = [('PMNT', 'RCDT', 'ESCT'), ('PMNT', 'ICDT', 'ESCT'), ('ACMT', 'MDOP', 'FEES'), ('SECU', 'SETT', 'TRAD')]
+
+
+def make_entries(count, seed=0):
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        domain, family, sub_family = rng.choice(CODES)
+        entry = make_entry(f'{rng.randint(1, 10_000)}.00', rng.choice(('CRDT', 'DBIT')), ccy=rng.choice(('CHF', 'EUR')),
+                           booking_date=f'2023-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}',
+                           account_servicer_reference=f'REF-{i}' if i % 3 else None,
+                           domain=domain, family=family, sub_family=sub_family)
+        if i % 2:
+            entry.value_date = ISODate(value=entry.booking_date.value)
+            entry.end_to_end_id = Max35Text(value=f'E2E-{i % 50}')
+        entries.append(entry)
+    return entries
+
+
+class TestEntryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = make_entries(500)
+        self.index = EntryIndex(self.entries)
+
+    def test_filter(self):
+        self.assertEqual(self.index.filter(account_servicer_reference='REF-7'), [self.entries[7]])
+        self.assertEqual(self.index.filter(account_servicer_reference='REF-3', ccy='XXX'), [])
+        self.assertEqual(len(self.index.filter(end_to_end_id='E2E-1')), 10)
+        self.assertEqual(self.index.positions(), list(range(500)))
+        self.assertEqual(self.index.values('domain'), ['ACMT', 'PMNT', 'SECU'])
+
+    def test_matches_scan(self):
+        queries = [
+            dict(booking_date=('2023-03-01', '2023-03-31')),
+            dict(booking_date=(None, '2023-02-10'), domain='PMNT'),
+            dict(value_date=('2023-06-01', None), ccy=('CHF',), credit_debit_indicator='DBIT'),
+            dict(family=['RCDT', 'MDOP'], sub_family='ESCT', ccy='EUR'),
+            dict(booking_date=('2023-05-01', '2023-05-01'), end_to_end_id=('E2E-1', 'E2E-3', 'E2E-1')),
+            dict(value_date=('2023-12-01', '2023-01-01')),
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                positions = self.index.positions(**query)
+                self.assertEqual(positions, scan(self.entries, **query))
+                self.assertEqual(self.index.count(**query), len(positions))
+
+    def test_invalid_criteria(self):
+        with self.assertRaises(ValueError):
+            self.index.filter(amount='1.00')
+        with self.assertRaises(ValueError):
+            self.index.filter(booking_date='2023-01-01')
+
+    def test_empty(self):
+        index = EntryIndex([])
+        self.assertEqual(index.filter(domain='PMNT', booking_date=(None, None)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
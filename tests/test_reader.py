@@ -0,0 +1,27 @@
+import io
+import unittest
+from decimal import Decimal
+
+from CAMT_053_001_09.message_components import CAMT_053_NAMESPACE
+from CAMT_053_001_09.reader import iter_entries
+from tests.factories import make_document, make_entry
+
+
+class TestIterEntries(unittest.TestCase):
+
+    def test_round_trip(self):
+        entries = [make_entry('12.30', 'CRDT', account_servicer_reference='REF1'), make_entry('1', 'DBIT')]
+
+        for namespace in (CAMT_053_NAMESPACE, None):
+            with self.subTest(namespace=namespace):
+                parsed = list(iter_entries(io.BytesIO(make_document(entries, namespace))))
+                self.assertEqual(parsed, entries)
+
+    def test_amount_currency_attribute(self):
+        xml = make_document([make_entry('5', 'CRDT')]).replace(b'ccy="CHF"', b'Ccy="EUR"')
+        entry = next(iter_entries(io.BytesIO(xml)))
+        self.assertEqual((entry.amount.amount, entry.amount.ccy), (Decimal('5.00'), 'EUR'))
+
+
+if __name__ == '__main__':
+    unittest.main()
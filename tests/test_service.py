@@ -0,0 +1,150 @@
+import asyncio
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from CAMT_053_001_09.flexquery import convert_flexquery
+from CAMT_053_001_09.reader import iter_entries
+from CAMT_053_001_09 import service as service_module
+from CAMT_053_001_09.service import IngestionService, StageMetrics, percentile
+
+DATA = Path(__file__).parent / 'data'
+
+
+class TestStageMetrics(unittest.TestCase):
+
+    def test_percentile(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 95), 95.0)
+        self.assertEqual(percentile([3.0], 95), 3.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_record(self):
+        metrics = StageMetrics('parse')
+        metrics.record(0.5, 10.0, 11.0)
+        metrics.record(0.0, 10.5, 12.0, failed=True)
+        snapshot = metrics.snapshot()
+        self.assertEqual((snapshot['count'], snapshot['failed']), (2, 1))
+        self.assertEqual(snapshot['throughput'], 1.0)
+        self.assertEqual(snapshot['latency_max'], 1.5)
+
+
+class TestIngestionService(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.inbox = self.directory / 'inbox'
+        self.inbox.mkdir()
+        self.output_dir = self.directory / 'out'
+
+    def test_submit(self):
+        async def convert():
+            async with IngestionService(self.output_dir, 2, 2, 1, queue_size=1) as service:
+                futures = [await service.submit(DATA / name) for name in ('flexquery.xml', 'td_ameritrade.csv')]
+                return await asyncio.gather(*futures), service.metrics_snapshot()
+
+        results, metrics = asyncio.run(convert())
+        self.assertEqual([(result.error, result.entries) for result in results], [(None, 5), (None, 5)])
+        self.assertEqual([metrics[stage]['count'] for stage in ('parse', 'validate', 'write')], [2, 2, 2])
+
+        # Same document as the streaming converter
+        expected = self.directory / 'expected.xml'
+        convert_flexquery(DATA / 'flexquery.xml', expected)
+        self.assertEqual([entry.dict() for entry in iter_entries(self.output_dir / 'flexquery.camt053.xml')],
+                         [entry.dict() for entry in iter_entries(expected)])
+
+    def test_max_bytes(self):
+        sources = [self.directory / f'flexquery-{index}.xml' for index in range(4)]
+        for source in sources:
+            shutil.copy(DATA / 'flexquery.xml', source)
+        size = sources[0].stat().st_size
+        held = []
+        original = service_module.parse_file
+
+        def parse_file(*args):
+            held.append(service.bytes_held)
+            return original(*args)
+
+        async def convert():
+            nonlocal service
+            async with IngestionService(self.output_dir, 4, 4, 4, max_bytes=2 * size) as service:
+                with mock.patch.object(service_module, 'parse_file', parse_file):
+                    futures = [await service.submit(source) for source in sources]
+                    return await asyncio.gather(*futures)
+
+        service = None
+        results = asyncio.run(convert())
+        self.assertEqual([result.entries for result in results], [5] * 4)
+        self.assertLessEqual(max(held), 2 * size)
+        self.assertEqual(service.bytes_held, 0)
+
+    def test_watch(self):
+        for index in range(6):
+            shutil.copy(DATA / 'flexquery.xml', self.inbox / f'flexquery-{index}.xml')
+        (self.inbox / 'broken.xml').write_text('<FlexQueryResponse><FlexStatements>')
+        (self.inbox / 'notes.txt').write_text('')
+
+        async def watch():
+            async with IngestionService(self.output_dir, 1, 1, 1, queue_size=1) as service:
+                await service.watch(self.inbox, interval=0.01, once=True)
+                return service.metrics_snapshot()
+
+        metrics = asyncio.run(watch())
+        self.assertEqual(metrics['parse']['failed'], 1)
+        self.assertEqual(metrics['write']['count'], 6)
+        self.assertEqual(len(list((self.inbox / 'processed').iterdir())), 6)
+        self.assertEqual([path.name for path in (self.inbox / 'failed').iterdir()], ['broken.xml'])
+        self.assertEqual(sorted(path.name for path in self.inbox.iterdir()), ['failed', 'notes.txt', 'processed'])
+        self.assertEqual(len(list(self.output_dir.iterdir())), 6)
+
+    def test_watch_file_being_copied(self):
+        lines = (DATA / 'td_ameritrade.csv').read_text().splitlines(keepends=True)
+        source = self.inbox / 'td_ameritrade.csv'
+
+        async def copy():
+            for line in lines:
+                with open(source, 'a') as f:
+                    f.write(line)
+                await asyncio.sleep(0.03)
+
+        async def watch():
+            async with IngestionService(self.output_dir, 1, 1, 1) as service:
+                copying = asyncio.create_task(copy())
+                await asyncio.sleep(0.01)
+                await service.watch(self.inbox, interval=0.05, once=True)
+                self.assertTrue(copying.done())
+
+        asyncio.run(watch())
+        self.assertEqual([path.name for path in (self.inbox / 'processed').iterdir()], ['td_ameritrade.csv'])
+        self.assertEqual(len(list(iter_entries(self.output_dir / 'td_ameritrade.camt053.xml'))), 5)
+
+    def test_same_target(self):
+        shutil.copy(DATA / 'flexquery.xml', self.inbox / 'a.xml')
+        shutil.copy(DATA / 'td_ameritrade.csv', self.inbox / 'a.csv')
+        # Output and processed file of an earlier delivery
+        self.output_dir.mkdir()
+        (self.output_dir / 'a.camt053.xml').write_text('earlier')
+        (self.inbox / 'processed').mkdir()
+        (self.inbox / 'processed' / 'a.xml').write_text('earlier')
+
+        async def watch():
+            async with IngestionService(self.output_dir, 2, 2, 2) as service:
+                await service.watch(self.inbox, interval=0.01, once=True)
+
+        asyncio.run(watch())
+        self.assertEqual((self.output_dir / 'a.camt053.xml').read_text(), 'earlier')
+        self.assertEqual(sorted(path.name for path in self.output_dir.iterdir()),
+                         ['a-2.camt053.xml', 'a-3.camt053.xml', 'a.camt053.xml'])
+        for name in ('a-2.camt053.xml', 'a-3.camt053.xml'):
+            self.assertEqual(len(list(iter_entries(self.output_dir / name))), 5)
+        self.assertEqual(sorted(path.name for path in (self.inbox / 'processed').iterdir()),
+                         ['a-2.xml', 'a.csv', 'a.xml'])
+        self.assertEqual((self.inbox / 'processed' / 'a.xml').read_text(), 'earlier')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from CAMT_053_001_09 import settings
+from CAMT_053_001_09.base_models import DateTimeBaseModel
+from CAMT_053_001_09.settings import Settings, get_settings, naive_timezone, on_reload, reload_settings, \
+    timezone_override
+from CAMT_053_001_09.utils import set_datetime_format_decorator
+
+
+@set_datetime_format_decorator('YYYY-MM-DDThh:mm:ss.sssZ')
+class UTCDateTime(DateTimeBaseModel):
+    pass
+
+
+class TestSettings(unittest.TestCase):
+
+    def test_snapshot(self):
+        snapshot = get_settings()
+        self.assertIs(get_settings(), snapshot)
+        self.assertEqual(snapshot.naive_timezone, 'local')
+        with self.assertRaises(AttributeError):
+            snapshot.naive_timezone = 'utc'
+
+    def test_reload(self):
+        calls = []
+        hook = on_reload(calls.append)
+        self.addCleanup(settings._hooks.remove, hook)
+        self.addCleanup(reload_settings)
+
+        with mock.patch.object(Settings, 'from_config', return_value=Settings('utc')):
+            snapshot = reload_settings()
+        self.assertEqual(calls, [snapshot])
+        self.assertIs(get_settings(), snapshot)
+        self.assertEqual(naive_timezone(), 'utc')
+        self.assertEqual(UTCDateTime(value='2023-04-06T12:00:00').value, '2023-04-06T12:00:00.000Z')
+
+    def test_override(self):
+        with timezone_override('America/New_York'):
+            self.assertEqual(naive_timezone(), 'America/New_York')
+            # EDT in April, EST in December
+            self.assertEqual(UTCDateTime(value='2023-04-06T12:00:00').value, '2023-04-06T16:00:00.000Z')
+            self.assertEqual(UTCDateTime(value='2023-12-06T12:00:00').value, '2023-12-06T17:00:00.000Z')
+            # values with an offset are not affected
+            self.assertEqual(UTCDateTime(value='2023-04-06T12:00:00+02:00').value, '2023-04-06T10:00:00.000Z')
+            with timezone_override('Asia/Tokyo'):
+                self.assertEqual(UTCDateTime(value='2023-04-06T12:00:00').value, '2023-04-06T03:00:00.000Z')
+            self.assertEqual(naive_timezone(), 'America/New_York')
+        self.assertEqual(naive_timezone(), get_settings().naive_timezone)
+
+        @timezone_override('utc')
+        def convert(value):
+            return UTCDateTime(value=value).value
+
+        self.assertEqual(convert('2023-04-06T12:00:00'), '2023-04-06T12:00:00.000Z')
+        self.assertEqual(naive_timezone(), get_settings().naive_timezone)
+
+    def test_invalid_timezone(self):
+        with self.assertRaises(ValueError):
+            with timezone_override('Mars/Olympus_Mons'):
+                pass
+        self.assertEqual(naive_timezone(), get_settings().naive_timezone)
+
+    def test_context_isolation(self):
+        def convert(name):
+            with timezone_override(name):
+                return [UTCDateTime(value='2023-04-06T12:00:00').value for _ in range(200)]
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            new_york, tokyo = executor.map(convert, ['America/New_York', 'Asia/Tokyo'])
+        self.assertEqual(set(new_york), {'2023-04-06T16:00:00.000Z'})
+        self.assertEqual(set(tokyo), {'2023-04-06T03:00:00.000Z'})
+
+        async def task(name):
+            with timezone_override(name):
+                await asyncio.sleep(0)
+                return naive_timezone()
+
+        async def run():
+            return await asyncio.gather(task('Europe/London'), task('utc'))
+
+        self.assertEqual(asyncio.run(run()), ['Europe/London', 'utc'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from decimal import Decimal
+from pathlib import Path
+
+from CAMT_053_001_09.store import StatementStore
+from tests.factories import make_balance, make_entries, make_entry
+
+
+class TestStatementStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = self.directory / 'history.sqlite'
+        self.account = 'CH9300762011623852957'
+        self.entries = [make_entry('100.00', 'CRDT', booking_date='2023-04-03', account_servicer_reference='REF-1'),
+                        make_entry('20.25', 'DBIT', booking_date='2023-04-10', domain='ACMT', family='MDOP',
+                                   sub_family='FEES'),
+                        make_entry('5', 'DBIT', booking_date='2023-05-02')]
+
+    def test_round_trip(self):
+        with StatementStore(self.path, batch_size=2) as store:
+            statement = store.add_statement('STMT-1', self.account, 'CHF', self.entries,
+                                            opening_balance=make_balance('OPBD', '1000', 'CRDT', date='2023-04-01'),
+                                            creation_date_time='2023-05-03T10:00:00')
+            others = make_entries()
+            store.add_statement('STMT-2', 'OTHER', 'JPY', [others[1]])
+
+        with StatementStore(self.path) as store:
+            self.assertEqual(list(store.entries(statement=statement)), self.entries)
+            self.assertEqual(list(store.entries(ccy='JPY')), [others[1]])
+
+            stored = store.statements(account=self.account)
+            self.assertEqual(len(stored), 1)
+            self.assertEqual((stored[0].statement_id, stored[0].ccy, stored[0].entry_count), ('STMT-1', 'CHF', 3))
+            self.assertEqual(stored[0].opening_balance, make_balance('OPBD', '1000', 'CRDT', date='2023-04-01'))
+            self.assertIsNone(stored[0].closing_balance)
+
+    def test_queries(self):
+        with StatementStore() as store:
+            store.add_statement('STMT-1', self.account, 'CHF', self.entries)
+            self.assertEqual(list(store.entries(account=self.account, booking_date=('2023-04-01', '2023-04-30'))),
+                             self.entries[:2])
+            self.assertEqual(list(store.entries(booking_date=('2023-04-10', None))), self.entries[1:])
+            self.assertEqual(list(store.entries(account_servicer_reference='REF-1')), self.entries[:1])
+            self.assertEqual(list(store.entries(account='OTHER')), [])
+            self.assertEqual(store.total(self.account, 'CHF'), Decimal('74.75'))
+            self.assertEqual(store.total(self.account, 'CHF', booking_date=(None, '2023-04-30')), Decimal('79.75'))
+
+    def test_rollback(self):
+        with StatementStore(self.path, batch_size=1) as store:
+            entries = self.entries + [make_entry('1', 'CRDT', domain='SECU', family='SETT', sub_family='TRAD'),
+                                      make_entry('1', 'CRDT', ccy='EUR')]
+            with self.assertRaises(ValueError):
+                store.add_statement('STMT-1', self.account, 'CHF', entries)
+            self.assertEqual(store.statements(), [])
+            # The codes of the failed import are not cached
+            store.add_statement('STMT-2', self.account, 'CHF', entries[-2:-1])
+            self.assertEqual(list(store.entries()), entries[-2:-1])
+
+        with sqlite3.connect(self.path) as connection:
+            self.assertEqual(connection.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(connection.execute('SELECT COUNT(*) FROM code').fetchone()[0], 4)
+
+    def test_concurrent_connections(self):
+        with StatementStore(self.path) as first, StatementStore(self.path) as second:
+            first.add_statement('STMT-1', self.account, 'CHF', self.entries)
+            # Codes added by the other connection are picked up by writers and readers
+            second.add_statement('STMT-2', self.account, 'CHF', self.entries[1:])
+            first.add_statement('STMT-3', self.account, 'CHF', [make_entry('1', 'CRDT', sub_family='POSD')])
+            self.assertEqual(list(second.entries(account=self.account))[:3], self.entries)
+            self.assertEqual(len(list(second.entries(account=self.account))), 6)
+            self.assertEqual(len(list(first.entries(account=self.account))), 6)
+
+    def test_delete_statement(self):
+        with StatementStore() as store:
+            statement = store.add_statement('STMT-1', self.account, 'CHF', self.entries)
+            store.delete_statement(statement)
+            self.assertEqual(list(store.entries()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from decimal import Decimal
+
+from CAMT_053_001_09.message_datatypes import ISODate
+from CAMT_053_001_09.summary import TransactionSummary
+from tests.factories import make_balance, make_entry
+
+
+class TestTransactionSummary(unittest.TestCase):
+
+    def test_totals(self):
+        entries = [make_entry('100.10', 'CRDT'), make_entry('0.20', 'CRDT'), make_entry('50.05', 'DBIT')]
+        summary = TransactionSummary()
+        passed = list(summary.consume(entries))
+
+        self.assertEqual(passed, entries)
+        totals = summary.totals()
+        self.assertEqual((totals.credit_count, totals.credit_sum), (2, 10030))
+        self.assertEqual((totals.debit_count, totals.debit_sum), (1, 5005))
+        self.assertEqual(summary.net_amount().amount, Decimal('50.25'))
+        self.assertEqual(summary.net_credit_debit_indicator().code, 'CRDT')
+
+    def test_exact_sums(self):
+        summary = TransactionSummary()
+        for _ in range(1000):
+            summary.add(Decimal('0.10'), 'CHF', 'CRDT')
+        self.assertEqual(summary.to_total_transactions().total_credit_entries.sum, Decimal('100.00'))
+
+    def test_total_transactions(self):
+        summary = TransactionSummary().update([make_entry('10', 'CRDT'), make_entry('25.50', 'DBIT')])
+        txs_summry = summary.to_total_transactions()
+
+        self.assertEqual(txs_summry.total_entries.number_of_entries.value, '2')
+        self.assertEqual(txs_summry.total_entries.sum, Decimal('35.50'))
+        self.assertEqual(txs_summry.total_entries.total_net_entry.amount, Decimal('15.50'))
+        self.assertEqual(txs_summry.total_entries.total_net_entry.credit_debit_indicator.code, 'DBIT')
+        self.assertEqual(txs_summry.total_debit_entries.number_of_entries.value, '1')
+
+    def test_per_currency(self):
+        summary = TransactionSummary().update([make_entry('10', 'CRDT'), make_entry('1000', 'DBIT', ccy='JPY')])
+
+        self.assertEqual(summary.currencies, ['CHF', 'JPY'])
+        self.assertEqual(summary.totals('JPY').net, -1000)
+        with self.assertRaises(ValueError):
+            summary.totals()
+
+    def test_closing_balance(self):
+        summary = TransactionSummary(make_balance('OPBD', '20.00', 'DBIT'))
+        summary.update([make_entry('100', 'CRDT'), make_entry('30.50', 'DBIT')])
+
+        summary.verify_closing_balance(make_balance('CLBD', '49.50', 'CRDT'))
+        self.assertEqual(summary.expected_closing_balance(ISODate(value='2023-04-06')).amount.amount,
+                         Decimal('49.50'))
+        with self.assertRaises(ValueError):
+            summary.verify_closing_balance(make_balance('CLBD', '49.49', 'CRDT'))
+        with self.assertRaises(ValueError):
+            summary.verify_closing_balance(make_balance('CLBD', '49.50', 'DBIT'))
+
+    def test_invalid_fractional_digits(self):
+        with self.assertRaises(ValueError):
+            TransactionSummary().add(Decimal('1.005'), 'CHF', 'CRDT')
+
+
+if __name__ == '__main__':
+    unittest.main()
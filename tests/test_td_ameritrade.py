@@ -0,0 +1,96 @@
+import io
+import tempfile
+import unittest
+from decimal import Decimal
+from pathlib import Path
+
+from lxml.etree import fromstring
+
+from CAMT_053_001_09.dedup import EntryDeduplicator
+from CAMT_053_001_09.reader import iter_entries
+from CAMT_053_001_09.td_ameritrade import convert_td_ameritrade, validate_amount_column, validate_date_column
+from tests.factories import make_balance
+
+TD_AMERITRADE_CSV = Path(__file__).parent / 'data' / 'td_ameritrade.csv'
+
+
+class TestColumnValidation(unittest.TestCase):
+
+    def test_date_column(self):
+        cache = {}
+        self.assertEqual(validate_date_column(('01/03/2023', '1/3/2023', '01/03/2023'), (2, 3, 4), cache),
+                         ['2023-01-03'] * 3)
+        self.assertEqual(len(cache), 2)
+
+        for value in ('2023-01-03', '13/01/2023', '02/30/2023'):
+            with self.subTest(value=value):
+                with self.assertRaisesRegex(ValueError, 'row 3'):
+                    validate_date_column(('01/03/2023', value), (2, 3), {})
+
+    def test_amount_column(self):
+        self.assertEqual(validate_amount_column(('1,000.005', '-0.35', '7'), (2, 3, 4), 'USD'),
+                         [Decimal('1000.01'), Decimal('-0.35'), Decimal('7.00')])
+
+        for value in ('abc', 'inf', 'nan', '1e20'):
+            with self.subTest(value=value):
+                with self.assertRaisesRegex(ValueError, 'row 4'):
+                    validate_amount_column(('1', value), (3, 4), 'USD')
+
+
+class TestConvertTDAmeritrade(unittest.TestCase):
+
+    def test_convert(self):
+        for chunk_size in (1, 2, 10_000):
+            with self.subTest(chunk_size=chunk_size):
+                output = io.BytesIO()
+                written = convert_td_ameritrade(TD_AMERITRADE_CSV, output, account='123456789',
+                                                opening_balance=make_balance('OPBD', '0', 'CRDT', ccy='USD'),
+                                                chunk_size=chunk_size)
+                entries = list(iter_entries(io.BytesIO(output.getvalue())))
+
+                self.assertEqual(written, 5)
+                self.assertEqual([entry.account_servicer_reference.value for entry in entries],
+                                 ['45001', '45002', '45004', '45005', '45006'])
+                self.assertEqual([entry.credit_debit_indicator.code for entry in entries],
+                                 ['CRDT', 'DBIT', 'CRDT', 'DBIT', 'CRDT'])
+                self.assertEqual(entries[1].amount.amount, Decimal('1250.70'))
+                self.assertEqual(entries[1].booking_date.value, '2023-01-04')
+                self.assertEqual(entries[2].bank_transaction_code.domain.family.sub_family_code.code, 'DVCA')
+
+                document = fromstring(output.getvalue())
+                self.assertEqual(document.findtext('.//{*}Stmt/{*}Id'), '123456789-2023-03-01')
+                self.assertEqual([balance.findtext('{*}Amt') for balance in document.iterfind('.//{*}Bal')],
+                                 ['0.00', '4501.23'])
+
+    def test_invalid_row(self):
+        source = io.StringIO(TD_AMERITRADE_CSV.read_text().replace('-0.35', 'x'))
+        with self.assertRaisesRegex(ValueError, 'row 6'):
+            convert_td_ameritrade(source, io.BytesIO(), account='123456789')
+
+    def test_short_row(self):
+        lines = TD_AMERITRADE_CSV.read_text().splitlines()
+        lines[5] = '02/15/2023,45005,W-8 WITHHOLDING (AAPL)'
+        with self.assertRaisesRegex(ValueError, 'got 3 in row 6'):
+            convert_td_ameritrade(io.StringIO('\n'.join(lines)), io.BytesIO(), account='123456789')
+
+    def test_retry_after_failure(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'dedup.sqlite'
+            source = TD_AMERITRADE_CSV.read_text()
+            with EntryDeduplicator(path, batch_size=1) as deduplicator:
+                with self.assertRaisesRegex(ValueError, 'Invalid amount'):
+                    convert_td_ameritrade(io.StringIO(source.replace('749.98', 'x')), io.BytesIO(),
+                                          account='123456789', deduplicator=deduplicator, chunk_size=2)
+                self.assertEqual(deduplicator.batch_size, 1)
+
+            # The entries of the failed conversion were not recorded
+            with EntryDeduplicator(path) as deduplicator:
+                self.assertEqual(convert_td_ameritrade(io.StringIO(source), io.BytesIO(), account='123456789',
+                                                       deduplicator=deduplicator), 5)
+            with EntryDeduplicator(path) as deduplicator:
+                self.assertEqual(convert_td_ameritrade(io.StringIO(source), io.BytesIO(), account='123456789',
+                                                       deduplicator=deduplicator), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
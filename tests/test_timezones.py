@@ -0,0 +1,79 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import pendulum
+
+from CAMT_053_001_09.message_datatypes import ISODateTime
+from CAMT_053_001_09.settings import timezone_override
+from CAMT_053_001_09.timezones import column_to_utc, get_timezone, localize, offset_table, to_utc
+
+# Time zones of the banks and brokers we receive statements from
+ZONES = ('Europe/Zurich', 'Europe/London', 'America/New_York', 'America/Chicago', 'Australia/Sydney', 'Asia/Tokyo')
+
+
+class TestTimezones(unittest.TestCase):
+
+    def test_get_timezone(self):
+        self.assertIs(get_timezone('Europe/Zurich'), get_timezone('Europe/Zurich'))
+        self.assertEqual(get_timezone('utc').name, 'UTC')
+        with self.assertRaises(ValueError):
+            get_timezone('Mars/Olympus_Mons')
+
+    def test_offset_table(self):
+        table = offset_table('Europe/Zurich', 2023)
+        self.assertEqual(table.transitions, (int(datetime(2023, 3, 26, 1, tzinfo=timezone.utc).timestamp()),
+                                             int(datetime(2023, 10, 29, 1, tzinfo=timezone.utc).timestamp())))
+        self.assertEqual(table.offsets, (3600, 7200, 3600))
+        self.assertEqual(offset_table('Asia/Tokyo', 2023).offsets, (32400,))
+        self.assertIs(offset_table('Europe/Zurich', 2023), table)
+
+    def test_gap_and_fold(self):
+        # Zurich: 02:00-03:00 does not exist on 2023-03-26 and occurs twice on 2023-10-29
+        cases = [
+            (datetime(2023, 3, 26, 1, 59), 0, '2023-03-26T00:59:00+00:00', '2023-03-26T01:59:00+01:00'),
+            (datetime(2023, 3, 26, 2, 30), 0, '2023-03-26T00:30:00+00:00', '2023-03-26T01:30:00+01:00'),
+            (datetime(2023, 3, 26, 2, 30), 1, '2023-03-26T01:30:00+00:00', '2023-03-26T03:30:00+02:00'),
+            (datetime(2023, 3, 26, 3, 0), 0, '2023-03-26T01:00:00+00:00', '2023-03-26T03:00:00+02:00'),
+            (datetime(2023, 10, 29, 2, 30), 0, '2023-10-29T00:30:00+00:00', '2023-10-29T02:30:00+02:00'),
+            (datetime(2023, 10, 29, 2, 30), 1, '2023-10-29T01:30:00+00:00', '2023-10-29T02:30:00+01:00'),
+            (datetime(2023, 10, 29, 3, 0), 0, '2023-10-29T02:00:00+00:00', '2023-10-29T03:00:00+01:00'),
+        ]
+        for value, fold, utc, local in cases:
+            with self.subTest(value=value, fold=fold):
+                self.assertEqual(to_utc(value, 'Europe/Zurich', fold).isoformat(), utc)
+                self.assertEqual(localize(value, 'Europe/Zurich', fold).isoformat(), local)
+
+    def test_matches_pendulum(self):
+        for name in ZONES:
+            tz = get_timezone(name)
+            for year in (2022, 2023, 2024):
+                transitions = offset_table(name, year).transitions or (int(datetime(year, 6, 1).timestamp()),)
+                for transition in transitions:
+                    start = datetime.fromtimestamp(transition, timezone.utc).replace(tzinfo=None, minute=0)
+                    for minutes in range(-180, 180, 15):
+                        value = start + timedelta(minutes=minutes)
+                        for fold in (0, 1):
+                            with self.subTest(name=name, value=value, fold=fold):
+                                expected = pendulum.instance(value, 'UTC').replace(tzinfo=tz, fold=fold)
+                                self.assertEqual(to_utc(value, name, fold), expected.in_timezone('UTC'))
+                                self.assertEqual(localize(value, name, fold).isoformat(), expected.isoformat())
+
+    def test_column_to_utc(self):
+        values = [datetime(2023, 3, 12, 1, 30), datetime(2023, 3, 12, 3, 30), datetime(2024, 11, 3, 1, 30, 15, 500)]
+        self.assertEqual([value.isoformat() for value in column_to_utc(values, 'America/New_York')],
+                         ['2023-03-12T06:30:00+00:00', '2023-03-12T07:30:00+00:00',
+                          '2024-11-03T05:30:15.000500+00:00'])
+        self.assertEqual(column_to_utc(values, 'America/New_York', fold=1)[2].isoformat(),
+                         '2024-11-03T06:30:15.000500+00:00')
+
+    def test_datetime_model(self):
+        with timezone_override('Europe/Zurich'):
+            self.assertEqual(ISODateTime(value='2023-10-29T02:30:00').value, '2023-10-29T00:30:00.000Z')
+            self.assertEqual(ISODateTime(value='2023-03-26T02:30:00').value, '2023-03-26T00:30:00.000Z')
+        with timezone_override('Australia/Sydney'):
+            self.assertEqual(ISODateTime(value='2023-01-15T10:00:00').value, '2023-01-14T23:00:00.000Z')
+            self.assertEqual(ISODateTime(value='2023-07-15T10:00:00').value, '2023-07-15T00:00:00.000Z')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import pickle
+import random
+import string
+import unittest
+from datetime import date
+
+from CAMT_053_001_09.cache import COLUMNS, entries_to_columns
+from CAMT_053_001_09.wire import code_from_id, code_id, date_from_epoch_days, decode_columns, decode_entries, \
+    encode_columns, encode_entries, epoch_days
+from tests.factories import make_entries, make_random_entries
+
+TEXT = string.ascii_letters + string.digits + ' -<>&äöüéß€漢'
+
+
+def random_code(rng, letters=4):
+    return ''.join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(1, letters)))
+
+
+def random_columns(rng, rows):
+    """
+    Columns with random values, including codes and currencies that have no ID and are sent as text.
+    """
+    codes = [random_code(rng) for _ in range(rng.randint(1, 300))] + ['ABCDEFG', 'Pmnt', 'X1']
+    currencies = [random_code(rng, 3) for _ in range(rng.randint(1, 20))] + ['CH', 'EURO', 'chf']
+    start = date(1900, 1, 1).toordinal()
+
+    def random_date():
+        return date.fromordinal(start + rng.randint(0, 200 * 366)).isoformat() if rng.random() < 0.9 else None
+
+    def random_text():
+        if rng.random() < 0.3:
+            return None
+        return ''.join(rng.choice(TEXT) for _ in range(rng.choice((0, 1, rng.randint(2, 35), rng.randint(36, 500)))))
+
+    columns = {name: [] for name in COLUMNS}
+    for _ in range(rows):
+        columns['amount'].append(rng.randint(-2 ** 63, 2 ** 63 - 1) if rng.random() < 0.1
+                                 else rng.randint(0, 10 ** 9))
+        columns['ccy'].append(rng.choice(currencies))
+        for name in ('credit_debit_indicator', 'status', 'domain', 'family', 'sub_family'):
+            columns[name].append(rng.choice(codes))
+        for name in ('booking_date', 'value_date'):
+            columns[name].append(random_date())
+        for name in ('entry_reference', 'account_servicer_reference', 'end_to_end_id', 'additional_entry_information'):
+            columns[name].append(random_text())
+    return columns
+
+
+class TestWire(unittest.TestCase):
+
+    def test_codes(self):
+        rng = random.Random(0)
+        for _ in range(1000):
+            code = random_code(rng, 6)
+            self.assertEqual(code_from_id(code_id(code)), code)
+        self.assertLess(code_id('ZZZ', 3), 0xFFFF)
+        self.assertLess(code_id('ZZZZZZ'), 0xFFFFFFFF)
+        self.assertNotEqual(code_id('A'), code_id('AA'))
+        for code in ('', 'ABCDEFG', 'Pmnt', 'X1', '@', '['):
+            with self.subTest(code=code):
+                self.assertIsNone(code_id(code))
+        self.assertIsNone(code_id('EURO', 3))
+
+    def test_dates(self):
+        self.assertEqual(epoch_days('1970-01-01'), 0)
+        self.assertEqual(epoch_days('1969-12-31'), -1)
+        for ordinal in range(date.min.toordinal(), date.max.toordinal() + 1, 997):
+            day = date.fromordinal(ordinal).isoformat()
+            self.assertEqual(date_from_epoch_days(epoch_days(day)), day)
+
+    def test_round_trip(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            columns = random_columns(rng, rng.choice((0, 1, rng.randint(2, 100), rng.randint(200, 2000))))
+            with self.subTest(seed=seed, rows=len(columns['amount'])):
+                self.assertEqual(decode_columns(encode_columns(columns)), columns)
+
+    def test_entries_round_trip(self):
+        for entries in (make_entries(), [], make_random_entries(500)):
+            data = encode_entries(entries)
+            self.assertEqual(decode_entries(data), entries)
+            self.assertEqual(decode_columns(data), entries_to_columns(entries))
+        # Smaller than the pickled columns, and than the pickled models by far
+        self.assertLess(len(data), len(pickle.dumps(entries_to_columns(entries), pickle.HIGHEST_PROTOCOL)))
+        self.assertLess(len(data) * 5, len(pickle.dumps(entries, pickle.HIGHEST_PROTOCOL)))
+
+    def test_errors(self):
+        columns = entries_to_columns(make_entries())
+        data = encode_columns(columns)
+        with self.assertRaises(ValueError):
+            decode_columns(b'XXXX' + data[4:])
+        with self.assertRaises(ValueError):
+            decode_columns(data + b'\0')
+        # A text of 0xFFFF characters is reserved for None
+        for name, values in (('booking_date', ['20230406'] * 3), ('end_to_end_id', ['x' * 0x10000] * 3),
+                             ('additional_entry_information', [None, 'x' * 0xFFFF, None])):
+            with self.subTest(name=name):
+                with self.assertRaises(ValueError):
+                    encode_columns({**columns, name: values})
+        with self.assertRaises(ValueError):
+            encode_columns({**columns, 'status': ['BOOK']})
+
+
+if __name__ == '__main__':
+    unittest.main()
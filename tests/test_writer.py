@@ -0,0 +1,128 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from lxml.etree import fromstring, tostring
+
+from CAMT_053_001_09.message_components import Pagination1
+from CAMT_053_001_09.reader import iter_entries
+from CAMT_053_001_09.writer import StatementWriter
+from tests.factories import make_balance, make_entry
+
+
+class TestStatementWriter(unittest.TestCase):
+
+    def test_statement(self):
+        entries = [make_entry('5', 'DBIT'), make_entry('1', 'CRDT')]
+        output = io.BytesIO()
+        with StatementWriter(output, 'MSG-1', creation_date_time='2023-04-06T10:00:00Z') as writer:
+            with writer.statement('STMT-1', 'CH9300762011623852957', 'CHF',
+                                  opening_balance=make_balance('OPBD', '10', 'CRDT')) as statement:
+                self.assertEqual(statement.write_entries(entries), 2)
+
+        document = fromstring(output.getvalue())
+        self.assertEqual(document.findtext('.//{*}GrpHdr/{*}CreDtTm'), '2023-04-06T10:00:00.000Z')
+        self.assertEqual(document.findtext('.//{*}Stmt/{*}Acct/{*}Id/{*}IBAN'), 'CH9300762011623852957')
+        self.assertEqual([balance.findtext('{*}Tp/{*}CdOrPrtry/{*}Cd') + balance.findtext('{*}Amt')
+                          for balance in document.iterfind('.//{*}Bal')], ['OPBD10.00', 'CLBD6.00'])
+        self.assertEqual(document.findtext('.//{*}TxsSummry/{*}TtlNtries/{*}Sum'), '6.00')
+        self.assertEqual(list(iter_entries(io.BytesIO(output.getvalue()))), entries)
+
+    def test_interleaved_statements(self):
+        output = io.BytesIO()
+        with StatementWriter(output, 'MSG-1') as writer:
+            chf = writer.statement('STMT-CHF', 'ACCOUNT', 'CHF')
+            eur = writer.statement('STMT-EUR', 'ACCOUNT', 'EUR')
+            chf.write_entry(make_entry('1', 'CRDT'))
+            eur.write_entry(make_entry('2', 'CRDT', ccy='EUR'))
+            chf.write_entry(make_entry('3', 'CRDT'))
+            # Opening balances known only later, as in FlexQuery reports
+            chf.opening_balance = make_balance('OPBD', '10', 'CRDT')
+
+        document = fromstring(output.getvalue())
+        self.assertEqual([len(statement.findall('{*}Ntry')) for statement in document.iterfind('.//{*}Stmt')],
+                         [2, 1])
+        self.assertEqual([balance.findtext('{*}Amt') for balance in document.iterfind('.//{*}Bal')], ['10.00', '14.00'])
+
+    def test_currency_mismatch(self):
+        with StatementWriter(io.BytesIO(), 'MSG-1') as writer:
+            with writer.statement('STMT-1', 'ACCOUNT', 'CHF') as statement:
+                with self.assertRaises(ValueError):
+                    statement.write_entry(make_entry('1', 'CRDT', ccy='EUR'))
+
+
+class TestPagination(unittest.TestCase):
+
+    def write(self, entries, **kwargs):
+        pages = {}
+        with StatementWriter(lambda page: pages.setdefault(page, io.BytesIO()), 'MSG-1',
+                             creation_date_time='2023-04-06T10:00:00Z', **kwargs) as writer:
+            with writer.statement('STMT-1', 'CH9300762011623852957', 'CHF',
+                                  opening_balance=make_balance('OPBD', '100', 'CRDT')) as statement:
+                statement.write_entries(entries)
+        self.assertEqual(writer.pages, list(pages.values()))
+        return [fromstring(page.getvalue()) for page in pages.values()]
+
+    def test_max_entries(self):
+        entries = [make_entry(str(i), 'CRDT' if i % 2 else 'DBIT') for i in range(1, 8)]
+        documents = self.write(entries, max_entries=3)
+
+        self.assertEqual([(pagination.page_number.value, pagination.last_page_indicator) for pagination in
+                          (Pagination1.from_xml(document.find('.//{*}GrpHdr/{*}MsgPgntn')) for document in documents)],
+                         [('1', False), ('2', False), ('3', True)])
+        self.assertEqual([document.findtext('.//{*}Stmt/{*}StmtPgntn/{*}PgNb') for document in documents],
+                         ['1', '2', '3'])
+        self.assertEqual({document.findtext('.//{*}GrpHdr/{*}MsgId') for document in documents}, {'MSG-1'})
+        self.assertEqual([len(document.findall('.//{*}Ntry')) for document in documents], [3, 3, 1])
+        self.assertEqual([[balance.findtext('{*}Tp/{*}CdOrPrtry/{*}Cd') + balance.findtext('{*}Amt')
+                           for balance in document.iterfind('.//{*}Bal')] for document in documents],
+                         [['OPBD100.00', 'ITBD102.00'], ['ITBD102.00', 'ITBD97.00'], ['ITBD97.00', 'CLBD104.00']])
+        self.assertEqual([document.findtext('.//{*}TxsSummry/{*}TtlNtries/{*}NbOfNtries') for document in documents],
+                         ['3', '3', '1'])
+        self.assertEqual([entry for document in documents
+                          for entry in iter_entries(io.BytesIO(tostring(document)))], entries)
+
+    def test_max_bytes(self):
+        entries = [make_entry('1', 'CRDT', account_servicer_reference=f'REF-{i}') for i in range(200)]
+        pages = {}
+        with StatementWriter(lambda page: pages.setdefault(page, io.BytesIO()), 'MSG-1', max_bytes=20_000) as writer:
+            chf = writer.statement('STMT-CHF', 'ACCOUNT', 'CHF')
+            eur = writer.statement('STMT-EUR', 'ACCOUNT', 'EUR')
+            for entry in entries:
+                chf.write_entry(entry)
+                eur.write_entry(make_entry('2', 'DBIT', ccy='EUR'))
+
+        sizes = [len(page.getvalue()) for page in pages.values()]
+        self.assertGreater(len(sizes), 2)
+        self.assertLessEqual(max(sizes), 20_000)
+        self.assertGreater(min(sizes[:-1]), 15_000)
+        documents = [fromstring(page.getvalue()) for page in pages.values()]
+        self.assertEqual(sum(len(document.findall('.//{*}Ntry')) for document in documents), 400)
+        self.assertEqual([statement.findtext('{*}StmtPgntn/{*}LastPgInd') for statement in
+                          documents[-1].iterfind('.//{*}Stmt')], ['true', 'true'])
+        self.assertEqual(documents[-1].findtext('.//{*}MsgPgntn/{*}LastPgInd'), 'true')
+
+    def test_single_page(self):
+        documents = self.write([make_entry('1', 'CRDT')], max_entries=10)
+        self.assertEqual(len(documents), 1)
+        self.assertEqual(documents[0].findtext('.//{*}MsgPgntn/{*}PgNb'), '1')
+        self.assertEqual(documents[0].findtext('.//{*}MsgPgntn/{*}LastPgInd'), 'true')
+        self.assertEqual([balance.findtext('{*}Tp/{*}CdOrPrtry/{*}Cd')
+                          for balance in documents[0].iterfind('.//{*}Bal')], ['OPBD', 'CLBD'])
+
+    def test_file_pattern(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with StatementWriter(Path(directory, 'statement-{page:02}.xml.gz'), 'MSG-1', max_entries=1) as writer:
+                with writer.statement('STMT-1', 'ACCOUNT', 'CHF') as statement:
+                    statement.write_entries([make_entry('1', 'CRDT'), make_entry('2', 'CRDT')])
+            self.assertEqual([Path(page).name for page in writer.pages],
+                             ['statement-01.xml.gz', 'statement-02.xml.gz'])
+            self.assertEqual([len(list(iter_entries(page))) for page in writer.pages], [1, 1])
+
+        with self.assertRaises(ValueError):
+            StatementWriter('statement.xml', 'MSG-1', max_entries=1)
+
+
+if __name__ == '__main__':
+    unittest.main()